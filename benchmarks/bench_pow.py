@@ -0,0 +1,108 @@
+"""
+Porównanie przepustowości proof-of-work: silniki PoW oraz pętla sekwencyjna vs pula procesów.
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python -m benchmarks.bench_pow --blocks 50 --workers 4
+"""
+import argparse
+import hashlib
+import os
+import time
+
+from blockchain.blockchain_base import BlockchainBase, HexdigestPowEngine
+
+
+class _BenchChain(BlockchainBase):
+    """Blockchain bez bazy danych — potrzebny tylko do wywołania hm_proof_of_work."""
+
+    def get_last_block_from_db(self):
+        return None
+
+    def save_block_to_db(self, block, transactions):
+        pass
+
+    def save_transactions_to_mempool(self, transactions):
+        return []
+
+    def get_pending_transactions(self, limit):
+        return []
+
+    def get_mempool_count(self):
+        return 0
+
+    def clear_pending_transactions(self, row_ids):
+        pass
+
+    def iter_chain(self, after_index=0, batch_size=500, with_transactions=True):
+        return iter(())
+
+    def get_chain_height(self):
+        return 0
+
+    def range_reader_spec(self):
+        return {}
+
+    @staticmethod
+    def read_chain_range(reader_spec, first_index, last_index, with_transactions):
+        return []
+
+    def get_account_balance(self, username):
+        return None
+
+    def get_ledger_block_index(self):
+        return 0
+
+    def apply_balance_deltas(self, deltas, block_index):
+        pass
+
+    def aggregate_transfer_pairs(self, max_block_index):
+        return iter(())
+
+    def recompute_user_score(self, username):
+        return {"score": 0, "sent_count": 0, "received_count": 0}
+
+    def get_checkpoint(self, depth):
+        return None
+
+    def save_checkpoint(self, checkpoint):
+        pass
+
+
+def _mine(chain, blocks):
+    """Kopie `blocks` bloków, zwraca (czas, liczbę sprawdzonych nonce)."""
+    attempts = 0
+    start = time.perf_counter()
+    for i in range(blocks):
+        block_hash = hashlib.sha256(f"bench-{i}".encode()).hexdigest()
+        proof = chain.hm_proof_of_work(100 + i, block_hash)
+        attempts += proof + 1
+    return time.perf_counter() - start, attempts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=None, help="nonce na proces w rundzie (domyślnie z trudności)")
+    args = parser.parse_args()
+
+    legacy = _BenchChain(pow_engine=HexdigestPowEngine())
+    serial = _BenchChain()
+    parallel = _BenchChain(parallel_mining=True, mining_workers=args.workers, mining_chunk_size=args.chunk)
+
+    legacy_time, _ = _mine(legacy, args.blocks)
+    serial_time, attempts = _mine(serial, args.blocks)
+    parallel_time, parallel_attempts = _mine(parallel, args.blocks)
+    parallel.shutdown_mining_pool()
+
+    # oba tryby muszą znaleźć te same nonce, więc liczba prób jest identyczna
+    assert attempts == parallel_attempts
+
+    print(f"Bloków: {args.blocks}, nonce do sprawdzenia: {attempts}")
+    print(f"Sekwencyjnie (hexdigest): {legacy_time:.3f} s, {attempts / legacy_time:,.0f} H/s")
+    print(f"Sekwencyjnie (midstate):  {serial_time:.3f} s, {attempts / serial_time:,.0f} H/s")
+    print(f"Równolegle ({args.workers} proc.):    {parallel_time:.3f} s, {attempts / parallel_time:,.0f} H/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Profil SQLite (database/sqlite_profile.py) — przepustowość zapisu i odczytu tabeli historii transakcji
+(TransactionsSQLite, bind sqlite_tx) przed i po zmianie:
+    przed — domyślne PRAGMA i nowa scoped_session(sessionmaker(...)) przy każdym zapisie,
+    po    — Config.SQLITE_PROFILE i jedna fabryka sesji.
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python -m benchmarks.bench_sqlite_profile --rows 100000 --single 2000 --seconds 3
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from database.config import Config
+from database.models import TransactionsSQLite
+from database.sqlite_profile import apply_sqlite_profile
+
+START_DATE = datetime(2025, 1, 1)
+
+
+def _transaction(rng, i):
+    return {
+        'sender': f"user{rng.randrange(1000)}",
+        'recipient': f"user{rng.randrange(1000)}",
+        'amount': round(rng.uniform(0.01, 100), 8),
+        'date': START_DATE + timedelta(milliseconds=i)
+    }
+
+
+def _engine(path: str, profile: dict | None):
+    engine = create_engine(f"sqlite:///{path}")
+    if profile:
+        apply_sqlite_profile(engine, profile)
+    TransactionsSQLite.__table__.create(engine)
+    return engine
+
+
+def _single_commits(engine, count: int, shared: bool, rng) -> float:
+    """Ścieżka /transfer-score: jedna transakcja, jeden commit."""
+    shared_session = scoped_session(sessionmaker(bind=engine))
+    start = time.perf_counter()
+    for i in range(count):
+        session = shared_session if shared else scoped_session(sessionmaker(bind=engine))
+        session.add(TransactionsSQLite(**_transaction(rng, i)))
+        session.commit()
+        session.remove()
+    return count / (time.perf_counter() - start)
+
+
+def _batch_inserts(engine, rows: int, batch_size: int, rng) -> float:
+    """Ścieżki masowe (/generate): bulk_insert_mappings paczkami."""
+    session = scoped_session(sessionmaker(bind=engine))
+    data = [_transaction(rng, i) for i in range(rows)]
+    start = time.perf_counter()
+    for i in range(0, rows, batch_size):
+        session.bulk_insert_mappings(TransactionsSQLite, data[i:i + batch_size])
+        session.commit()
+    session.remove()
+    return rows / (time.perf_counter() - start)
+
+
+def _reads(engine, count: int, rng) -> tuple[float, float]:
+    """Odczyty po kluczu głównym (na sekundę) i czas pełnego skanu z agregacją (s)."""
+    session = scoped_session(sessionmaker(bind=engine))
+    max_id = session.scalar(select(func.max(TransactionsSQLite.id)))
+    start = time.perf_counter()
+    for _ in range(count):
+        session.get(TransactionsSQLite, rng.randint(1, max_id))
+        session.expunge_all()
+    lookups = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    session.execute(
+        select(TransactionsSQLite.sender, func.sum(TransactionsSQLite.amount)).group_by(TransactionsSQLite.sender)
+    ).all()
+    scan = time.perf_counter() - start
+    session.remove()
+    return lookups, scan
+
+
+def _concurrent(engine, seconds: float, readers: int, shared: bool) -> dict:
+    """Jeden wątek zapisujący (pojedyncze commity) i `readers` wątków czytających naraz."""
+    stop = threading.Event()
+    counts = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    shared_session = scoped_session(sessionmaker(bind=engine))
+
+    def writer():
+        rng = random.Random(1)
+        i = 0
+        while not stop.is_set():
+            session = shared_session if shared else scoped_session(sessionmaker(bind=engine))
+            try:
+                session.add(TransactionsSQLite(**_transaction(rng, i)))
+                session.commit()
+                with lock:
+                    counts["writes"] += 1
+            except OperationalError:
+                session.rollback()
+                with lock:
+                    counts["locked"] += 1
+            finally:
+                session.remove()
+            i += 1
+
+    def reader(seed):
+        rng = random.Random(seed)
+        session = shared_session if shared else scoped_session(sessionmaker(bind=engine))
+        while not stop.is_set():
+            try:
+                session.execute(
+                    select(func.count()).where(TransactionsSQLite.sender == f"user{rng.randrange(1000)}")
+                ).scalar()
+                with lock:
+                    counts["reads"] += 1
+            except OperationalError:
+                session.rollback()
+                with lock:
+                    counts["locked"] += 1
+        session.remove()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        "writes_per_second": counts["writes"] / seconds,
+        "reads_per_second": counts["reads"] / seconds,
+        "locked": counts["locked"]
+    }
+
+
+def run(label: str, profile: dict | None, shared: bool, args) -> dict:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _engine(os.path.join(tmp, "transactions.db"), profile)
+        results = {
+            "single": _single_commits(engine, args.single, shared, rng),
+            "batch": _batch_inserts(engine, args.rows, args.batch_size, rng)
+        }
+        results["lookups"], results["scan"] = _reads(engine, args.reads, rng)
+        results.update(_concurrent(engine, args.seconds, args.readers, shared))
+        engine.dispose()
+    print(f"[{label}] gotowe")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000, help="wiersze zapisu paczkami")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--single", type=int, default=2000, help="zapisy z commitem po każdym wierszu")
+    parser.add_argument("--reads", type=int, default=20000, help="odczyty po kluczu głównym")
+    parser.add_argument("--seconds", type=float, default=3.0, help="czas testu zapis + odczyt równolegle")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    before = run("przed", None, False, args)
+    after = run("po", Config.SQLITE_PROFILE, True, args)
+
+    rows = [
+        ("Zapis, commit na wiersz [wiersze/s]", "single"),
+        ("Zapis paczkami [wiersze/s]", "batch"),
+        ("Odczyt po kluczu [zapytania/s]", "lookups"),
+        ("Pełny skan GROUP BY [s]", "scan"),
+        ("Równolegle: zapis [wiersze/s]", "writes_per_second"),
+        ("Równolegle: odczyt [zapytania/s]", "reads_per_second"),
+        ("Równolegle: database is locked", "locked")
+    ]
+    print(f"\n{'':40} {'przed':>12} {'po':>12}")
+    for label, key in rows:
+        print(f"{label:40} {before[key]:12,.2f} {after[key]:12,.2f}")
+
+
+if __name__ == "__main__":
+    main()
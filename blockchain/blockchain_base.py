@@ -1,32 +1,499 @@
 import hashlib
+import hmac
+import itertools
 import json
+import math
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+import weakref
 from abc import ABC, abstractmethod
-from datetime import datetime
+from collections import Counter, deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 import time
+from flask import current_app, has_app_context
+from blockchain.mempool_index import MempoolIndex, MempoolWriteBehind
+from blockchain.sealing_policy import SealingPolicy
+
+
+# Wersje formatu bloku — zapisywane razem z blokiem, decydują o sposobie liczenia hashy
+BLOCK_FORMAT_LEGACY = 0  # json.dumps(sort_keys=True) całego bloku razem z transakcjami
+BLOCK_FORMAT_BINARY = 1  # kanoniczne kodowanie binarne (encode_block / encode_transaction)
+BLOCK_FORMAT_HEADER = 2  # hash z samego nagłówka (encode_block_header), transakcje przez merkle_root
+CURRENT_BLOCK_FORMAT = BLOCK_FORMAT_HEADER
+
+VALIDATION_DEPTHS = ("links", "merkle")
+VALIDATION_MODES = ("incremental", "full")
+
+# Zachowanie pełnego mempoola: odrzucenie z podpowiedzią ponowienia albo wstrzymanie producenta
+MEMPOOL_OVERFLOW_MODES = ("reject", "block")
+
+# pola, które wchodziły do hasha JSON — nowe klucze słownika bloku nie mogą zmienić starych hashy
+_LEGACY_BLOCK_FIELDS = ('index', 'timestamp', 'transactions', 'proof', 'previous_hash', 'merkle_root')
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+_BLOCK_MAGIC = b'HMB'
+_BLOCK_HEADER = struct.Struct('>Bqqq')  # wersja, index, timestamp [ms], proof
+_TX_FIELDS = struct.Struct('>dq')  # amount, date [ms]
+_LENGTH = struct.Struct('>i')
+
+
+def _encode_str(value) -> bytes:
+    if value is None:
+        return _LENGTH.pack(-1)
+    data = str(value).encode()
+    return _LENGTH.pack(len(data)) + data
+
+
+def _encode_millis(value: datetime) -> int:
+    # daty w bazach są przycinane do milisekund (Mongo nie przechowuje mikrosekund)
+    return (value.replace(tzinfo=None) - _EPOCH) // _MILLISECOND
+
+
+def encode_transaction(tx: dict) -> bytes:
+    """Kanoniczne kodowanie transakcji — bez id z bazy, więc identyczne w każdym backendzie."""
+    return (_TX_FIELDS.pack(float(tx['amount']), _encode_millis(tx['date']))
+            + _encode_str(tx['sender'])
+            + _encode_str(tx['recipient']))
+
+
+def encode_block_header(block: dict) -> bytes:
+    """Kanoniczne kodowanie nagłówka bloku: stałe pola, potem pola tekstowe z długością."""
+    return (_BLOCK_MAGIC
+            + _BLOCK_HEADER.pack(block['version'], block['index'], _encode_millis(block['timestamp']), block['proof'])
+            + _encode_str(block['previous_hash'])
+            + _encode_str(block['merkle_root']))
+
+
+def encode_block(block: dict) -> bytes:
+    """Kanoniczne kodowanie całego bloku (format v1): nagłówek, liczba transakcji, transakcje."""
+    parts = [encode_block_header(block), _LENGTH.pack(len(block['transactions']))]
+    parts.extend(encode_transaction(tx) for tx in block['transactions'])
+    return b''.join(parts)
+
+
+def add_balance_deltas(deltas: dict, transactions, sign: int = 1) -> dict:
+    """
+    Dolicza do deltas zmiany sald z transakcji: {username: [saldo, wysłane, odebrane]}.
+    Odbiorca +amount, nadawca -amount; przelew do samego siebie liczy się tylko jako odebrany.
+    sign=-1 cofa transakcje (np. zabrane z mempoola do bloku).
+    """
+    for tx in transactions:
+        amount = float(tx['amount']) * sign
+        recipient = deltas.setdefault(tx['recipient'], [0.0, 0, 0])
+        recipient[0] += amount
+        recipient[2] += sign
+        if tx['sender'] != tx['recipient']:
+            sender = deltas.setdefault(tx['sender'], [0.0, 0, 0])
+            sender[0] -= amount
+            sender[1] += sign
+    return deltas
+
+
+class LazyBlock(dict):
+    """
+    Nagłówek bloku, którego transakcje ładowane są z bazy dopiero przy pierwszym block['transactions']
+    (np. hash bloku w starym formacie). Kopanie potrzebuje tylko proof i hasha ostatniego bloku.
+    """
+
+    def __init__(self, header: dict, load_transactions):
+        super().__init__(header)
+        self._load_transactions = load_transactions
+
+    def __missing__(self, key):
+        if key != 'transactions':
+            raise KeyError(key)
+        self['transactions'] = self._load_transactions()
+        return self['transactions']
+
+    def get(self, key, default=None):
+        return self[key] if key in self or key == 'transactions' else default
+
+
+class ProofOfWorkEngine(ABC):
+    """
+    Reguła proof-of-work: hash sha256(f'{last_proof}{proof}{block_hash}') kończy się na `target_suffix`
+    (w zapisie hex). Silniki różnią się tylko sposobem liczenia — wynik musi być identyczny.
+    """
+
+    def __init__(self, target_suffix: str = "239"):
+        self.target_suffix = target_suffix
+
+    @abstractmethod
+    def valid_proof(self, hm_last_proof, hm_proof, block_hash) -> bool:
+        pass
+
+    def search(self, hm_last_proof, block_hash, start: int = 0, stop: int | None = None):
+        """Zwraca najmniejszy poprawny nonce z przedziału [start, stop) albo None."""
+        candidates = itertools.count(start) if stop is None else range(start, stop)
+        for hm_proof in candidates:
+            if self.valid_proof(hm_last_proof, hm_proof, block_hash):
+                return hm_proof
+        return None
+
+
+class HexdigestPowEngine(ProofOfWorkEngine):
+    """Pierwotna implementacja: f-string + hexdigest() przy każdej próbie."""
+
+    def valid_proof(self, hm_last_proof, hm_proof, block_hash) -> bool:
+        hm_guess = f'{hm_last_proof}{hm_proof}{block_hash}'.encode()
+        hm_guess_hash = hashlib.sha256(hm_guess).hexdigest()
+        return hm_guess_hash[-len(self.target_suffix):] == self.target_suffix
+
+
+class MidstatePowEngine(ProofOfWorkEngine):
+    """
+    Domyślny silnik. Stałe części wejścia są kodowane raz na blok, a cel sprawdzany jest
+    na bajtach digest() zamiast na hexdigest().
+
+    Nonce leży między last_proof a block_hash, więc stan SHA-256 da się zapamiętać tylko dla
+    pełnych 64-bajtowych bloków prefiksu. Dla krótkiego prefiksu (typowy last_proof) kopiowanie
+    stanu jest wolniejsze niż jednorazowy hash, dlatego wtedy używany jest gotowy szablon bajtów.
+    """
+
+    def __init__(self, target_suffix: str = "239"):
+        super().__init__(target_suffix)
+        # "239" == ostatnie 12 bitów digestu; porównujemy je na końcowych bajtach
+        self._target_bytes = (len(target_suffix) + 1) // 2
+        self._target_mask = (1 << (4 * len(target_suffix))) - 1
+        self._target_value = int(target_suffix, 16)
+
+    def _matches(self, digest: bytes) -> bool:
+        tail = int.from_bytes(digest[-self._target_bytes:], "big")
+        return tail & self._target_mask == self._target_value
+
+    def valid_proof(self, hm_last_proof, hm_proof, block_hash) -> bool:
+        return self._matches(hashlib.sha256(b'%s%d%s' % (str(hm_last_proof).encode(), hm_proof,
+                                                           block_hash.encode())).digest())
+
+    def search(self, hm_last_proof, block_hash, start: int = 0, stop: int | None = None):
+        candidates = itertools.count(start) if stop is None else range(start, stop)
+        prefix = str(hm_last_proof).encode()
+        suffix = block_hash.encode().replace(b'%', b'%%')
+        sha256 = hashlib.sha256
+        from_bytes = int.from_bytes
+        tail, mask, value = -self._target_bytes, self._target_mask, self._target_value
+
+        midstate_len = len(prefix) - len(prefix) % 64
+        if midstate_len:
+            midstate = sha256(prefix[:midstate_len])
+            template = prefix[midstate_len:] + b'%d' + suffix
+            for hm_proof in candidates:
+                h = midstate.copy()
+                h.update(template % hm_proof)
+                if from_bytes(h.digest()[tail:], "big") & mask == value:
+                    return hm_proof
+            return None
+
+        template = prefix + b'%d' + suffix
+        for hm_proof in candidates:
+            if from_bytes(sha256(template % hm_proof).digest()[tail:], "big") & mask == value:
+                return hm_proof
+        return None
+
+
+POW_ENGINES = {
+    "hexdigest": HexdigestPowEngine,
+    "midstate": MidstatePowEngine
+}
+
+
+def _process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Pula procesów (kopanie, walidacja) w kontekście forkserver: procesy robocze powstają z czystego
+    procesu serwera, a nie przez fork procesu aplikacji, w którym działają wątki (worker kopania, zapis
+    mempoola) i pule połączeń — fork w chwili, gdy inny wątek trzyma blokadę, zakleszczyłby proces potomny.
+    Do procesów trafiają tylko dane (słowniki, krotki, silnik PoW), połączenia z bazą otwierają same.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["blockchain.blockchain_base"])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def _search_proof_range(pow_engine, hm_last_proof, block_hash, start, stop):
+    """Szuka najmniejszego poprawnego nonce w przedziale [start, stop) — uruchamiane w procesie roboczym."""
+    return pow_engine.search(hm_last_proof, block_hash, start, stop)
+
+
+def _check_block(pow_engine, block: dict, previous_block: dict | None, previous_hash: str | None,
+                 check_merkle: bool):
+    """Sprawdza pojedynczy blok względem poprzedniego. Zwraca (hash bloku, komunikat błędu albo None)."""
+    if previous_block:
+        # sprawdź hash poprzedniego bloku (każdy blok hashowany jest tylko raz)
+        if block['previous_hash'] != previous_hash:
+            return None, f"Nieprawidłowy poprzedni hash w bloku {block['index']}."
+
+        # sprawdź proof-of-work
+        if not pow_engine.valid_proof(previous_block['proof'], block['proof'], previous_hash):
+            return None, f"Nieprawidłowy dowód w bloku {block['index']}."
+
+    # stare bloki (v0) mają transakcje w samym hashu bloku, więc są sprawdzane przez powiązania
+    if check_merkle and block['version'] != BLOCK_FORMAT_LEGACY:
+        if BlockchainBase.create_merkle_root(block['transactions'], block['version']) != block['merkle_root']:
+            return None, f"Nieprawidłowy merkle_root w bloku {block['index']}."
+
+    block_hash = BlockchainBase.hm_block_hash(block)
+    if block.get('hash') and block['hash'] != block_hash:
+        return None, f"Zapisany hash bloku {block['index']} nie zgadza się z nagłówkiem."
+
+    return block_hash, None
+
+
+def _check_merkle_roots(blocks: list[tuple]):
+    """
+    Przelicza merkle_root bloków (index, wersja, merkle_root, transakcje) w procesie roboczym.
+    Zwraca (index pierwszego błędnego bloku albo None, liczba sprawdzonych transakcji).
+    """
+    transactions_checked = 0
+    for index, version, merkle_root, transactions in blocks:
+        if BlockchainBase.create_merkle_root(transactions, version) != merkle_root:
+            return index, transactions_checked
+        transactions_checked += len(transactions)
+    return None, transactions_checked
+
+
+def _validate_range(chain_cls, reader_spec, pow_engine, first_index: int, last_index: int, check_merkle: bool):
+    """
+    Sprawdza bloki [first_index, last_index] w procesie roboczym. Pobiera je sam (własnym połączeniem)
+    razem z blokiem granicznym first_index - 1, który sprawdza proces odpowiedzialny za poprzedni przedział.
+    """
+    boundary_index = max(first_index - 1, 1)
+    blocks = chain_cls.read_chain_range(reader_spec, boundary_index, last_index, check_merkle)
+
+    outcome = {'error': None, 'checked': 0, 'transactions': 0, 'boundary_hash': None, 'last_good': None}
+    previous_block = None
+    previous_hash = None
+    expected_index = first_index
+
+    if first_index > 1:
+        if not blocks or blocks[0]['index'] != boundary_index:
+            outcome['error'] = f"Brak bloku {boundary_index}."
+            return outcome
+        previous_block = blocks.pop(0)
+        previous_hash = BlockchainBase.hm_block_hash(previous_block)
+        outcome['boundary_hash'] = previous_hash
+        outcome['last_good'] = (boundary_index, previous_hash)
+
+    for block in blocks:
+        if block['index'] != expected_index:
+            outcome['error'] = f"Brak bloku {expected_index}."
+            return outcome
+
+        block_hash, error = _check_block(pow_engine, block, previous_block, previous_hash, check_merkle)
+        if error:
+            outcome['error'] = error
+            return outcome
+
+        previous_block, previous_hash = block, block_hash
+        outcome['checked'] += 1
+        if check_merkle and block['version'] != BLOCK_FORMAT_LEGACY:
+            outcome['transactions'] += len(block['transactions'])
+        outcome['last_good'] = (block['index'], block_hash)
+        expected_index += 1
+
+    if expected_index <= last_index:
+        outcome['error'] = f"Brak bloku {expected_index}."
+    return outcome
+
+
+class MempoolFullError(Exception):
+    """Mempool osiągnął pojemność — retry_after to sugerowany czas (s) do ponowienia."""
+
+    def __init__(self, chain_name: str, capacity: int, retry_after: int):
+        super().__init__(f"Mempool {chain_name} jest pełny ({capacity}). Spróbuj ponownie za {retry_after}s.")
+        self.chain_name = chain_name
+        self.capacity = capacity
+        self.retry_after = retry_after
+
+
+class MempoolReservation:
+    """
+    Miejsce na `count` transakcji zarezerwowane w mempoolach kilku łańcuchów naraz — wszystkie albo żaden.
+    Rezerwację robi się przed zapisem poza łańcuchem (salda, historia), żeby po commit przekazanie
+    transakcji do łańcuchów nie mogło już skończyć się MempoolFullError. Niewykorzystane miejsce
+    zwalnia release() (bezpieczne także po submit).
+    exempt=True — transakcje systemowe: miejsce jest liczone, ale bez sprawdzania pojemności.
+    """
+
+    # rezerwacje kolejnych żądań nie przeplatają się między łańcuchami; trzymana tylko na czas próby
+    # bez czekania i jej wycofania — czekanie na miejsce (overflow="block") odbywa się poza nią
+    _lock = threading.Lock()
+
+    def __init__(self, blockchains, count: int, exempt: bool = False):
+        blockchains = list(blockchains)
+        self.count = count
+        self._pending = []
+        waiting_since = {}  # łańcuch -> początek czekania (limit mempool_block_timeout liczony łącznie)
+        while True:
+            full = None
+            with self._lock:
+                try:
+                    for chain in blockchains:
+                        if not chain.try_reserve_mempool_space(count, exempt, holder=self):
+                            full = chain
+                            break
+                        self._pending.append(chain)
+                except BaseException:
+                    self.release()
+                    raise
+                if full is None:
+                    return
+                self.release()
+
+            # overflow="reject" — MempoolFullError; overflow="block" — czekanie na miejsce i kolejna próba
+            started = waiting_since.setdefault(full, time.monotonic())
+            full.ensure_mempool_capacity(count, timeout=full.mempool_block_timeout - (time.monotonic() - started))
+
+    def submit(self, transactions: list[dict], priority: int = 0):
+        """Przekazuje transakcje do każdego łańcucha na zarezerwowane miejsce."""
+        while self._pending:
+            chain = self._pending.pop(0)
+            chain.claim_mempool_reservation(self)
+            chain.hm_submit_transaction(transactions, priority=priority, reserved=True)
+
+    def take(self, chain) -> int:
+        """
+        Przekazuje miejsce zarezerwowane w łańcuchu `chain` wywołującemu (np. jako reserved ścieżki
+        masowej) — od tej chwili to on je zużywa albo zwalnia. Zwraca liczbę zarezerwowanych miejsc.
+        """
+        self._pending.remove(chain)
+        return chain.claim_mempool_reservation(self)
+
+    def release(self):
+        while self._pending:
+            self._pending.pop().release_mempool_space(self.count, holder=self)
 
 
 class BlockchainBase(ABC):
-    def __init__(self):
+    name = "base"
+
+    def __init__(self, parallel_mining: bool = False, mining_workers: int | None = None,
+                 mining_chunk_size: int | None = None, pow_engine: ProofOfWorkEngine | None = None,
+                 checkpoint_key: str | None = None, mempool_reconcile_interval: float = 60.0,
+                 pipelined_mining: bool = False, sealing_policy: SealingPolicy | None = None,
+                 mempool_capacity: int | None = None, mempool_overflow: str = "reject",
+                 mempool_block_timeout: float = 5.0, mempool_ttl: float | None = None,
+                 mempool_write_behind: bool = True):
+        init_start = time.perf_counter()
         self.hm_current_transactions = []
+        self.pow_engine = pow_engine or MidstatePowEngine()
+
+        # klucz HMAC podpisujący checkpointy walidacji (bez klucza walidacja zawsze od genesis)
+        self.checkpoint_key = checkpoint_key.encode() if checkpoint_key else None
+
+        # kopanie równoległe (pula procesów tworzona leniwie przy pierwszym bloku)
+        self.parallel_mining = parallel_mining
+        self.mining_workers = mining_workers or os.cpu_count() or 1
+        # None — przedział dobierany do trudności: cała runda ≈ oczekiwana liczba prób na blok
+        self.mining_chunk_size = mining_chunk_size or max(1, 16 ** len(self.pow_engine.target_suffix) // self.mining_workers)
+        self._mining_pool = None
+
+        # zapis bloku N w osobnym wątku w trakcie kopania bloku N+1 (ścieżki masowe z direct_blocks)
+        self.pipelined_mining = pipelined_mining
+
+        # kopanie w tle (blockchain.mining_worker.MiningWorker) — ustawiane przez aplikację
+        self.mining_worker = None
+        self._mining_lock = threading.RLock()  # jeden blok naraz, niezależnie od wątku
+
+        # ostatni blok bez transakcji (LazyBlock) — kopanie potrzebuje tylko proof i hasha
         self.last_block = self.get_last_block_from_db()
         if not self.last_block:
             self.last_block = self._create_genesis_block()
+        # hash ostatniego bloku liczony raz — potrzebny przy każdym kopaniu
+        self.last_block_hash = self._tip_hash(self.last_block)
+
+        # księga sald (salda z zatwierdzonych bloków) dogania łańcuch, jeśli jest za nim (nowa tabela, błąd zapisu)
+        self.sync_balance_ledger()
+        # blokada spinająca zapis bloku z usunięciem jego transakcji z salda mempoola — get_user_score
+        # nie widzi transakcji ani podwójnie, ani wcale
+        self._balance_lock = threading.Lock()
+        self._mempool_balances = {}  # {username: [saldo, wysłane, odebrane]} transakcji czekających w mempoolu
+        self.last_reconciliation = None  # ostatni raport reconcile_balances
+
+        # kiedy zamykać bloki (liczba transakcji / bajty / wiek najstarszej transakcji)
+        self.sealing_policy = sealing_policy or SealingPolicy()
+        # tx_limit ścieżki masowej, której końcówka czeka w mempoolu — obowiązuje też worker w tle,
+        # dopóki mempool się nie opróżni
+        self._mempool_tx_limit = None
+
+        # mempool w pamięci (kolejka priorytetowa), tabela mempoola zapisywana w tle — bez zapytań
+        # przy wyborze transakcji do bloku; mempool_write_behind=False czeka na zapis przy każdym przyjęciu
+        self._mempool_lock = threading.Lock()
+        self._mempool_space = threading.Condition(self._mempool_lock)  # budzi producentów czekających na miejsce
+        # miejsce zajęte, a jeszcze nie w indeksie: w toku jednego wywołania (zapis do mempoola, ścieżka masowa)
+        # i przez MempoolReservation — słabe referencje, więc rezerwacja porzucona bez release() przestaje się
+        # liczyć przy uzgadnianiu licznika
+        self._mempool_reserved = 0
+        self._mempool_reservations = weakref.WeakKeyDictionary()
+        self._mempool_index = MempoolIndex()
+        self.mempool_write_behind = mempool_write_behind
+        self.mempool_writer = MempoolWriteBehind(self, current_app._get_current_object() if has_app_context() else None)
+        # licznik zajętego miejsca: indeks + rezerwacje + transakcje w kopanym właśnie bloku
+        self._mempool_count = self._rebuild_mempool_index()
+        self._mempool_reconciled_at = time.monotonic()
+        self.mempool_reconcile_interval = mempool_reconcile_interval
+
+        # pojemność mempoola (None = bez limitu), zachowanie po jej osiągnięciu i TTL transakcji (s)
+        if mempool_overflow not in MEMPOOL_OVERFLOW_MODES:
+            raise ValueError(f"Nieznany tryb pełnego mempoola: {mempool_overflow}.")
+        if mempool_capacity is not None and mempool_capacity < self.sealing_policy.max_transactions:
+            raise ValueError("Pojemność mempoola musi mieścić co najmniej jeden pełny blok.")
+        self.mempool_capacity = mempool_capacity
+        self.mempool_overflow = mempool_overflow
+        self.mempool_block_timeout = mempool_block_timeout
+        self.mempool_ttl = mempool_ttl
+        self._avg_block_time = None  # średni czas zamknięcia bloku — do podpowiedzi retry_after
+        # liczniki backpressure — do doboru pojemności na podstawie rzeczywistego ruchu
+        self.backpressure = {
+            "rejected": 0,
+            "rejected_transactions": 0,
+            "blocked": 0,
+            "blocked_time": 0.0,
+            "timed_out": 0,
+            "evicted": 0,
+            "high_water": self._mempool_count
+        }
+
+        print(f"{self.name.upper()} inicjalizacja blockchaina: {time.perf_counter() - init_start:.3f}s "
+              f"(ostatni blok {self.last_block['index']}, mempool {self._mempool_count})")
 
     @abstractmethod
     def get_last_block_from_db(self):
+        """Ostatni blok łańcucha jako LazyBlock (transakcje ładowane na żądanie) albo None"""
         pass
 
+    def _tip_hash(self, block: dict) -> str:
+        """
+        Hash ostatniego bloku przy starcie: nagłówek v2 liczony od razu, starsze formaty z zapisanego
+        hasha — przeliczenie ich wymagałoby wczytania transakcji.
+        """
+        if block.get('version', BLOCK_FORMAT_LEGACY) == BLOCK_FORMAT_HEADER or not block.get('hash'):
+            return self.hm_block_hash(block)
+        return block['hash']
+
     @abstractmethod
     def save_block_to_db(self, block, transactions):
         pass
 
+    def save_blocks_to_db(self, blocks: list[tuple[dict, list[dict]]]):
+        """Zapisuje kilka zamkniętych bloków [(blok, transakcje), ...]. Backendy zapisują je jedną transakcją."""
+        for block, transactions in blocks:
+            self.save_block_to_db(block, transactions)
+
     @abstractmethod
-    def save_transactions_to_mempool(self, transactions: list[dict]):
+    def save_transactions_to_mempool(self, transactions: list[dict]) -> list:
+        """Zapisuje transakcje do tabeli mempoola (bez zmiany słowników), zwraca id wierszy w tej samej kolejności"""
         pass
 
     @abstractmethod
     def get_pending_transactions(self, limit):
-        """Pobiera określoną liczbę transakcji z mempoola"""
+        """Pobiera określoną liczbę transakcji z mempoola w kolejności przyjęcia (z id wiersza)"""
         pass
 
     @abstractmethod
@@ -35,26 +502,133 @@ class BlockchainBase(ABC):
         pass
 
     @abstractmethod
-    def clear_pending_transactions(self, transactions):
-        """Usuwa określone transakcje z mempoola w DB"""
+    def clear_pending_transactions(self, row_ids: list):
+        """Usuwa z mempoola w DB wiersze o podanych id"""
         pass
 
     @abstractmethod
-    def get_chain_batch(self, offset, limit) -> list[dict]:
-        """Zwraca ustaloną ilość bloków z bazy sortując po index"""
+    def count_sealed_transactions(self, transactions: list[dict]) -> Counter:
+        """
+        Ile transakcji łańcucha ma te same (sender, recipient, amount, date) co podane —
+        Counter po tej krotce; zapytanie tylko po datach podanych transakcji (indeks date)
+        """
         pass
 
-    def hm_proof_of_work(self, hm_last_proof, block_hash):
-        hm_proof = 0
-        while not self.hm_valid_proof(hm_last_proof, hm_proof, block_hash):
-            hm_proof += 1
-        return hm_proof
+    @abstractmethod
+    def iter_chain(self, after_index: int = 0, batch_size: int = 500,
+                   with_transactions: bool = True) -> Iterator[list[dict]]:
+        """
+        Strumieniowo zwraca bloki o indeksie > after_index, paczkami po batch_size, rosnąco po index.
+        Kolejne paczki pobierane są po kluczu (index > ostatni), bez OFFSET — koszt paczki nie rośnie
+        z długością łańcucha, a w pamięci trzymana jest tylko bieżąca paczka.
+        Przy with_transactions=False bloki v2 mogą nie mieć klucza 'transactions'.
+        """
+        pass
+
+    @abstractmethod
+    def get_chain_height(self) -> int:
+        """Zwraca najwyższy index bloku w bazie (0 dla pustego łańcucha)"""
+        pass
+
+    @abstractmethod
+    def range_reader_spec(self) -> dict:
+        """Zwraca dane połączenia (do przekazania do innego procesu) używane przez read_chain_range"""
+        pass
 
     @staticmethod
-    def hm_valid_proof(hm_last_proof, hm_proof, block_hash):
-        hm_guess = f'{hm_last_proof}{hm_proof}{block_hash}'.encode()
-        hm_guess_hash = hashlib.sha256(hm_guess).hexdigest()
-        return hm_guess_hash[-3:] == "239"
+    @abstractmethod
+    def read_chain_range(reader_spec: dict, first_index: int, last_index: int,
+                         with_transactions: bool) -> list[dict]:
+        """
+        Pobiera bloki o indeksach [first_index, last_index] własnym połączeniem z bazą —
+        wywoływane w procesie roboczym, bez kontekstu aplikacji Flask.
+        """
+        pass
+
+    @abstractmethod
+    def get_account_balance(self, username: str) -> dict | None:
+        """Saldo konta z księgi sald (tylko zatwierdzone bloki): {'balance', 'sent_count', 'received_count'}"""
+        pass
+
+    @abstractmethod
+    def get_ledger_block_index(self) -> int:
+        """Index ostatniego bloku ujętego w księdze sald (0 dla pustej księgi)"""
+        pass
+
+    @abstractmethod
+    def apply_balance_deltas(self, deltas: dict, block_index: int):
+        """
+        Dolicza do księgi sald zmiany {username: [saldo, wysłane, odebrane]} i przesuwa jej znacznik
+        na block_index. save_blocks_to_db robi to samo w transakcji zapisu bloków.
+        """
+        pass
+
+    @abstractmethod
+    def aggregate_transfer_pairs(self, max_block_index: int) -> Iterator[tuple]:
+        """
+        Strumieniowo zwraca (nadawca, odbiorca, suma kwot, liczba transakcji) dla transakcji bloków
+        o index <= max_block_index — jeden przebieg po transakcjach łańcucha, grupowanie w bazie
+        """
+        pass
+
+    @abstractmethod
+    def recompute_user_score(self, username: str) -> dict:
+        """
+        Saldo użytkownika przeliczone z transakcji łańcucha i tabeli mempoola (audyt księgi sald):
+        {'score', 'sent_count', 'received_count'}
+        """
+        pass
+
+    @abstractmethod
+    def get_checkpoint(self, depth: str) -> dict | None:
+        """Zwraca zapisany checkpoint walidacji o danej głębokości: {'index', 'hash', 'signature'}"""
+        pass
+
+    @abstractmethod
+    def save_checkpoint(self, checkpoint: dict):
+        """Zapisuje (nadpisuje) checkpoint walidacji o głębokości checkpoint['depth']"""
+        pass
+
+    def hm_proof_of_work(self, hm_last_proof, block_hash):
+        if self.parallel_mining and self.mining_workers > 1:
+            return self._hm_proof_of_work_parallel(hm_last_proof, block_hash)
+
+        return self.pow_engine.search(hm_last_proof, block_hash)
+
+    def _hm_proof_of_work_parallel(self, hm_last_proof, block_hash):
+        """
+        Dzieli przestrzeń nonce na rundy po `mining_workers` przedziałów.
+        Runda kończy się dopiero, gdy wszystkie przedziały zostaną sprawdzone, więc zwracany
+        jest zawsze najmniejszy poprawny nonce — ten sam, który znalazłaby pętla sekwencyjna.
+        """
+        pool = self._get_mining_pool()
+        chunk = self.mining_chunk_size
+        start = 0
+
+        while True:
+            futures = [
+                pool.submit(_search_proof_range, self.pow_engine, hm_last_proof, block_hash,
+                            start + i * chunk, start + (i + 1) * chunk)
+                for i in range(self.mining_workers)
+            ]
+            found = [f.result() for f in futures]
+            found = [proof for proof in found if proof is not None]
+            if found:
+                return min(found)
+            start += self.mining_workers * chunk
+
+    def _get_mining_pool(self):
+        if self._mining_pool is None:
+            self._mining_pool = _process_pool(self.mining_workers)
+        return self._mining_pool
+
+    def shutdown_mining_pool(self):
+        if self._mining_pool is not None:
+            self._mining_pool.shutdown(wait=True)
+            self._mining_pool = None
+
+    def hm_valid_proof(self, hm_last_proof, hm_proof, block_hash):
+        return self.pow_engine.valid_proof(hm_last_proof, hm_proof, block_hash)
 
     def _create_block(self, hm_proof, hm_previous_hash):
         block_index = self.last_block['index'] + 1 if self.last_block else 1
@@ -65,8 +639,10 @@ class BlockchainBase(ABC):
             'transactions': self.hm_current_transactions,
             'proof': hm_proof,
             'previous_hash': hm_previous_hash,
-            'merkle_root': self.create_merkle_root(self.hm_current_transactions)
+            'merkle_root': self.create_merkle_root(self.hm_current_transactions, CURRENT_BLOCK_FORMAT),
+            'version': CURRENT_BLOCK_FORMAT
         }
+        block_data['hash'] = self.hm_block_hash(block_data)
         self.hm_current_transactions = []
 
         return block_data
@@ -76,112 +652,936 @@ class BlockchainBase(ABC):
         self.save_block_to_db(block, [])
         return block
 
-    def _mine_block(self, tx_limit):
-        """Pomocnicza metoda — kopie blok, gdy mempool >= tx_limit"""
-        pending_txs = self.get_pending_transactions(tx_limit)
+    def _mine_block(self, tx_limit=None, partial: bool = False):
+        """
+        Pomocnicza metoda — kopie blok z mempoola. Rozmiar bloku: tx_limit, tx_limit końcówki ścieżki
+        masowej czekającej w mempoolu albo sealing_policy.
+        partial=True — blok niepełny (przekroczony wiek najstarszej transakcji).
+        Zwraca False, gdy bloku nie było z czego złożyć.
+        """
+        with self._mining_lock:
+            with self._mempool_lock:
+                tx_limit = tx_limit if tx_limit is not None else self._mempool_tx_limit
+                policy = self.sealing_policy if tx_limit is None else SealingPolicy(tx_limit)
+                entries = self._mempool_index.pop(policy.max_transactions)
+                pending_txs = [entry[2] for entry in entries]
+                sizes = [entry[3] for entry in entries]
+                # pełny blok mógł już zamknąć worker w tle
+                if not entries or (not partial and not policy.is_full(len(entries), sum(sizes))):
+                    self._mempool_index.restore(entries)
+                    return False
+                selected = len(policy.select(pending_txs, sizes))
+                self._mempool_index.restore(entries[selected:])
+                entries = entries[:selected]
 
-        if '_id' in pending_txs[0]:
-            pending_txs.sort(key=lambda tx: tx['_id'])
-        else:
-            pending_txs.sort(key=lambda tx: tx['id'])
+            with self._balance_lock:
+                try:
+                    self._seal_block([entry[2] for entry in entries])
+                except Exception:
+                    with self._mempool_lock:
+                        self._mempool_index.restore(entries)
+                    raise
+                self._remove_from_mempool(entries)
+            return True
 
-        self.hm_current_transactions = pending_txs
+    def _forge_block(self, transactions):
+        """Kopie blok z transakcji (w tej kolejności) i przesuwa czubek łańcucha w pamięci — bez zapisu do bazy."""
+        self.hm_current_transactions = transactions
 
-        proof = self.hm_proof_of_work(self.last_block['proof'], self.hm_hash(self.last_block))
-        block = self._create_block(proof, self.hm_hash(self.last_block))
+        proof = self.hm_proof_of_work(self.last_block['proof'], self.last_block_hash)
+        block = self._create_block(proof, self.last_block_hash)
 
-        self.save_block_to_db(block, pending_txs)
         self.last_block = block
+        self.last_block_hash = block['hash']
+        return block
+
+    def _seal_block(self, transactions):
+        """Kopie i zapisuje blok z podanych transakcji (w tej kolejności)."""
+        with self._mining_lock:
+            start = time.perf_counter()
+            previous = self.last_block, self.last_block_hash
+            block = self._forge_block(transactions)
+            try:
+                self.save_block_to_db(block, transactions)
+            except Exception:
+                self.last_block, self.last_block_hash = previous
+                raise
+            self._record_block_time(time.perf_counter() - start)
+            return block
+
+    def _record_block_time(self, seconds: float):
+        """Średnia krocząca czasu zamknięcia bloku — podstawa podpowiedzi retry_after."""
+        if self._avg_block_time is None:
+            self._avg_block_time = seconds
+        else:
+            self._avg_block_time = 0.8 * self._avg_block_time + 0.2 * seconds
+
+    def _seal_blocks_pipelined(self, batches: list[list[dict]]):
+        """
+        Kopie bloki z kolejnych paczek transakcji, a zapis do bazy wykonuje osobny wątek — proof-of-work
+        bloku N+1 potrzebuje tylko hasha bloku N, więc nie czeka na jego zapis.
+        Wątek zapisujący bierze wszystkie gotowe bloki naraz (save_blocks_to_db).
+        Błąd zapisu zatrzymuje kopanie: kolejne bloki nie są zapisywane, czubek łańcucha wraca do
+        ostatniego zapisanego bloku, a wyjątek przekazywany jest wywołującemu.
+        """
+        if not batches:
+            return
+        if len(batches) == 1:
+            self._seal_block(batches[0])
+            return
+
+        pending = queue.Queue()
+        failure = []
+        # zapis przez db.session wymaga kontekstu aplikacji także w wątku zapisującym
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def writer():
+            with app.app_context() if app else nullcontext():
+                finished = False
+                while not finished:
+                    sealed = [pending.get()]
+                    while not pending.empty():
+                        sealed.append(pending.get())
+                    if sealed[-1] is None:
+                        finished = True
+                        sealed.pop()
+                    if sealed and not failure:
+                        try:
+                            self.save_blocks_to_db(sealed)
+                        except Exception as e:
+                            failure.append(e)
+
+        with self._mining_lock:
+            start = time.perf_counter()
+            thread = threading.Thread(target=writer, name=f"{self.name}-block-writer", daemon=True)
+            thread.start()
+            try:
+                for transactions in batches:
+                    if failure:
+                        break
+                    pending.put((self._forge_block(transactions), transactions))
+            finally:
+                pending.put(None)
+                thread.join()
+
+            if failure:
+                self.last_block = self.get_last_block_from_db()
+                self.last_block_hash = self._tip_hash(self.last_block)
+                print(f"{self.name.upper()} zapis bloku nie powiódł się — kopanie przerwane na bloku "
+                      f"{self.last_block['index']}: {failure[0]}")
+                raise failure[0]
+            self._record_block_time((time.perf_counter() - start) / len(batches))
+
+    def seal_pending_blocks(self, tx_limit=None) -> int:
+        """
+        Kopie bloki, dopóki mempool wypełnia blok (tx_limit albo sealing_policy), a przy przekroczonym
+        wieku najstarszej transakcji także blok niepełny. Zwraca liczbę bloków.
+        """
+        mined = 0
+        while self._block_ready(tx_limit) and self._mine_block(tx_limit):
+            mined += 1
+        if tx_limit is None and len(self._mempool_index) and self.sealing_policy.is_expired(self.mempool_age):
+            mined += self._mine_block(partial=True)
+        return mined
+
+    def sealing_due(self) -> bool:
+        """Czy według sealing_policy trzeba zamknąć blok — sprawdzane na indeksie w pamięci (timer workera)."""
+        return self._block_ready() or (len(self._mempool_index) > 0 and self.sealing_policy.is_expired(self.mempool_age))
+
+    def _block_ready(self, tx_limit=None) -> bool:
+        waiting = len(self._mempool_index)
+        if tx_limit is None:
+            tx_limit = self._mempool_tx_limit
+        if tx_limit is not None:
+            return waiting >= tx_limit
+        return self.sealing_policy.is_full(waiting, self._mempool_index.size_bytes)
+
+    def hm_submit_transaction(self, transactions, tx_limit=None, priority: int = 0, reserved: bool = False):
+        """
+        Zapisuje transakcje do mempoola i wraca od razu — pełne bloki zamyka worker kopania w tle.
+        Rozmiar bloku: tx_limit albo (gdy None) sealing_policy łańcucha.
+        priority — mniejsza wartość trafia do bloku wcześniej (przy równej decyduje kolejność przyjęcia).
+        reserved=True — miejsce zajęte wcześniej przez reserve_mempool_space albo przejęte z rezerwacji
+        (claim_mempool_reservation) — bez kontroli pojemności.
+        Bez workera bloki kopane są w wątku wywołującym.
+        """
+        if not isinstance(transactions, list):
+            transactions = [transactions]
+        try:
+            self._reconcile_mempool_if_due()
+        except Exception:
+            if reserved:
+                self.release_mempool_space(len(transactions))
+            raise
+        self._add_to_mempool(transactions, priority, reserved)
+
+        if self._block_ready(tx_limit):
+            self._request_sealing(tx_limit)
 
-        self.clear_pending_transactions(pending_txs)
+    def _request_sealing(self, tx_limit=None):
+        if self.mining_worker is None or not self.mining_worker.submit(self, tx_limit):
+            # brak workera albo worker jest zatrzymywany — kopiemy na miejscu
+            self.seal_pending_blocks(tx_limit)
 
-    def hm_add_transaction_to_mempool(self, transactions, tx_limit):
+    def hm_add_transaction_to_mempool(self, transactions, tx_limit, direct_blocks: bool = False,
+                                      reserved: int | None = None):
+        """
+        direct_blocks=True (ścieżki masowe) — pełne bloki składane są wprost z listy transakcji,
+        bez zapisu do mempoola i ponownego odczytu; do mempoola trafia tylko niepełna końcówka.
+        Zawartość i kolejność bloków jest taka sama jak przy przejściu przez mempool.
+        Przy pipelined_mining kopanie kolejnego bloku nakłada się z zapisem poprzedniego.
+        Do opróżnienia mempoola także worker w tle zamyka bloki po tx_limit transakcji.
+        reserved — miejsce zajęte wcześniej przez MempoolReservation (przed zapisem historii): zapisy do
+        mempoola najpierw je zużywają, a ponad nie przyjmowane są bez kontroli pojemności — o przyjęciu
+        ścieżki masowej rozstrzygnęła już rezerwacja. Niewykorzystane miejsce jest zwalniane.
+        None — każdy zapis do mempoola sprawdza pojemność.
+        """
         if not isinstance(transactions, list):
             transactions = [transactions]
 
-        space_left = tx_limit - self.get_mempool_count()
+        budget = [reserved or 0]
+
+        def add_to_mempool(batch):
+            if reserved is None:
+                self._add_to_mempool(batch, tx_limit=tx_limit)
+                return
+            used = min(budget[0], len(batch))
+            budget[0] -= used
+            if len(batch) > used:
+                self.reserve_mempool_space(len(batch) - used, exempt=True)
+            self._add_to_mempool(batch, reserved=True, tx_limit=tx_limit)
+
+        try:
+            self._reconcile_mempool_if_due()
+            # transakcje czekające w indeksie — licznik obejmuje też rezerwacje, które nie trafią do bloku
+            waiting = len(self._mempool_index)
+            space_left = tx_limit - waiting
+            # pierwszy blok można złożyć bezpośrednio tylko wtedy, gdy w mempoolu nic nie czeka
+            direct_first = direct_blocks and waiting == 0
+
+            # --- przypadek 1: transakcji jest idealnie by wypełnić blok ---
+            if space_left == len(transactions):
+                if direct_first:
+                    self._seal_block(transactions)
+                else:
+                    add_to_mempool(transactions)
+                    self._mine_block(tx_limit)
+
+            # --- przypadek 2: mieści się wszystko, ale nie wypełnia bloku ---
+            elif space_left > len(transactions):
+                add_to_mempool(transactions)
+
+            # --- przypadek 3: transakcji jest więcej niż miejsca w bloku ---
+            elif space_left < len(transactions):
+                # najpierw dodajemy brakujące do pełnego bloku i tworzymy blok
+                first_batch = transactions[:space_left]
+                direct_batches = []
+                if direct_first:
+                    direct_batches.append(first_batch)
+                else:
+                    add_to_mempool(first_batch)
+                    self._mine_block(tx_limit)
+
+                x = (len(transactions) - space_left) // tx_limit
+                y = (len(transactions) - space_left) / tx_limit
+
+                for batch_nr in range(x):
+                    batch = transactions[(batch_nr * tx_limit + space_left):(batch_nr + 1) * tx_limit + space_left]
+                    if direct_blocks:
+                        direct_batches.append(batch)
+                    else:
+                        add_to_mempool(batch)
+                        self._mine_block(tx_limit)
+
+                if self.pipelined_mining:
+                    self._seal_blocks_pipelined(direct_batches)
+                else:
+                    for batch in direct_batches:
+                        self._seal_block(batch)
 
-        # --- przypadek 1: transakcji jest idealnie by wypełnić blok ---
-        if space_left == len(transactions):
-            self.save_transactions_to_mempool(transactions)
-            self._mine_block(tx_limit)
+                if x != y:
+                    batch = transactions[(x * tx_limit + space_left):(x + 1) * tx_limit + space_left]
+                    add_to_mempool(batch)
+        finally:
+            if budget[0]:
+                self.release_mempool_space(budget[0])
 
-        # --- przypadek 2: mieści się wszystko, ale nie wypełnia bloku ---
-        elif space_left > len(transactions):
-            self.save_transactions_to_mempool(transactions)
+    @property
+    def mempool_size(self) -> int:
+        """Liczba transakcji w mempoolu według licznika w pamięci (bez zapytania do bazy)."""
+        return self._mempool_count
 
-        # --- przypadek 3: transakcji jest więcej niż miejsca w bloku ---
-        elif space_left < len(transactions):
-            # najpierw dodajemy brakujące do pełnego bloku i tworzymy blok
-            first_batch = transactions[:space_left]
-            self.save_transactions_to_mempool(first_batch)
-            self._mine_block(tx_limit)
+    def reconcile_mempool_count(self) -> int | None:
+        """
+        Uzgadnianie co mempool_reconcile_interval sekund. Licznik zajętego miejsca przeliczany jest od nowa:
+        indeks (razem z kopanym blokiem) + miejsce zajęte w toku + żywe rezerwacje — różnica (np. rezerwacja
+        porzucona bez release()) jest poprawiana. Tabela mempoola porównywana jest z indeksem, który jest
+        źródłem prawdy — różnica (np. po błędzie zapisu w tle) jest tylko logowana; porównanie jest pomijane,
+        gdy zapis w tle ma zaległości. Zwraca liczbę wierszy w tabeli albo None.
+        """
+        actual = None
+        drift = 0
+        with self._mempool_space:
+            self._mempool_reconciled_at = time.monotonic()
+            expected = self._mempool_index.total + self._mempool_reserved + sum(self._mempool_reservations.values())
+            count_drift = self._mempool_count - expected
+            if count_drift:
+                self._mempool_count = expected
+                self._mempool_space.notify_all()
+            # wszystkie operacje zapisu zlecane są pod _mempool_lock — bez zaległości tabela się nie zmienia
+            if not self.mempool_writer.pending:
+                actual = self.get_mempool_count()
+                drift = actual - self._mempool_index.total
+        if count_drift:
+            print(f"{self.name.upper()} licznik mempoola poprawiony o {-count_drift} (teraz {expected})")
+        if drift:
+            print(f"{self.name.upper()} tabela mempoola różni się od indeksu o {drift} ({actual} wierszy)")
+        return actual
+
+    def mempool_maintenance_due(self) -> bool:
+        return time.monotonic() - self._mempool_reconciled_at >= self.mempool_reconcile_interval
 
-            x = (len(transactions) - space_left) // tx_limit
-            y = (len(transactions) - space_left) / tx_limit
+    def _reconcile_mempool_if_due(self):
+        if self.mempool_maintenance_due():
+            self.maintain_mempool()
 
-            for batch_nr in range(x):
-                batch = transactions[(batch_nr * tx_limit + space_left):(batch_nr + 1) * tx_limit + space_left]
-                self.save_transactions_to_mempool(batch)
-                self._mine_block(tx_limit)
-            if x != y:
-                batch = transactions[(x * tx_limit + space_left):(x + 1) * tx_limit + space_left]
-                self.save_transactions_to_mempool(batch)
+    def maintain_mempool(self) -> int:
+        """
+        Okresowe utrzymanie mempoola: usuwa transakcje starsze niż mempool_ttl i porównuje indeks z tabelą.
+        Zwraca liczbę usuniętych transakcji.
+        """
+        evicted = []
+        if self.mempool_ttl is not None:
+            cutoff = datetime.now() - timedelta(seconds=self.mempool_ttl)
+            with self._mempool_lock:
+                # transakcje kopanego właśnie bloku nie są już w kopcu, więc nie zostaną usunięte
+                evicted = self._mempool_index.remove_older_than(cutoff)
+                if evicted:
+                    self.mempool_writer.delete(evicted)
+                    self._update_mempool_balances(evicted, -1)
+                    self._mempool_count = max(0, self._mempool_count - len(evicted))
+                    if not len(self._mempool_index):
+                        self._mempool_tx_limit = None
+                    self.backpressure["evicted"] += len(evicted)
+                    self._mempool_space.notify_all()
+            if evicted:
+                print(f"{self.name.upper()} usunięto z mempoola {len(evicted)} transakcji starszych niż {self.mempool_ttl}s")
+
+        self.reconcile_mempool_count()
+        return len(evicted)
+
+    def _rebuild_mempool_index(self) -> int:
+        """
+        Odbudowuje indeks z tabeli mempoola (start aplikacji). Priorytety nie są zapisywane w tabeli —
+        odtworzone transakcje dostają domyślny, w kolejności przyjęcia, a ich wiek liczony jest od startu.
+        Wiersze transakcji zapisanych już w bloku (usunięcie w tle nie powiodło się albo nie zdążyło przed
+        końcem procesu) są usuwane z tabeli zamiast wracać do indeksu — zostałyby wykopane i policzone
+        w księdze sald drugi raz. Transakcje porównywane są po (sender, recipient, amount, date).
+        """
+        transactions = self.get_pending_transactions(self.get_mempool_count())
+        sealed = self.count_sealed_transactions(transactions) if transactions else Counter()
+        stale = []
+        pending = []
+        for tx in transactions:
+            row_id = tx.pop('_id') if '_id' in tx else tx.pop('id')
+            key = (tx['sender'], tx['recipient'], tx['amount'], tx['date'])
+            if sealed[key]:
+                sealed[key] -= 1
+                stale.append(row_id)
+                continue
+            self.mempool_writer.track(tx, row_id)
+            pending.append(tx)
+        if stale:
+            for i in range(0, len(stale), MempoolWriteBehind.DELETE_CHUNK):
+                self.clear_pending_transactions(stale[i:i + MempoolWriteBehind.DELETE_CHUNK])
+            print(f"{self.name.upper()} usunięto z tabeli mempoola {len(stale)} transakcji zapisanych już w blokach")
+        transactions = pending
+        sizes = list(map(self.transaction_size, transactions)) if self.sealing_policy.max_bytes is not None else None
+        self._mempool_index.push(transactions, sizes=sizes)
+        self._update_mempool_balances(transactions, 1)
+        return len(transactions)
+
+    def flush_mempool(self):
+        """Czeka na zapis zaległych zmian mempoola do bazy."""
+        self.mempool_writer.flush()
+
+    @property
+    def mempool_capacity_left(self) -> int | None:
+        if self.mempool_capacity is None:
+            return None
+        return max(0, self.mempool_capacity - self._mempool_count)
+
+    def ensure_mempool_capacity(self, count: int, timeout: float | None = None):
+        """
+        Sprawdza miejsce na count transakcji bez rezerwowania: przy pełnym mempoolu rzuca MempoolFullError
+        albo (overflow="block") czeka na miejsce najdłużej timeout sekund (domyślnie mempool_block_timeout).
+        MempoolReservation wywołuje ją poza swoją blokadą, między próbami rezerwacji.
+        """
+        self._wait_for_mempool_space(count, reserve=False, timeout=timeout)
+
+    def try_reserve_mempool_space(self, count: int, exempt: bool = False, holder=None) -> bool:
+        """
+        Zajmuje w liczniku miejsce na count transakcji bez czekania. False, gdy mempool jest pełny —
+        bez liczników backpressure, o odrzuceniu albo czekaniu decyduje wywołujący.
+        holder — MempoolReservation, do której należy miejsce (do claim/release).
+        """
+        with self._mempool_lock:
+            if not exempt and self.mempool_capacity is not None \
+                    and self._mempool_count + count > self.mempool_capacity:
+                return False
+            self._hold_mempool_space(count, holder)
+            return True
+
+    def reserve_mempool_space(self, count: int, exempt: bool = False):
+        """
+        Zajmuje w liczniku miejsce na count transakcji (jak przy zapisie do mempoola). Zużywa je
+        hm_submit_transaction(reserved=True), a niewykorzystane oddaje release_mempool_space.
+        exempt=True — bez sprawdzania pojemności (transakcje systemowe).
+        """
+        if exempt:
+            with self._mempool_lock:
+                self._hold_mempool_space(count)
+            return
+        self._wait_for_mempool_space(count, reserve=True)
+
+    def claim_mempool_reservation(self, holder) -> int:
+        """
+        Przejmuje miejsce rezerwacji `holder` na bieżące wywołanie (hm_submit_transaction(reserved=True),
+        reserved ścieżki masowej). Zwraca liczbę miejsc.
+        """
+        with self._mempool_lock:
+            count = self._mempool_reservations.pop(holder, 0)
+            self._mempool_reserved += count
+            return count
+
+    def release_mempool_space(self, count: int, holder=None):
+        with self._mempool_space:
+            if holder is None:
+                self._mempool_reserved = max(0, self._mempool_reserved - count)
+            else:
+                self._mempool_reservations.pop(holder, None)
+            self._mempool_count = max(0, self._mempool_count - count)
+            self._mempool_space.notify_all()
+
+    def _hold_mempool_space(self, count: int, holder=None):
+        """Zajmuje miejsce w liczniku (pod _mempool_lock) — dla rezerwacji `holder` albo bieżącego wywołania."""
+        self._mempool_count += count
+        if holder is None:
+            self._mempool_reserved += count
+        else:
+            self._mempool_reservations[holder] = self._mempool_reservations.get(holder, 0) + count
+        self.backpressure["high_water"] = max(self.backpressure["high_water"], self._mempool_count)
+
+    def _mempool_retry_after(self, needed: int) -> int:
+        """Sugerowany czas ponowienia: tyle bloków, ile trzeba zamknąć, razy średni czas bloku."""
+        blocks = math.ceil(needed / self.sealing_policy.max_transactions)
+        return max(1, math.ceil(blocks * (self._avg_block_time or 1.0)))
+
+    def _mempool_full(self, count: int, needed: int) -> MempoolFullError:
+        self.backpressure["rejected"] += 1
+        self.backpressure["rejected_transactions"] += count
+        return MempoolFullError(self.name, self.mempool_capacity, self._mempool_retry_after(needed))
+
+    def _wait_for_mempool_space(self, count: int, reserve: bool, timeout: float | None = None):
+        """
+        Sprawdza (i przy reserve=True zajmuje w liczniku) miejsce na count transakcji.
+        overflow="reject" — od razu MempoolFullError; overflow="block" — producent czeka na zmiennej
+        warunkowej _mempool_space, aż worker zamknie bloki, najdłużej timeout (mempool_block_timeout) sekund.
+        """
+        if timeout is None:
+            timeout = self.mempool_block_timeout
+        if self.mempool_capacity is None:
+            if reserve:
+                with self._mempool_lock:
+                    self._hold_mempool_space(count)
+            return
+
+        blocked_at = None
+        while True:
+            with self._mempool_space:
+                needed = self._mempool_count + count - self.mempool_capacity
+                if needed <= 0:
+                    if reserve:
+                        self._hold_mempool_space(count)
+                    if blocked_at is not None:
+                        self.backpressure["blocked_time"] += time.monotonic() - blocked_at
+                    return
+
+                # paczka większa niż cały mempool nigdy się nie zmieści
+                if self.mempool_overflow == "reject" or count > self.mempool_capacity:
+                    raise self._mempool_full(count, needed)
+
+                now = time.monotonic()
+                if blocked_at is None:
+                    blocked_at = now
+                    self.backpressure["blocked"] += 1
+                elif now - blocked_at >= timeout:
+                    self.backpressure["blocked_time"] += now - blocked_at
+                    self.backpressure["timed_out"] += 1
+                    raise self._mempool_full(count, needed)
+                remaining = timeout - (now - blocked_at)
+
+            # miejsce zwalnia zamknięcie bloku (albo zwolniona rezerwacja) — producent zgłasza tylko pełny
+            # blok i czeka na powiadomienie; niepełne bloki zamyka sealing_policy (max_age), nie backpressure
+            if self._block_ready():
+                self._request_sealing()
+            with self._mempool_space:
+                if self._mempool_count + count > self.mempool_capacity:
+                    self._mempool_space.wait(remaining)
+
+    @property
+    def mempool_age(self) -> float | None:
+        """Ile sekund czeka najstarsza transakcja w mempoolu (None dla pustego mempoola)."""
+        with self._mempool_lock:
+            oldest_at = self._mempool_index.oldest_added_at()
+        return time.monotonic() - oldest_at if oldest_at is not None else None
+
+    @staticmethod
+    def transaction_size(tx: dict) -> int:
+        """Rozmiar transakcji w bajtach (kodowanie binarne, jak w hashu bloku)."""
+        return len(encode_transaction(tx))
+
+    def _add_to_mempool(self, transactions, priority: int = 0, reserved: bool = False, tx_limit=None):
+        """tx_limit — końcówka ścieżki masowej: bloki z mempoola mają mieć tx_limit transakcji, nie sealing_policy."""
+        sizes = list(map(self.transaction_size, transactions)) if self.sealing_policy.max_bytes is not None else None
+        if not reserved:
+            self._wait_for_mempool_space(len(transactions), reserve=True)
+        with self._mempool_lock:
+            if tx_limit is not None:
+                self._mempool_tx_limit = tx_limit
+            self._mempool_index.push(transactions, priority, sizes)
+            self._mempool_reserved = max(0, self._mempool_reserved - len(transactions))
+            # zapis zlecany pod blokadą — w kolejności zmian indeksu
+            self.mempool_writer.insert(transactions)
+            self._update_mempool_balances(transactions, 1)
+        if not self.mempool_write_behind:
+            self.mempool_writer.flush()
+
+    def _remove_from_mempool(self, entries):
+        """Usuwa z mempoola wpisy indeksu (MempoolIndex.pop) zapisane już w bloku."""
+        with self._mempool_lock:
+            self._mempool_index.discard(entries)
+            transactions = [entry[2] for entry in entries]
+            self.mempool_writer.delete(transactions)
+            self._update_mempool_balances(transactions, -1)
+            self._mempool_count = max(0, self._mempool_count - len(entries))
+            if not len(self._mempool_index):
+                self._mempool_tx_limit = None
+            self._mempool_space.notify_all()
+
+    def _update_mempool_balances(self, transactions, sign: int):
+        """Zmienia saldo mempoola (wywoływane pod _mempool_lock). Konta bez czekających transakcji są usuwane."""
+        deltas = add_balance_deltas({}, transactions, sign)
+        for username, (balance, sent, received) in deltas.items():
+            entry = self._mempool_balances.setdefault(username, [0.0, 0, 0])
+            entry[0] += balance
+            entry[1] += sent
+            entry[2] += received
+            if not entry[1] and not entry[2]:
+                del self._mempool_balances[username]
+
+    def sync_balance_ledger(self, batch_size: int = 500) -> int:
+        """
+        Dolicza do księgi sald bloki, których w niej brakuje (index > znacznik księgi) — jeden przebieg
+        po łańcuchu, paczka po paczce. Przy pierwszym starcie z istniejącym łańcuchem buduje całą księgę.
+        Zwraca liczbę doliczonych bloków.
+        """
+        ledger_index = self.get_ledger_block_index()
+        if ledger_index >= self.last_block['index']:
+            return 0
+
+        start = time.perf_counter()
+        blocks = 0
+        for batch in self.iter_chain(after_index=ledger_index, batch_size=batch_size):
+            deltas = {}
+            for block in batch:
+                add_balance_deltas(deltas, block['transactions'])
+            self.apply_balance_deltas(deltas, batch[-1]['index'])
+            blocks += len(batch)
+        print(f"{self.name.upper()} księga sald uzupełniona o {blocks} bloków w {time.perf_counter() - start:.3f}s")
+        return blocks
+
+    def scan_account_balances(self) -> tuple[dict, int, int]:
+        """
+        Salda wszystkich kont jednym przebiegiem po łańcuchu (aggregate_transfer_pairs) plus mempool w pamięci.
+        Łańcuch czytany jest do wysokości z chwili migawki mempoola — blok zamknięty w trakcie skanu
+        nie liczy się ani podwójnie, ani wcale. Zwraca ({username: [saldo, wysłane, odebrane]},
+        liczbę transakcji łańcucha, wysokość łańcucha).
+        """
+        with self._balance_lock:
+            height = self.get_chain_height()
+            with self._mempool_lock:
+                balances = {username: list(entry) for username, entry in self._mempool_balances.items()}
+
+        rows = 0
+        for sender, recipient, amount, count in self.aggregate_transfer_pairs(height):
+            entry = balances.setdefault(recipient, [0.0, 0, 0])
+            entry[0] += amount
+            entry[2] += count
+            if sender != recipient:
+                entry = balances.setdefault(sender, [0.0, 0, 0])
+                entry[0] -= amount
+                entry[1] += count
+            rows += count
+        return balances, rows, height
+
+    def reconcile_balances(self, expected_scores, limit: int = 100) -> dict:
+        """
+        Porównuje salda wszystkich kont z łańcucha z oczekiwanymi (np. Users.score):
+        expected_scores — iterowalne (username, score), czytane strumieniowo. Raport (zapamiętany
+        w last_reconciliation) zawiera do `limit` największych rozbieżności i konta z łańcucha bez
+        odpowiednika (np. SYSTEM). Transakcje przyjmowane w trakcie mogą dać chwilowe rozbieżności.
+        """
+        started_at = datetime.now()
+        start = time.perf_counter()
+        balances, rows, height = self.scan_account_balances()
+        scan_time = time.perf_counter() - start
+
+        mismatches = []
+        checked = 0
+        for username, score in expected_scores:
+            checked += 1
+            balance, sent, received = balances.pop(username, (0.0, 0, 0))
+            expected, actual = round(balance, 8), round(score or 0, 8)
+            if expected != actual:
+                mismatches.append({
+                    "username": username,
+                    "expected": expected,
+                    "actual": actual,
+                    "difference": round(actual - expected, 8),
+                    "sent_count": sent,
+                    "received_count": received
+                })
+        mismatches.sort(key=lambda m: abs(m["difference"]), reverse=True)
+        wall_time = time.perf_counter() - start
+
+        report = {
+            "blockchain": self.name,
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "chain_height": height,
+            "transactions": rows,
+            "users_checked": checked,
+            "mismatch_count": len(mismatches),
+            "mismatches": mismatches[:limit],
+            "unknown_accounts": sorted(balances)[:limit],
+            "scan_time": round(scan_time, 3),
+            "wall_time": round(wall_time, 3),
+            "rows_per_second": round(rows / scan_time) if scan_time else None
+        }
+        self.last_reconciliation = report
+        print(f"{self.name.upper()} uzgodnienie sald: {checked} kont, {len(mismatches)} rozbieżności, "
+              f"{rows} transakcji w {scan_time:.3f}s")
+        return report
+
+    def get_user_score(self, username: str) -> dict:
+        """
+        Oczekiwane saldo użytkownika i liczba wysłanych/odebranych transakcji: wiersz księgi sald
+        plus transakcje czekające w mempoolu (w pamięci) — bez przeglądania łańcucha.
+        """
+        with self._balance_lock:
+            confirmed = self.get_account_balance(username) or {'balance': 0.0, 'sent_count': 0, 'received_count': 0}
+            with self._mempool_lock:
+                balance, sent, received = self._mempool_balances.get(username, (0.0, 0, 0))
+        return {
+            "score": confirmed['balance'] + balance,
+            "sent_count": confirmed['sent_count'] + sent,
+            "received_count": confirmed['received_count'] + received
+        }
+
+    def validate_chain(self, batch_size: int = 1000, depth: str = "links", mode: str = "incremental",
+                       workers: int = 1):
+        """
+        depth="links"  — sprawdza powiązania previous_hash, proof-of-work i zapisane hashe.
+                         Bloki v2 czytane są bez transakcji (hash obejmuje tylko nagłówek).
+        depth="merkle" — dodatkowo przelicza merkle_root z zapisanych transakcji.
+        mode="incremental" — sprawdza tylko bloki za podpisanym checkpointem tej samej głębokości
+                             (walidacja links nie przesuwa checkpointu merkle).
+        mode="full"        — sprawdza cały łańcuch od genesis.
+        workers > 1 — przedziały indeksów sprawdzane są równolegle w puli procesów.
+        Zwraca (poprawny, komunikat, statystyki).
+        """
+        if depth not in VALIDATION_DEPTHS:
+            raise ValueError(f"Nieznany tryb walidacji: {depth}.")
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Nieznany tryb walidacji: {mode}.")
+        check_merkle = depth == "merkle"
 
-    def validate_chain(self, batch_size: int = 1000):
         start_time = time.perf_counter()
+        checkpoint = self._load_checkpoint(depth) if mode == "incremental" else None
+
+        if workers > 1:
+            outcome = self._validate_parallel(checkpoint, batch_size, check_merkle, workers)
+        else:
+            outcome = self._validate_serial(checkpoint, batch_size, check_merkle)
+        error, highest_index, checked, last_good, transactions_checked = outcome
+
+        # checkpoint wskazuje ostatni blok, który przeszedł walidację
+        if last_good:
+            self._store_checkpoint(depth, *last_good)
+
+        end_time = time.perf_counter() - start_time
+        stats = {
+            "mode": "incremental" if checkpoint else "full",
+            "depth": depth,
+            "workers": workers,
+            "from_index": checkpoint['index'] if checkpoint else 0,
+            "checked_blocks": checked,
+            "time": round(end_time, 3)
+        }
+        if check_merkle:
+            stats["checked_transactions"] = transactions_checked
+            stats["tx_per_second"] = round(transactions_checked / end_time) if end_time > 0 else 0
+
+        if error:
+            return False, error, stats
+
+        message = f"Blockchain jest poprawny. {highest_index} bloków, sprawdzono {checked}."
+        if check_merkle:
+            message += f" Merkle: {transactions_checked} transakcji ({stats['tx_per_second']} tx/s)."
+        return True, f"{message} {round(end_time, 3)}s", stats
+
+    def _validate_serial(self, checkpoint, batch_size: int, check_merkle: bool):
+        """
+        Zwraca (błąd, najwyższy index, liczba sprawdzonych bloków, (index, hash) ostatniego poprawnego,
+        liczba transakcji sprawdzonych przez merkle_root).
+
+        Przy check_merkle powiązania sprawdzane są w tym procesie, a merkle_root każdej paczki
+        przeliczany jest w puli procesów — w tym czasie pobierana jest już kolejna paczka. W toku jest
+        najwyżej 2 × liczba procesów paczek (pamięć nie rośnie z długością łańcucha), a wyniki odbierane
+        są w kolejności paczek — pierwszy błędny merkle_root kończy przegląd.
+        """
         last_block = None
-        offset = 0
+        last_hash = None
         highest_index = 0  # zapamiętujemy największy index
+        checked = 0
+        link_error = None
+        last_good = None
+        transactions_checked = 0
 
-        while True:
-            batch = self.get_chain_batch(offset, batch_size)
-            if not batch:
-                break
-
-            for i, current_block in enumerate(batch):
-                if last_block:
-                    previous_block = last_block
-                elif i > 0:
-                    previous_block = batch[i - 1]
-                else:
-                    previous_block = None
+        # (future, [(index, hash), ...] bloków paczki poprzedzonych ostatnim blokiem poprzedniej paczki)
+        merkle_checks = deque()
+        merkle_workers = os.cpu_count() or 1
+        merkle_pool = _process_pool(merkle_workers) if check_merkle else None
 
-                if previous_block:
-                    # sprawdź hash poprzedniego bloku
-                    previous_hash = self.hm_hash(previous_block)
-                    if current_block['previous_hash'] != previous_hash:
-                        return False, f"Nieprawidłowy poprzedni hash w bloku {current_block['index']}."
+        def merkle_failure():
+            """Odbiera wynik najstarszej paczki merkle — przy błędzie zwraca wynik walidacji, inaczej None."""
+            nonlocal transactions_checked
+            future, batch_hashes = merkle_checks.popleft()
+            failed_index, tx_count = future.result()
+            transactions_checked += tx_count
+            if failed_index is None:
+                return None
+            hashes = dict(batch_hashes)
+            good = (failed_index - 1, hashes[failed_index - 1]) if failed_index - 1 in hashes else None
+            first_index = checkpoint['index'] + 1 if checkpoint else 1
+            return f"Nieprawidłowy merkle_root w bloku {failed_index}.", \
+                failed_index - 1, failed_index - first_index, good, transactions_checked
 
-                    # sprawdź proof-of-work
-                    if not self.hm_valid_proof(previous_block['proof'], current_block['proof'], previous_hash):
-                        return False, f"Nieprawidłowy dowód w bloku {current_block['index']}."
+        # przy checkpoincie pierwszym pobranym blokiem będzie sam blok z checkpointu — punkt zaczepienia
+        after_index = checkpoint['index'] - 1 if checkpoint else 0
 
-                last_block = current_block
-                highest_index = current_block['index']  # aktualizuj
+        try:
+            for batch in self.iter_chain(after_index, batch_size, with_transactions=check_merkle):
+                batch_hashes = [(last_block['index'], last_hash)] if last_block else []
+                merkle_blocks = []
 
-            offset += batch_size
+                for current_block in batch:
+                    if checkpoint and not last_block:
+                        if current_block['index'] != checkpoint['index'] \
+                                or self.hm_block_hash(current_block) != checkpoint['hash']:
+                            return f"Blok {checkpoint['index']} z checkpointu został zmieniony.", \
+                                highest_index, 0, None, 0
+                        last_block = current_block
+                        last_hash = checkpoint['hash']
+                        highest_index = current_block['index']
+                        batch_hashes.append((highest_index, last_hash))
+                        continue
 
-        end_time = time.perf_counter() - start_time
+                    block_hash, error = _check_block(self.pow_engine, current_block, last_block, last_hash, False)
+                    if error:
+                        link_error = error
+                        last_good = (last_block['index'], last_hash) if last_block else None
+                        break
+
+                    last_block = current_block
+                    last_hash = block_hash
+                    highest_index = current_block['index']  # aktualizuj
+                    checked += 1
+                    batch_hashes.append((highest_index, last_hash))
+                    # stare bloki (v0) mają transakcje w samym hashu bloku — sprawdzone przez powiązania
+                    if check_merkle and current_block['version'] != BLOCK_FORMAT_LEGACY:
+                        merkle_blocks.append((current_block['index'], current_block['version'],
+                                              current_block['merkle_root'], current_block['transactions']))
+
+                if merkle_blocks:
+                    # wyniki merkle odbierane w kolejności paczek — pierwszy błąd ma najniższy index;
+                    # gotowe odbierane od razu, a przy pełnej kolejce czekamy na najstarszą paczkę
+                    while merkle_checks and (merkle_checks[0][0].done() or len(merkle_checks) >= 2 * merkle_workers):
+                        failure = merkle_failure()
+                        if failure:
+                            return failure
+                    merkle_checks.append((merkle_pool.submit(_check_merkle_roots, merkle_blocks), batch_hashes))
+
+                if link_error:
+                    break
+
+            # błędy merkle dotyczą bloków przed błędem powiązań, więc są zgłaszane pierwsze
+            while merkle_checks:
+                failure = merkle_failure()
+                if failure:
+                    return failure
+        finally:
+            if merkle_pool:
+                merkle_pool.shutdown(cancel_futures=True)
 
-        return True, f"Blockchain jest poprawny. {highest_index} bloków. {round(end_time, 3)}s"
+        if link_error:
+            return link_error, highest_index, checked, last_good, transactions_checked
+
+        if checkpoint and not last_block:
+            return f"Brak bloku {checkpoint['index']} z checkpointu.", highest_index, 0, None, 0
+
+        last_good = (highest_index, last_hash) if last_block else None
+        return None, highest_index, checked, last_good, transactions_checked
+
+    def _validate_parallel(self, checkpoint, batch_size: int, check_merkle: bool, workers: int):
+        """
+        Dzieli łańcuch na przedziały po `batch_size` bloków. Każdy proces sam pobiera swój przedział
+        razem z blokiem granicznym i sprawdza go niezależnie. Wyniki czytane są w kolejności
+        przedziałów, więc pierwszy błąd ma najniższy index bloku.
+        """
+        first_index = checkpoint['index'] + 1 if checkpoint else 1
+        height = self.get_chain_height()
+        ranges = [(start, min(start + batch_size - 1, height)) for start in range(first_index, height + 1, batch_size)]
+
+        # nie ma czego dzielić — pula procesów tylko by spowolniła
+        if len(ranges) < 2:
+            return self._validate_serial(checkpoint, batch_size, check_merkle)
+
+        reader_spec = self.range_reader_spec()
+        checked = 0
+        transactions_checked = 0
+        last_good = checkpoint and (checkpoint['index'], checkpoint['hash'])
+
+        with _process_pool(workers) as pool:
+            futures = [
+                pool.submit(_validate_range, type(self), reader_spec, self.pow_engine, first, last, check_merkle)
+                for first, last in ranges
+            ]
+            for i, future in enumerate(futures):
+                outcome = future.result()
+
+                error = outcome['error']
+                if i == 0 and checkpoint and outcome['boundary_hash'] != checkpoint['hash']:
+                    error = f"Blok {checkpoint['index']} z checkpointu został zmieniony."
+                    last_good = None
+
+                checked += outcome['checked']
+                transactions_checked += outcome['transactions']
+                if error:
+                    for pending in futures[i + 1:]:
+                        pending.cancel()
+                    if outcome['last_good']:
+                        last_good = outcome['last_good']
+                    highest_index = outcome['last_good'][0] if outcome['last_good'] else 0
+                    return error, highest_index, checked, last_good, transactions_checked
+
+                last_good = outcome['last_good']
+
+        return None, height, checked, last_good, transactions_checked
+
+    def _sign_checkpoint(self, depth: str, index: int, block_hash: str) -> str:
+        message = f"{self.name}:{depth}:{index}:{block_hash}".encode()
+        return hmac.new(self.checkpoint_key, message, hashlib.sha256).hexdigest()
+
+    def _load_checkpoint(self, depth: str):
+        """Zwraca checkpoint danej głębokości z bazy tylko wtedy, gdy jego podpis jest poprawny."""
+        if not self.checkpoint_key:
+            return None
+        checkpoint = self.get_checkpoint(depth)
+        if not checkpoint:
+            return None
+        # głębokość jest częścią podpisu — checkpoint links nie przejdzie jako merkle
+        expected = self._sign_checkpoint(depth, checkpoint['index'], checkpoint['hash'])
+        if not hmac.compare_digest(expected, checkpoint['signature']):
+            print(f"{self.name.upper()} checkpoint walidacji ma nieprawidłowy podpis — walidacja od genesis")
+            return None
+        return checkpoint
+
+    def _store_checkpoint(self, depth: str, index: int, block_hash: str):
+        if not self.checkpoint_key:
+            return
+        self.save_checkpoint({
+            'depth': depth,
+            'index': index,
+            'hash': block_hash,
+            'signature': self._sign_checkpoint(depth, index, block_hash)
+        })
 
     @staticmethod
     def hm_hash(data):
         return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
 
-    def create_merkle_root(self, transactions):
+    @staticmethod
+    def hm_block_hash(block: dict) -> str:
+        """Hash bloku zgodny z jego wersją formatu (stare bloki nadal przez JSON)."""
+        version = block.get('version', BLOCK_FORMAT_LEGACY)
+        if version == BLOCK_FORMAT_LEGACY:
+            return BlockchainBase.hm_hash({field: block[field] for field in _LEGACY_BLOCK_FIELDS})
+        if version == BLOCK_FORMAT_BINARY:
+            return hashlib.sha256(encode_block(block)).hexdigest()
+        return hashlib.sha256(encode_block_header(block)).hexdigest()
+
+    @staticmethod
+    def hm_transaction_hash(tx: dict, version: int = BLOCK_FORMAT_LEGACY) -> str:
+        """Hash liścia drzewa Merkla dla transakcji z bloku w danej wersji formatu."""
+        if version == BLOCK_FORMAT_LEGACY:
+            return BlockchainBase.hm_hash(tx)
+        return hashlib.sha256(encode_transaction(tx)).hexdigest()
+
+    @staticmethod
+    def merkle_tree_levels(transactions, version: int = BLOCK_FORMAT_LEGACY) -> list[list[str]]:
+        """
+        Zwraca wszystkie poziomy drzewa Merkla: [0] to liście, [-1] to [merkle_root].
+        Ostatni węzeł nieparzystego poziomu łączony jest sam ze sobą — jego kopia nie jest przechowywana.
+        """
+        if not transactions:
+            return []
+        level = [BlockchainBase.hm_transaction_hash(tx, version) for tx in transactions]
+        levels = [level]
+        while len(level) > 1:
+            level = [hashlib.sha256((level[i] + level[min(i + 1, len(level) - 1)]).encode()).hexdigest()
+                     for i in range(0, len(level), 2)]
+            levels.append(level)
+        return levels
+
+    @staticmethod
+    def create_merkle_root(transactions, version: int = BLOCK_FORMAT_LEGACY):
         if not transactions:
             return None
-        hashes = [self.hm_hash(tx) for tx in transactions]
-        while len(hashes) > 1:
-            if len(hashes) % 2 != 0:
-                hashes.append(hashes[-1])
-            hashes = [hashlib.sha256((hashes[i] + hashes[i+1]).encode()).hexdigest()
-                      for i in range(0, len(hashes), 2)]
-        return hashes[0]
+        return BlockchainBase.merkle_tree_levels(transactions, version)[-1][0]
 
-    def get_merkle_proof(self, transactions: list[dict], tx_index: int) -> list[dict]:
+    @staticmethod
+    def merkle_proof_path(tx_index: int, leaf_count: int) -> list[tuple[int, int, str]]:
+        """
+        Węzły potrzebne do dowodu dla liścia tx_index: (poziom, pozycja sąsiada, strona sąsiada).
+        Po jednym węźle na poziom, czyli ok. log2(n) — tylko je trzeba odczytać z zapisanego drzewa.
+        """
+        path = []
+        level = 0
+        position = tx_index
+        size = leaf_count
+        while size > 1:
+            sibling = position ^ 1
+            if sibling >= size:  # ostatni nieparzysty węzeł — sąsiadem jest on sam
+                sibling = position
+            path.append((level, sibling, "right" if position % 2 == 0 else "left"))
+            position //= 2
+            size = (size + 1) // 2
+            level += 1
+        return path
+
+    def get_merkle_proof(self, transactions: list[dict], tx_index: int,
+                         version: int = BLOCK_FORMAT_LEGACY) -> list[dict]:
         """
         Zwraca Merkle Proof dla transakcji o danym indeksie w bloku.
         Proof to lista słowników: { 'position': 'left'/'right', 'hash': <string> }
@@ -189,38 +1589,18 @@ class BlockchainBase(ABC):
         if not transactions:
             return []
 
-        # Oblicz hash każdej transakcji
-        hashes = [self.hm_hash(tx) for tx in transactions]
-        index = tx_index
-        proof = []
-
-        while len(hashes) > 1:
-            if len(hashes) % 2 != 0:
-                hashes.append(hashes[-1])
-
-            new_hashes = []
-            for i in range(0, len(hashes), 2):
-                left, right = hashes[i], hashes[i+1]
-
-                # jeśli nasza transakcja była w tej parze → zapisz sąsiada do ścieżki
-                if i == index or i+1 == index:
-                    if index == i:  # nasz hash był po lewej
-                        proof.append({"position": "right", "hash": right})
-                    else:  # nasz hash był po prawej
-                        proof.append({"position": "left", "hash": left})
-                    index = len(new_hashes)
-
-                new_hashes.append(hashlib.sha256((left + right).encode()).hexdigest())
-
-            hashes = new_hashes
-
-        return proof
+        levels = self.merkle_tree_levels(transactions, version)
+        return [
+            {"position": side, "hash": levels[level][position]}
+            for level, position, side in self.merkle_proof_path(tx_index, len(transactions))
+        ]
 
-    def verify_merkle_proof(self, transaction: dict, proof: list[dict], merkle_root: str) -> bool:
+    def verify_merkle_proof(self, transaction: dict, proof: list[dict], merkle_root: str,
+                            version: int = BLOCK_FORMAT_LEGACY) -> bool:
         """
         Weryfikuje dowód Merkle Proof dla podanej transakcji.
         """
-        current_hash = self.hm_hash(transaction)
+        current_hash = self.hm_transaction_hash(transaction, version)
 
         for step in proof:
             if step["position"] == "left":
@@ -1,14 +1,85 @@
-from blockchain.blockchain_base import BlockchainBase
-from collections import defaultdict
+import itertools
+from blockchain.blockchain_base import BlockchainBase, LazyBlock, BLOCK_FORMAT_LEGACY, BLOCK_FORMAT_HEADER, \
+    add_balance_deltas
+from blockchain.mempool_index import MempoolWriteBehind
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
+from datetime import datetime
+
+# klienci tworzeni w procesach roboczych walidacji równoległej (po jednym na URI)
+_range_clients = {}
 
 
 class BlockchainMongo(BlockchainBase):
-    def __init__(self, mongo):
+    name = "mongo"
+
+    def __init__(self, mongo, mongo_uri: str | None = None, **kwargs):
         self.mongo = mongo
+        self.mongo_uri = mongo_uri  # potrzebny procesom roboczym, które łączą się z bazą samodzielnie
         self.blocks = self.mongo.db.blockchain_blocks
         self.transactions = self.mongo.db.blockchain_transactions
         self.mempool = self.mongo.db.mempool_transactions
-        super().__init__()
+        super().__init__(**kwargs)
+
+    # indeksy kolekcji łańcucha — te same co w modelach MySQL / SQLite (database/models.py)
+    INDEXES = {
+        "blockchain_blocks": [
+            IndexModel([("index", ASCENDING)], name="ix_blockchain_blocks_index", unique=True)
+        ],
+        "blockchain_transactions": [
+            # transakcje bloku czytane są zawsze w kolejności _id
+            IndexModel([("block_id", ASCENDING), ("_id", ASCENDING)], name="ix_blockchain_transactions_block_id"),
+            IndexModel([("sender", ASCENDING)], name="ix_blockchain_transactions_sender"),
+            IndexModel([("recipient", ASCENDING)], name="ix_blockchain_transactions_recipient"),
+            IndexModel([("date", ASCENDING)], name="ix_blockchain_transactions_date")
+        ],
+        "merkle_nodes": [
+            IndexModel([("block_id", ASCENDING), ("level", ASCENDING), ("position", ASCENDING)],
+                       name="ix_merkle_nodes_block_level_position", unique=True),
+            IndexModel([("block_id", ASCENDING), ("tx_id", ASCENDING)], name="ix_merkle_nodes_block_tx")
+        ]
+    }
+
+    @classmethod
+    def ensure_indexes(cls, mongo_db):
+        """
+        Zakłada indeksy kolekcji łańcucha. create_indexes jest idempotentny — przy kolejnych startach
+        tylko sprawdza istniejące. Indeks, którego nie da się założyć (np. unikalny przy zduplikowanych
+        danych), jest pomijany z ostrzeżeniem.
+        """
+        for collection, indexes in cls.INDEXES.items():
+            try:
+                mongo_db[collection].create_indexes(indexes)
+            except OperationFailure as e:
+                print(f"Nie udało się założyć indeksów kolekcji {collection} (mongo): {e}")
+
+    @staticmethod
+    def _block_to_dict(block, transactions=None) -> dict:
+        """Zamienia dokument bloku (i opcjonalnie jego transakcje) na słownik używany przez BlockchainBase."""
+        block_dict = {
+            "index": block["index"],
+            "timestamp": block["timestamp"],
+            "proof": block["proof"],
+            "previous_hash": block["previous_hash"],
+            "merkle_root": block["merkle_root"],
+            "version": block.get("version", BLOCK_FORMAT_LEGACY),
+            "hash": block.get("hash")
+        }
+        if transactions is not None:
+            block_dict["transactions"] = [
+                {
+                    "_id": tx["_id"],
+                    "sender": tx["sender"],
+                    "recipient": tx["recipient"],
+                    "amount": tx["amount"],
+                    "date": tx["date"]
+                }
+                for tx in transactions
+            ]
+        return block_dict
 
     def get_last_block_from_db(self):
         last_block = self.mongo.db.blockchain_blocks.find().sort("index", -1).limit(1)
@@ -20,69 +91,100 @@ class BlockchainMongo(BlockchainBase):
         lb = last_block[0]
         print(f"Mongo Last block loaded: index {lb['index']}")
 
-        # Pobranie transakcji powiązanych z tym blokiem
-        txs = self.mongo.db.blockchain_transactions.find(
-            {"block_id": lb["_id"]}
-        ).sort("_id", 1)
+        # transakcje powiązane z tym blokiem pobierane dopiero przy pierwszym odwołaniu
+        return LazyBlock(self._block_to_dict(lb), lambda: self._load_block_transactions(lb["_id"]))
 
-        block_dict = {
-            "index": lb["index"],
-            "timestamp": lb["timestamp"],
-            "transactions": [
-                {
-                    "_id": tx["_id"],
-                    "sender": tx["sender"],
-                    "recipient": tx["recipient"],
-                    "amount": tx["amount"],
-                    "date": tx["date"]
-                }
-                for tx in txs
-            ],
-            "proof": lb["proof"],
-            "previous_hash": lb["previous_hash"],
-            "merkle_root": lb["merkle_root"]
-        }
-
-        return block_dict
+    def _load_block_transactions(self, block_id) -> list[dict]:
+        txs = self.mongo.db.blockchain_transactions.find({"block_id": block_id}).sort("_id", 1)
+        return [
+            {"_id": tx["_id"], "sender": tx["sender"], "recipient": tx["recipient"], "amount": tx["amount"], "date": tx["date"]}
+            for tx in txs
+        ]
 
     def save_block_to_db(self, block, transactions):
-        if not transactions:
-            transactions = []
-
-        db_block = {
-            'index': block['index'],
-            'timestamp': block['timestamp'],
-            'proof': block['proof'],
-            'previous_hash': block['previous_hash'],
-            'merkle_root': block['merkle_root']
-        }
-        result = self.mongo.db.blockchain_blocks.insert_one(db_block)
-        block_id = result.inserted_id
+        self.save_blocks_to_db([(block, transactions)])
+
+    def save_blocks_to_db(self, blocks):
+        """
+        Zapisuje zamknięte bloki [(blok, transakcje), ...] trzema insert_many: nagłówki, transakcje
+        i węzły drzewa Merkla. Wstawianie jest uporządkowane (ordered) — bez replica setu Mongo
+        nie ma transakcji wielodokumentowych, więc przy błędzie zapisane zostają wcześniejsze dokumenty.
+        """
+        if not blocks:
+            return
 
-        db_txs = [
+        db_blocks = [
             {
-                '_id': tx['_id'],
-                'block_id': block_id,
-                'sender': tx['sender'],
-                'recipient': tx['recipient'],
-                'amount': tx['amount'],
-                'date': tx['date']
+                'index': block['index'],
+                'timestamp': block['timestamp'],
+                'proof': block['proof'],
+                'previous_hash': block['previous_hash'],
+                'merkle_root': block['merkle_root'],
+                'version': block.get('version', BLOCK_FORMAT_LEGACY),
+                'hash': block.get('hash')
             }
-            for tx in transactions
+            for block, _ in blocks
         ]
+        block_ids = self.mongo.db.blockchain_blocks.insert_many(db_blocks).inserted_ids
 
-        if db_txs:
-            self.mongo.db.blockchain_transactions.insert_many(db_txs)
+        # transakcje z własnym _id zachowują je, pozostałe dostają nowe
+        db_txs_by_block = [
+            [
+                {
+                    **({'_id': tx['_id']} if '_id' in tx else {}),
+                    'block_id': block_id,
+                    'sender': tx['sender'],
+                    'recipient': tx['recipient'],
+                    'amount': tx['amount'],
+                    'date': tx['date']
+                }
+                for tx in transactions or []
+            ]
+            for block_id, (_, transactions) in zip(block_ids, blocks)
+        ]
+        all_txs = [db_tx for db_txs in db_txs_by_block for db_tx in db_txs]
+        if all_txs:
+            self.mongo.db.blockchain_transactions.insert_many(all_txs)  # uzupełnia _id w słownikach
+
+            # blok jest niezmienny — zapisujemy całe drzewo Merkla, by dowód wymagał odczytu ~log2(n) węzłów
+            nodes = []
+            for block_id, db_block, db_txs, (_, transactions) in zip(block_ids, db_blocks, db_txs_by_block, blocks):
+                if not db_txs:
+                    continue
+                levels = self.merkle_tree_levels(transactions, db_block['version'])
+                nodes.extend(
+                    {
+                        'block_id': block_id,
+                        'level': level,
+                        'position': position,
+                        'hash': node_hash,
+                        **({'tx_id': db_txs[position]['_id']} if level == 0 else {})
+                    }
+                    for level, hashes in enumerate(levels)
+                    for position, node_hash in enumerate(hashes)
+                )
+            self.mongo.db.merkle_nodes.insert_many(nodes)
+
+        # księga sald po bloku — bez transakcji wielodokumentowych awaria między zapisami zostawia księgę
+        # za łańcuchem (dogania ją sync_balance_ledger przy starcie) albo, po zapisie sald, podwójnie
+        # policzone saldo, które wykrywa audyt (recompute_user_score)
+        deltas = {}
+        for _, transactions in blocks:
+            add_balance_deltas(deltas, transactions or [])
+        self.apply_balance_deltas(deltas, max(block['index'] for block, _ in blocks))
 
     def save_transactions_to_mempool(self, transactions):
         if not transactions:
-            return
+            return []
 
-        self.mongo.db.mempool_transactions.insert_many(transactions)
+        # kopie — insert_many dopisuje _id do słowników, a te należą do indeksu mempoola
+        return self.mongo.db.mempool_transactions.insert_many([dict(tx) for tx in transactions]).inserted_ids
 
     # --- Nowe metody wymagane przez BlockchainBase ---
     def get_pending_transactions(self, limit):
-        txs = self.mongo.db.mempool_transactions.find().sort('date', 1).limit(limit)
+        if not limit:
+            return []
+        txs = self.mongo.db.mempool_transactions.find().sort('_id', 1).limit(limit)
         return [
             {'_id': tx['_id'], 'sender': tx['sender'], 'recipient': tx['recipient'], 'amount': tx['amount'], 'date': tx['date']}
             for tx in txs
@@ -91,69 +193,136 @@ class BlockchainMongo(BlockchainBase):
     def get_mempool_count(self):
         return self.mongo.db.mempool_transactions.count_documents({})
 
-    def clear_pending_transactions(self, transactions):
-        if not transactions:
+    def clear_pending_transactions(self, row_ids):
+        if not row_ids:
             return
-        ids = [tx['_id'] for tx in transactions]
-        self.mongo.db.mempool_transactions.delete_many({'_id': {'$in': ids}})
-
-    def get_chain_batch(self, offset: int, limit: int) -> list[dict]:
-        """Pobiera fragment blockchaina z MongoDB w kolejności rosnącej po index."""
-
-        # Pobranie bloków
-        blocks = list(
+        self.mongo.db.mempool_transactions.delete_many({'_id': {'$in': row_ids}})
+
+    def count_sealed_transactions(self, transactions):
+        dates = list({tx['date'] for tx in transactions})
+        sealed = Counter()
+        for i in range(0, len(dates), MempoolWriteBehind.DELETE_CHUNK):
+            pipeline = [
+                {"$match": {"date": {"$in": dates[i:i + MempoolWriteBehind.DELETE_CHUNK]}}},
+                {"$group": {
+                    "_id": {"sender": "$sender", "recipient": "$recipient", "amount": "$amount", "date": "$date"},
+                    "count": {"$sum": 1}
+                }}
+            ]
+            for group in self.transactions.aggregate(pipeline):
+                key = group["_id"]
+                sealed[(key["sender"], key["recipient"], key["amount"], key["date"])] += group["count"]
+        return sealed
+
+    def iter_chain(self, after_index: int = 0, batch_size: int = 500,
+                   with_transactions: bool = True) -> Iterator[list[dict]]:
+        """
+        Strumieniowo pobiera blockchain jednym kursorem po zakresie index > after_index.
+        Kursor pobiera dokumenty z serwera porcjami po batch_size, bez skip().
+        """
+        cursor = (
             self.mongo.db.blockchain_blocks
-            .find()
+            .find({"index": {"$gt": after_index}})
             .sort("index", 1)
-            .skip(offset)
-            .limit(limit)
+            .batch_size(batch_size)
         )
-
+        try:
+            while True:
+                blocks = list(itertools.islice(cursor, batch_size))
+                if not blocks:
+                    return
+                yield self._blocks_with_transactions(self.mongo.db, blocks, with_transactions)
+        finally:
+            cursor.close()
+
+    @classmethod
+    def _blocks_with_transactions(cls, database, blocks, with_transactions: bool) -> list[dict]:
+        """Dokleja do bloków ich transakcje (jednym zapytaniem) i zamienia je na słowniki."""
         if not blocks:
             return []
 
-        # Pobranie wszystkich transakcji dla tych bloków jednym zapytaniem
-        block_ids = [block["_id"] for block in blocks]
-        all_txs = list(
-            self.mongo.db.blockchain_transactions
-            .find({"block_id": {"$in": block_ids}})
-            .sort("_id", 1)
-        )
+        # Pobranie potrzebnych transakcji dla tych bloków jednym zapytaniem
+        tx_block_ids = [
+            block["_id"] for block in blocks
+            if with_transactions or block.get("version", BLOCK_FORMAT_LEGACY) < BLOCK_FORMAT_HEADER
+        ]
+        all_txs = []
+        if tx_block_ids:
+            all_txs = list(
+                database.blockchain_transactions
+                .find({"block_id": {"$in": tx_block_ids}})
+                .sort("_id", 1)
+            )
 
         # Grupowanie transakcji według block_id
         tx_by_block = defaultdict(list)
         for tx in all_txs:
             tx_by_block[tx["block_id"]].append(tx)
 
-        # Tworzenie listy bloków z transakcjami
-        chain = []
-        for block in blocks:
-            block_dict = {
-                "index": block["index"],
-                "timestamp": block["timestamp"],
-                "transactions": [
-                    {
-                        "_id": tx["_id"],
-                        "sender": tx["sender"],
-                        "recipient": tx["recipient"],
-                        "amount": tx["amount"],
-                        "date": tx["date"],
-                    }
-                    for tx in tx_by_block[block["_id"]]
-                ],
-                "proof": block["proof"],
-                "previous_hash": block["previous_hash"],
-                "merkle_root": block["merkle_root"],
-            }
-            chain.append(block_dict)
+        # Tworzenie listy bloków (z transakcjami tam, gdzie zostały pobrane)
+        tx_block_ids = set(tx_block_ids)
+        return [
+            cls._block_to_dict(block, tx_by_block[block["_id"]] if block["_id"] in tx_block_ids else None)
+            for block in blocks
+        ]
 
-        return chain
+    def get_chain_height(self) -> int:
+        last_block = self.mongo.db.blockchain_blocks.find_one(sort=[("index", -1)], projection={"index": 1})
+        return last_block["index"] if last_block else 0
+
+    def range_reader_spec(self) -> dict:
+        if not self.mongo_uri:
+            raise RuntimeError("Walidacja równoległa Mongo wymaga mongo_uri.")
+        return {"uri": self.mongo_uri, "db": self.mongo.db.name}
+
+    @classmethod
+    def read_chain_range(cls, reader_spec: dict, first_index: int, last_index: int,
+                         with_transactions: bool) -> list[dict]:
+        client = _range_clients.get(reader_spec["uri"])
+        if client is None:
+            client = _range_clients[reader_spec["uri"]] = MongoClient(reader_spec["uri"])
+
+        database = client[reader_spec["db"]]
+        blocks = list(
+            database.blockchain_blocks
+            .find({"index": {"$gte": first_index, "$lte": last_index}})
+            .sort("index", 1)
+        )
+        return cls._blocks_with_transactions(database, blocks, with_transactions)
+
+    def get_checkpoint(self, depth: str):
+        checkpoint = self.mongo.db.validation_checkpoints.find_one({"_id": depth})
+        if not checkpoint:
+            return None
+        return {
+            "index": checkpoint["block_index"],
+            "hash": checkpoint["block_hash"],
+            "signature": checkpoint["signature"]
+        }
+
+    def save_checkpoint(self, checkpoint: dict):
+        self.mongo.db.validation_checkpoints.replace_one(
+            {"_id": checkpoint["depth"]},
+            {
+                "block_index": checkpoint["index"],
+                "block_hash": checkpoint["hash"],
+                "signature": checkpoint["signature"],
+                "validated_at": datetime.now()
+            },
+            upsert=True
+        )
 
     def get_transaction_proof(self, block_index: int, tx_id):
         block = self.mongo.db.blockchain_blocks.find_one({"index": block_index})
         if not block:
             return None
 
+        proof_data = self._stored_transaction_proof(block, tx_id)
+        if proof_data:
+            return proof_data
+
+        # bloki zapisane przed przechowywaniem drzewa — przebudowa z transakcji
+
         txs = list(
             self.mongo.db.blockchain_transactions
             .find({"block_id": block["_id"]})
@@ -175,22 +344,170 @@ class BlockchainMongo(BlockchainBase):
         if tx_index is None:
             return None
 
-        proof = self.get_merkle_proof(transactions, tx_index)
+        version = block.get("version", BLOCK_FORMAT_LEGACY)
+        proof = self.get_merkle_proof(transactions, tx_index, version)
         return {
             "transaction": transactions[tx_index],
             "proof": proof,
-            "merkle_root": block["merkle_root"]
+            "merkle_root": block["merkle_root"],
+            "version": version
+        }
+
+    def _stored_transaction_proof(self, block, tx_id):
+        """Buduje dowód z zapisanych węzłów drzewa (ok. log2(n) odczytów). None, gdy blok nie ma zapisanego drzewa."""
+        # tx_id przychodzi z API jako tekst, a _id transakcji to zwykle ObjectId
+        tx_ids = [tx_id, ObjectId(tx_id)] if ObjectId.is_valid(tx_id) else [tx_id]
+        leaf = self.mongo.db.merkle_nodes.find_one({"block_id": block["_id"], "level": 0, "tx_id": {"$in": tx_ids}})
+        if not leaf:
+            return None
+
+        last_leaf = self.mongo.db.merkle_nodes.find_one(
+            {"block_id": block["_id"], "level": 0}, sort=[("position", -1)], projection={"position": 1}
+        )
+        path = self.merkle_proof_path(leaf["position"], last_leaf["position"] + 1)
+
+        nodes = {}
+        if path:
+            rows = self.mongo.db.merkle_nodes.find({
+                "block_id": block["_id"],
+                "$or": [{"level": level, "position": position} for level, position, _ in path]
+            })
+            nodes = {(row["level"], row["position"]): row["hash"] for row in rows}
+
+        tx = self.mongo.db.blockchain_transactions.find_one({"_id": leaf["tx_id"]})
+        return {
+            "transaction": {
+                "_id": tx["_id"],
+                "sender": tx["sender"],
+                "recipient": tx["recipient"],
+                "amount": tx["amount"],
+                "date": tx["date"]
+            },
+            "proof": [{"position": side, "hash": nodes[(level, position)]} for level, position, side in path],
+            "merkle_root": block["merkle_root"],
+            "version": block.get("version", BLOCK_FORMAT_LEGACY)
         }
 
-    def get_user_score(self, username: str):
+    def get_transaction_proofs(self, block_index: int, tx_ids: list):
+        """
+        Dowody Merkla dla wielu transakcji jednego bloku:
+        {'merkle_root', 'version', 'proofs': {str(tx_id): {'transaction', 'proof'}}}.
+        Drzewo budowane/odczytywane jest raz, a węzły wspólne dla kilku ścieżek pobierane tylko raz.
+        Transakcji spoza bloku nie ma w 'proofs'.
+        """
+        block = self.mongo.db.blockchain_blocks.find_one({"index": block_index})
+        if not block:
+            return None
+
+        version = block.get("version", BLOCK_FORMAT_LEGACY)
+        tx_ids = {str(tx_id) for tx_id in tx_ids}
+        proofs = {}
+
+        last_leaf = self.mongo.db.merkle_nodes.find_one(
+            {"block_id": block["_id"], "level": 0}, sort=[("position", -1)], projection={"position": 1}
+        )
+
+        if last_leaf:
+            # zapisane drzewo — tylko węzły ze ścieżek żądanych transakcji
+            candidates = [ObjectId(tx_id) for tx_id in tx_ids if ObjectId.is_valid(tx_id)] + list(tx_ids)
+            leaves = self.mongo.db.merkle_nodes.find(
+                {"block_id": block["_id"], "level": 0, "tx_id": {"$in": candidates}}
+            )
+            paths = {leaf["tx_id"]: self.merkle_proof_path(leaf["position"], last_leaf["position"] + 1)
+                     for leaf in leaves}
+            needed = {(level, position) for path in paths.values() for level, position, _ in path}
+
+            nodes = {}
+            if needed:
+                rows = self.mongo.db.merkle_nodes.find({
+                    "block_id": block["_id"],
+                    "$or": [{"level": level, "position": position} for level, position in needed]
+                })
+                nodes = {(row["level"], row["position"]): row["hash"] for row in rows}
+
+            for tx in self.mongo.db.blockchain_transactions.find({"_id": {"$in": list(paths)}}):
+                proofs[str(tx["_id"])] = {
+                    "transaction": {
+                        "_id": tx["_id"],
+                        "sender": tx["sender"],
+                        "recipient": tx["recipient"],
+                        "amount": tx["amount"],
+                        "date": tx["date"]
+                    },
+                    "proof": [{"position": side, "hash": nodes[(level, position)]}
+                              for level, position, side in paths[tx["_id"]]]
+                }
+        else:
+            # bloki zapisane przed przechowywaniem drzewa — jedno przebudowanie dla wszystkich dowodów
+            transactions = [
+                {
+                    "_id": tx["_id"],
+                    "sender": tx["sender"],
+                    "recipient": tx["recipient"],
+                    "amount": tx["amount"],
+                    "date": tx["date"]
+                }
+                for tx in self.mongo.db.blockchain_transactions.find({"block_id": block["_id"]}).sort("_id", 1)
+            ]
+            levels = self.merkle_tree_levels(transactions, version)
+            for tx_index, tx in enumerate(transactions):
+                if str(tx["_id"]) in tx_ids:
+                    proofs[str(tx["_id"])] = {
+                        "transaction": tx,
+                        "proof": [{"position": side, "hash": levels[level][position]}
+                                  for level, position, side in self.merkle_proof_path(tx_index, len(transactions))]
+                    }
+
+        return {"merkle_root": block["merkle_root"], "version": version, "proofs": proofs}
+
+    def apply_balance_deltas(self, deltas: dict, block_index: int):
+        if deltas:
+            self.mongo.db.account_balances.bulk_write([
+                UpdateOne(
+                    {"_id": username},
+                    {"$inc": {"balance": balance, "sent_count": sent, "received_count": received}},
+                    upsert=True
+                )
+                for username, (balance, sent, received) in deltas.items()
+            ], ordered=False)
+        self.mongo.db.balance_ledger_state.replace_one({"_id": "chain"}, {"block_index": block_index}, upsert=True)
+
+    def get_ledger_block_index(self) -> int:
+        state = self.mongo.db.balance_ledger_state.find_one({"_id": "chain"})
+        return state["block_index"] if state else 0
+
+    def get_account_balance(self, username: str) -> dict | None:
+        return self.mongo.db.account_balances.find_one({"_id": username}, {"_id": 0})
+
+    def aggregate_transfer_pairs(self, max_block_index: int) -> Iterator[tuple]:
+        # jeden przebieg po kolekcji, $group w bazie; ObjectId bloków rośnie razem z index
+        last_block = self.mongo.db.blockchain_blocks.find_one(
+            {"index": {"$lte": max_block_index}}, {"_id": 1}, sort=[("index", -1)]
+        )
+        if not last_block:
+            return
+        pipeline = [
+            {"$match": {"block_id": {"$lte": last_block["_id"]}}},
+            {"$group": {
+                "_id": {"sender": "$sender", "recipient": "$recipient"},
+                "amount": {"$sum": "$amount"},
+                "count": {"$sum": 1}
+            }}
+        ]
+        for pair in self.mongo.db.blockchain_transactions.aggregate(pipeline, allowDiskUse=True, batchSize=5000):
+            yield pair["_id"]["sender"], pair["_id"]["recipient"], pair["amount"], pair["count"]
+
+    def recompute_user_score(self, username: str):
         # ---- 1. Zatwierdzone transakcje ----
+        # przelew do samego siebie liczy się tylko jako odebrany — jak w księdze sald
+        sent = {"$and": [{"$eq": ["$sender", username]}, {"$ne": ["$recipient", username]}]}
         pipeline_confirmed = [
             {"$match": {"$or": [{"sender": username}, {"recipient": username}]}},
             {"$group": {
                 "_id": None,
-                "sent_amount": {"$sum": {"$cond": [{"$eq": ["$sender", username]}, "$amount", 0]}},
+                "sent_amount": {"$sum": {"$cond": [sent, "$amount", 0]}},
                 "received_amount": {"$sum": {"$cond": [{"$eq": ["$recipient", username]}, "$amount", 0]}},
-                "sent_count": {"$sum": {"$cond": [{"$eq": ["$sender", username]}, 1, 0]}},
+                "sent_count": {"$sum": {"$cond": [sent, 1, 0]}},
                 "received_count": {"$sum": {"$cond": [{"$eq": ["$recipient", username]}, 1, 0]}}
             }}
         ]
@@ -211,9 +528,9 @@ class BlockchainMongo(BlockchainBase):
             {"$match": {"$or": [{"sender": username}, {"recipient": username}]}},
             {"$group": {
                 "_id": None,
-                "sent_amount": {"$sum": {"$cond": [{"$eq": ["$sender", username]}, "$amount", 0]}},
+                "sent_amount": {"$sum": {"$cond": [sent, "$amount", 0]}},
                 "received_amount": {"$sum": {"$cond": [{"$eq": ["$recipient", username]}, "$amount", 0]}},
-                "sent_count": {"$sum": {"$cond": [{"$eq": ["$sender", username]}, 1, 0]}},
+                "sent_count": {"$sum": {"$cond": [sent, 1, 0]}},
                 "received_count": {"$sum": {"$cond": [{"$eq": ["$recipient", username]}, 1, 0]}}
             }}
         ]
@@ -1,26 +1,36 @@
-from database.models import db, BlockchainBlockMySQL, BlockchainTransactionMySQL, MempoolTransactionMySQL
-from blockchain.blockchain_base import BlockchainBase
-from collections import defaultdict
+from database.models import db, BlockchainBlockMySQL, BlockchainTransactionMySQL, MempoolTransactionMySQL, \
+    ValidationCheckpointMySQL, MerkleNodeMySQL, AccountBalanceMySQL, BalanceLedgerStateMySQL
+from blockchain.blockchain_base import BlockchainBase, LazyBlock, BLOCK_FORMAT_LEGACY, BLOCK_FORMAT_HEADER, \
+    add_balance_deltas
+from blockchain.mempool_index import MempoolWriteBehind
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from sqlalchemy import and_, case, create_engine, func, insert, or_, select, tuple_
+from sqlalchemy.dialects.mysql import insert as upsert
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+# silniki tworzone w procesach roboczych walidacji równoległej (po jednym na URL)
+_range_engines = {}
 
 
 class BlockchainMYSQL(BlockchainBase):
-    def get_last_block_from_db(self):
-        # Pobranie ostatniego bloku z MySQL
-        last_block_db = BlockchainBlockMySQL.query.order_by(BlockchainBlockMySQL.index.desc()).first()
-
-        if not last_block_db:
-            return None
-
-        print(f"MYSQL Last block loaded: index {last_block_db.index}")
-
-        # Pobranie transakcji powiązanych z blokiem
-        transactions = BlockchainTransactionMySQL.query.filter_by(block_id=last_block_db.id).order_by(
-            BlockchainTransactionMySQL.id).all()
+    name = "mysql"
 
+    @staticmethod
+    def _block_to_dict(block, transactions=None) -> dict:
+        """Zamienia wiersz bloku (i opcjonalnie jego transakcje) na słownik używany przez BlockchainBase."""
         block_dict = {
-            'index': last_block_db.index,
-            'timestamp': last_block_db.timestamp,
-            'transactions': [
+            'index': block.index,
+            'timestamp': block.timestamp,
+            'proof': block.proof,
+            'previous_hash': block.previous_hash,
+            'merkle_root': block.merkle_root,
+            'version': block.version or BLOCK_FORMAT_LEGACY,
+            'hash': block.hash
+        }
+        if transactions is not None:
+            block_dict['transactions'] = [
                 {
                     'id': tx.id,
                     'sender': tx.sender,
@@ -29,47 +39,127 @@ class BlockchainMYSQL(BlockchainBase):
                     'date': tx.date
                 }
                 for tx in transactions
-            ],
-            'proof': last_block_db.proof,
-            'previous_hash': last_block_db.previous_hash,
-            'merkle_root': last_block_db.merkle_root
-        }
-
+            ]
         return block_dict
 
+    def get_last_block_from_db(self):
+        # Pobranie ostatniego bloku z MySQL
+        last_block_db = BlockchainBlockMySQL.query.order_by(BlockchainBlockMySQL.index.desc()).first()
+
+        if not last_block_db:
+            return None
+
+        print(f"MYSQL Last block loaded: index {last_block_db.index}")
+
+        # transakcje powiązane z blokiem pobierane dopiero przy pierwszym odwołaniu
+        block_id = last_block_db.id
+        return LazyBlock(self._block_to_dict(last_block_db), lambda: self._load_block_transactions(block_id))
+
+    def _load_block_transactions(self, block_id: int) -> list[dict]:
+        transactions = BlockchainTransactionMySQL.query.filter_by(block_id=block_id).order_by(
+            BlockchainTransactionMySQL.id).all()
+        return [
+            {'id': tx.id, 'sender': tx.sender, 'recipient': tx.recipient, 'amount': tx.amount, 'date': tx.date}
+            for tx in transactions
+        ]
+
     def save_block_to_db(self, block, transactions):
-        if not transactions:
-            transactions = []
-
-        db_block = BlockchainBlockMySQL(
-            index=block['index'],
-            timestamp=block['timestamp'],
-            proof=block['proof'],
-            previous_hash=block['previous_hash'],
-            merkle_root=block['merkle_root'],
-        )
-        db.session.add(db_block)
-        db.session.flush()
-
-        for tx in transactions:
-            db_tx = BlockchainTransactionMySQL(
-                block_id=db_block.id,
-                sender=tx['sender'],
-                recipient=tx['recipient'],
-                amount=tx['amount'],
-                date=tx['date']
-            )
-            db.session.add(db_tx)
+        self.save_blocks_to_db([(block, transactions)])
 
-        db.session.commit()
+    def save_blocks_to_db(self, blocks):
+        """
+        Zapisuje zamknięte bloki [(blok, transakcje), ...] w jednej transakcji bazy.
+        Instrukcje Core (executemany) zamiast obiektów ORM: jedna instrukcja na nagłówki, jedna na transakcje
+        i jedna na węzły drzewa Merkla, niezależnie od liczby bloków i transakcji.
+        """
+        if not blocks:
+            return
+
+        session = db.session
+        try:
+            session.execute(insert(BlockchainBlockMySQL.__table__), [
+                {
+                    'index': block['index'],
+                    'timestamp': block['timestamp'],
+                    'proof': block['proof'],
+                    'previous_hash': block['previous_hash'],
+                    'merkle_root': block['merkle_root'],
+                    'version': block.get('version', BLOCK_FORMAT_LEGACY),
+                    'hash': block.get('hash')
+                }
+                for block, _ in blocks
+            ])
+            # id nowych bloków (bez RETURNING, którego MySQL nie ma) — jedno zapytanie po index
+            block_ids = dict(session.execute(
+                select(BlockchainBlockMySQL.index, BlockchainBlockMySQL.id)
+                .where(BlockchainBlockMySQL.index.in_([block['index'] for block, _ in blocks]))
+                .order_by(BlockchainBlockMySQL.id.asc())
+            ).all())
+
+            tx_rows = [
+                {
+                    'block_id': block_ids[block['index']],
+                    'sender': tx['sender'],
+                    'recipient': tx['recipient'],
+                    'amount': tx['amount'],
+                    'date': tx['date']
+                }
+                for block, transactions in blocks
+                for tx in transactions or []
+            ]
+            if tx_rows:
+                session.execute(insert(BlockchainTransactionMySQL.__table__), tx_rows)
+
+                # id transakcji potrzebne liściom drzewa — w kolejności wstawienia w obrębie bloku
+                tx_ids = defaultdict(list)
+                for tx_id, block_id in session.execute(
+                    select(BlockchainTransactionMySQL.id, BlockchainTransactionMySQL.block_id)
+                    .where(BlockchainTransactionMySQL.block_id.in_(list(block_ids.values())))
+                    .order_by(BlockchainTransactionMySQL.id.asc())
+                ):
+                    tx_ids[block_id].append(tx_id)
+
+                # blok jest niezmienny — zapisujemy całe drzewo Merkla, by dowód wymagał odczytu ~log2(n) węzłów
+                node_rows = []
+                for block, transactions in blocks:
+                    if not transactions:
+                        continue
+                    block_id = block_ids[block['index']]
+                    levels = self.merkle_tree_levels(transactions, block.get('version', BLOCK_FORMAT_LEGACY))
+                    node_rows.extend(
+                        {
+                            'block_id': block_id,
+                            'level': level,
+                            'position': position,
+                            'hash': node_hash,
+                            'tx_id': tx_ids[block_id][position] if level == 0 else None
+                        }
+                        for level, hashes in enumerate(levels)
+                        for position, node_hash in enumerate(hashes)
+                    )
+                session.execute(insert(MerkleNodeMySQL.__table__), node_rows)
+
+            # księga sald w tej samej transakcji co bloki
+            deltas = {}
+            for _, transactions in blocks:
+                add_balance_deltas(deltas, transactions or [])
+            self._write_balance_deltas(session, deltas, max(block['index'] for block, _ in blocks))
+
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
 
     def save_transactions_to_mempool(self, transactions):
         if not transactions:
-            return
+            return []
 
         db_objects = [MempoolTransactionMySQL(**tx) for tx in transactions]
         db.session.add_all(db_objects)
+        db.session.flush()  # id nadane przy INSERT — odczyt przed commit nie odświeża obiektów
+        row_ids = [obj.id for obj in db_objects]
         db.session.commit()
+        return row_ids
 
     # --- Nowe metody wymagane przez BlockchainBase ---
     def get_pending_transactions(self, limit):
@@ -96,67 +186,136 @@ class BlockchainMYSQL(BlockchainBase):
         # Zwraca liczbę transakcji w mempoolu
         return MempoolTransactionMySQL.query.count()
 
-    def clear_pending_transactions(self, transactions):
-        # Usuwa z DB dokładnie te transakcje, które zostały już użyte w bloku
-        if not transactions:
+    def clear_pending_transactions(self, row_ids):
+        # Usuwa z DB wiersze transakcji, które zostały już użyte w bloku
+        if not row_ids:
             return
-        ids = [tx['id'] for tx in transactions]
-        MempoolTransactionMySQL.query.filter(MempoolTransactionMySQL.id.in_(ids)).delete(synchronize_session=False)
+        MempoolTransactionMySQL.query.filter(MempoolTransactionMySQL.id.in_(row_ids)).delete(synchronize_session=False)
         db.session.commit()
 
-    def get_chain_batch(self, offset: int, limit: int) -> list[dict]:
-        """Pobiera fragment blockchaina z bazy (paginacja)."""
-        # Pobranie bloków
-        blocks = (BlockchainBlockMySQL.query
-                  .order_by(BlockchainBlockMySQL.index.asc())
-                  .offset(offset)
-                  .limit(limit)
-                  .all())
-
+    def count_sealed_transactions(self, transactions):
+        tx = BlockchainTransactionMySQL
+        dates = list({t['date'] for t in transactions})
+        sealed = Counter()
+        for i in range(0, len(dates), MempoolWriteBehind.DELETE_CHUNK):
+            for sender, recipient, amount, date, count in db.session.execute(
+                select(tx.sender, tx.recipient, tx.amount, tx.date, func.count())
+                .where(tx.date.in_(dates[i:i + MempoolWriteBehind.DELETE_CHUNK]))
+                .group_by(tx.sender, tx.recipient, tx.amount, tx.date)
+            ):
+                sealed[(sender, recipient, amount, date)] += count
+        return sealed
+
+    def iter_chain(self, after_index: int = 0, batch_size: int = 500,
+                   with_transactions: bool = True) -> Iterator[list[dict]]:
+        """
+        Strumieniowo pobiera blockchain paczkami (keyset: WHERE index > ostatni index paczki).
+        Każda paczka to jedno zapytanie po indeksie — bez OFFSET, który skanowałby wcześniejsze wiersze.
+        """
+        last_index = after_index
+        while True:
+            blocks = db.session.scalars(
+                select(BlockchainBlockMySQL)
+                .where(BlockchainBlockMySQL.index > last_index)
+                .order_by(BlockchainBlockMySQL.index.asc())
+                .limit(batch_size)
+            ).all()
+            if not blocks:
+                return
+
+            last_index = blocks[-1].index
+            # mapa tożsamości sesji trzyma wiersze słabymi referencjami — poprzednie paczki zwalnia GC
+            yield self._blocks_with_transactions(db.session, blocks, with_transactions)
+
+            if len(blocks) < batch_size:
+                return
+
+    @classmethod
+    def _blocks_with_transactions(cls, session, blocks, with_transactions: bool) -> list[dict]:
+        """Dokleja do bloków ich transakcje (jednym zapytaniem) i zamienia je na słowniki."""
         if not blocks:
             return []
 
-        # Pobranie wszystkich transakcji dla tych bloków naraz
-        block_ids = [block.id for block in blocks]
-        all_txs = (BlockchainTransactionMySQL.query
-                   .filter(BlockchainTransactionMySQL.block_id.in_(block_ids))
-                   .order_by(BlockchainTransactionMySQL.id.asc())
-                   .all())
+        # Pobranie wszystkich potrzebnych transakcji dla tych bloków naraz
+        tx_block_ids = [
+            block.id for block in blocks
+            if with_transactions or (block.version or BLOCK_FORMAT_LEGACY) < BLOCK_FORMAT_HEADER
+        ]
+        all_txs = []
+        if tx_block_ids:
+            all_txs = session.scalars(
+                select(BlockchainTransactionMySQL)
+                .where(BlockchainTransactionMySQL.block_id.in_(tx_block_ids))
+                .order_by(BlockchainTransactionMySQL.id.asc())
+            ).all()
 
         # Grupowanie transakcji według block_id
         tx_by_block = defaultdict(list)
         for tx in all_txs:
             tx_by_block[tx.block_id].append(tx)
 
-        # Tworzenie listy bloków z transakcjami
-        chain = []
-        for block in blocks:
-            block_dict = {
-                'index': block.index,
-                'timestamp': block.timestamp,
-                'transactions': [
-                    {
-                        'id': tx.id,
-                        'sender': tx.sender,
-                        'recipient': tx.recipient,
-                        'amount': tx.amount,
-                        'date': tx.date
-                    }
-                    for tx in tx_by_block[block.id]
-                ],
-                'proof': block.proof,
-                'previous_hash': block.previous_hash,
-                'merkle_root': block.merkle_root
-            }
-            chain.append(block_dict)
+        # Tworzenie listy bloków (z transakcjami tam, gdzie zostały pobrane)
+        tx_block_ids = set(tx_block_ids)
+        return [
+            cls._block_to_dict(block, tx_by_block[block.id] if block.id in tx_block_ids else None)
+            for block in blocks
+        ]
 
-        return chain
+    def get_chain_height(self) -> int:
+        return db.session.query(func.max(BlockchainBlockMySQL.index)).scalar() or 0
+
+    def range_reader_spec(self) -> dict:
+        return {'url': db.engine.url.render_as_string(hide_password=False)}
+
+    @classmethod
+    def read_chain_range(cls, reader_spec: dict, first_index: int, last_index: int,
+                         with_transactions: bool) -> list[dict]:
+        engine = _range_engines.get(reader_spec['url'])
+        if engine is None:
+            engine = _range_engines[reader_spec['url']] = create_engine(reader_spec['url'])
+
+        with Session(engine) as session:
+            blocks = session.scalars(
+                select(BlockchainBlockMySQL)
+                .where(BlockchainBlockMySQL.index.between(first_index, last_index))
+                .order_by(BlockchainBlockMySQL.index.asc())
+            ).all()
+            return cls._blocks_with_transactions(session, blocks, with_transactions)
+
+    def get_checkpoint(self, depth: str):
+        checkpoint = ValidationCheckpointMySQL.query.filter_by(depth=depth).first()
+        if not checkpoint:
+            return None
+        return {
+            'index': checkpoint.block_index,
+            'hash': checkpoint.block_hash,
+            'signature': checkpoint.signature
+        }
+
+    def save_checkpoint(self, checkpoint: dict):
+        # upsert po głębokości — równoległe walidacje nadpisują ten sam wiersz zamiast dodawać kolejne
+        values = {
+            'block_index': checkpoint['index'],
+            'block_hash': checkpoint['hash'],
+            'signature': checkpoint['signature'],
+            'validated_at': datetime.now()
+        }
+        db.session.execute(upsert(ValidationCheckpointMySQL.__table__)
+                           .values(depth=checkpoint['depth'], **values)
+                           .on_duplicate_key_update(**values))
+        db.session.commit()
 
     def get_transaction_proof(self, block_index: int, tx_id):
         block = BlockchainBlockMySQL.query.filter_by(index=block_index).first()
         if not block:
             return None
 
+        proof_data = self._stored_transaction_proof(block, int(tx_id))
+        if proof_data:
+            return proof_data
+
+        # bloki zapisane przed przechowywaniem drzewa — przebudowa z transakcji
+
         txs = BlockchainTransactionMySQL.query.filter_by(block_id=block.id).order_by(BlockchainTransactionMySQL.id.asc()).all()
         transactions = [
             {"id": tx.id, "sender": tx.sender, "recipient": tx.recipient, "amount": tx.amount, "date": tx.date}
@@ -168,49 +327,185 @@ class BlockchainMYSQL(BlockchainBase):
         if tx_index is None:
             return None
 
-        proof = self.get_merkle_proof(transactions, tx_index)
+        version = block.version or BLOCK_FORMAT_LEGACY
+        proof = self.get_merkle_proof(transactions, tx_index, version)
         return {
             "transaction": transactions[tx_index],
             "proof": proof,
-            "merkle_root": block.merkle_root
+            "merkle_root": block.merkle_root,
+            "version": version
         }
 
-    @staticmethod
-    def get_user_score(username: str):
+    def _stored_transaction_proof(self, block, tx_id: int):
+        """Buduje dowód z zapisanych węzłów drzewa (ok. log2(n) odczytów). None, gdy blok nie ma zapisanego drzewa."""
+        leaf = MerkleNodeMySQL.query.filter_by(block_id=block.id, level=0, tx_id=tx_id).first()
+        if not leaf:
+            return None
+
+        leaf_count = db.session.query(func.max(MerkleNodeMySQL.position)).filter(
+            MerkleNodeMySQL.block_id == block.id, MerkleNodeMySQL.level == 0
+        ).scalar() + 1
+        path = self.merkle_proof_path(leaf.position, leaf_count)
+
+        nodes = {}
+        if path:
+            rows = MerkleNodeMySQL.query.filter(
+                MerkleNodeMySQL.block_id == block.id,
+                tuple_(MerkleNodeMySQL.level, MerkleNodeMySQL.position).in_(
+                    [(level, position) for level, position, _ in path]
+                )
+            ).all()
+            nodes = {(row.level, row.position): row.hash for row in rows}
+
+        tx = db.session.get(BlockchainTransactionMySQL, tx_id)
+        return {
+            "transaction": {"id": tx.id, "sender": tx.sender, "recipient": tx.recipient,
+                            "amount": tx.amount, "date": tx.date},
+            "proof": [{"position": side, "hash": nodes[(level, position)]} for level, position, side in path],
+            "merkle_root": block.merkle_root,
+            "version": block.version or BLOCK_FORMAT_LEGACY
+        }
+
+    def get_transaction_proofs(self, block_index: int, tx_ids: list):
         """
-        Zwraca oczekiwaną ilość punktów użytkownika `username`
-        oraz statystyki transakcji (ile wysłał/odebrał).
+        Dowody Merkla dla wielu transakcji jednego bloku:
+        {'merkle_root', 'version', 'proofs': {str(tx_id): {'transaction', 'proof'}}}.
+        Drzewo budowane/odczytywane jest raz, a węzły wspólne dla kilku ścieżek pobierane tylko raz.
+        Transakcji spoza bloku nie ma w 'proofs'.
         """
-        expected_score = 0
-
-        sent_count = 0
-        received_count = 0
+        block = BlockchainBlockMySQL.query.filter_by(index=block_index).first()
+        if not block:
+            return None
 
-        # 1. Transakcje z zatwierdzonych bloków
-        blocks = BlockchainBlockMySQL.query.order_by(BlockchainBlockMySQL.id.asc()).all()
-        for block in blocks:
-            txs = BlockchainTransactionMySQL.query.filter_by(block_id=block.id)\
-                .order_by(BlockchainTransactionMySQL.id.asc()).all()
+        version = block.version or BLOCK_FORMAT_LEGACY
+        tx_ids = {int(tx_id) for tx_id in tx_ids}
+        proofs = {}
+
+        last_position = db.session.query(func.max(MerkleNodeMySQL.position)).filter(
+            MerkleNodeMySQL.block_id == block.id, MerkleNodeMySQL.level == 0
+        ).scalar()
+
+        if last_position is not None:
+            # zapisane drzewo — tylko węzły ze ścieżek żądanych transakcji
+            leaves = MerkleNodeMySQL.query.filter(
+                MerkleNodeMySQL.block_id == block.id,
+                MerkleNodeMySQL.level == 0,
+                MerkleNodeMySQL.tx_id.in_(tx_ids)
+            ).all()
+            paths = {leaf.tx_id: self.merkle_proof_path(leaf.position, last_position + 1) for leaf in leaves}
+            needed = {(level, position) for path in paths.values() for level, position, _ in path}
+
+            nodes = {}
+            if needed:
+                rows = MerkleNodeMySQL.query.filter(
+                    MerkleNodeMySQL.block_id == block.id,
+                    tuple_(MerkleNodeMySQL.level, MerkleNodeMySQL.position).in_(list(needed))
+                ).all()
+                nodes = {(row.level, row.position): row.hash for row in rows}
+
+            txs = BlockchainTransactionMySQL.query.filter(BlockchainTransactionMySQL.id.in_(list(paths))).all()
             for tx in txs:
-                if tx.recipient == username:
-                    expected_score += tx.amount
-                    received_count += 1
-                elif tx.sender == username:
-                    expected_score -= tx.amount
-                    sent_count += 1
-
-        # 2. Transakcje z mempoola
-        mempool_txs = MempoolTransactionMySQL.query.order_by(MempoolTransactionMySQL.id.asc()).all()
-        for tx in mempool_txs:
-            if tx.recipient == username:
-                expected_score += tx.amount
-                received_count += 1
-            elif tx.sender == username:
-                expected_score -= tx.amount
-                sent_count += 1
+                proofs[str(tx.id)] = {
+                    "transaction": {"id": tx.id, "sender": tx.sender, "recipient": tx.recipient,
+                                    "amount": tx.amount, "date": tx.date},
+                    "proof": [{"position": side, "hash": nodes[(level, position)]}
+                              for level, position, side in paths[tx.id]]
+                }
+        else:
+            # bloki zapisane przed przechowywaniem drzewa — jedno przebudowanie dla wszystkich dowodów
+            txs = BlockchainTransactionMySQL.query.filter_by(block_id=block.id) \
+                .order_by(BlockchainTransactionMySQL.id.asc()).all()
+            transactions = [
+                {"id": tx.id, "sender": tx.sender, "recipient": tx.recipient, "amount": tx.amount, "date": tx.date}
+                for tx in txs
+            ]
+            levels = self.merkle_tree_levels(transactions, version)
+            for tx_index, tx in enumerate(transactions):
+                if tx["id"] in tx_ids:
+                    proofs[str(tx["id"])] = {
+                        "transaction": tx,
+                        "proof": [{"position": side, "hash": levels[level][position]}
+                                  for level, position, side in self.merkle_proof_path(tx_index, len(transactions))]
+                    }
+
+        return {"merkle_root": block.merkle_root, "version": version, "proofs": proofs}
 
+    @staticmethod
+    def _write_balance_deltas(session, deltas: dict, block_index: int):
+        """Upsert zmian sald (jedna instrukcja executemany) i znacznika księgi — bez commit."""
+        rows = [
+            {'username': username, 'balance': balance, 'sent_count': sent, 'received_count': received}
+            for username, (balance, sent, received) in deltas.items()
+        ]
+        if rows:
+            stmt = upsert(AccountBalanceMySQL.__table__)
+            session.execute(stmt.on_duplicate_key_update(
+                balance=AccountBalanceMySQL.balance + stmt.inserted.balance,
+                sent_count=AccountBalanceMySQL.sent_count + stmt.inserted.sent_count,
+                received_count=AccountBalanceMySQL.received_count + stmt.inserted.received_count
+            ), rows)
+        session.execute(upsert(BalanceLedgerStateMySQL.__table__)
+                        .values(id=1, block_index=block_index)
+                        .on_duplicate_key_update(block_index=block_index))
+
+    def apply_balance_deltas(self, deltas: dict, block_index: int):
+        session = db.session
+        try:
+            self._write_balance_deltas(session, deltas, block_index)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    def get_ledger_block_index(self) -> int:
+        return db.session.scalar(select(BalanceLedgerStateMySQL.block_index).where(BalanceLedgerStateMySQL.id == 1)) or 0
+
+    def get_account_balance(self, username: str) -> dict | None:
+        # zapytanie, nie session.get — obiekt z mapy tożsamości sesji mógłby być sprzed upsertu
+        account = db.session.execute(
+            select(AccountBalanceMySQL.balance, AccountBalanceMySQL.sent_count, AccountBalanceMySQL.received_count)
+            .where(AccountBalanceMySQL.username == username)
+        ).first()
+        return account._asdict() if account else None
+
+    def aggregate_transfer_pairs(self, max_block_index: int) -> Iterator[tuple]:
+        # jeden przebieg po tabeli transakcji, agregacja w bazie; id bloków rośnie razem z index
+        max_block_id = db.session.scalar(
+            select(func.max(BlockchainBlockMySQL.id)).where(BlockchainBlockMySQL.index <= max_block_index)
+        )
+        if max_block_id is None:
+            return
+        tx = BlockchainTransactionMySQL
+        yield from db.session.execute(
+            select(tx.sender, tx.recipient, func.sum(tx.amount), func.count())
+            .where(tx.block_id <= max_block_id)
+            .group_by(tx.sender, tx.recipient)
+            .execution_options(yield_per=5000)
+        )
+
+    @staticmethod
+    def _score_totals(model, username: str) -> tuple:
+        """(saldo, wysłane, odebrane) użytkownika z jednej tabeli transakcji — jedno zapytanie agregujące."""
+        received = model.recipient == username
+        sent = and_(model.sender == username, model.recipient != username)
+        return db.session.execute(
+            select(
+                func.coalesce(func.sum(case((received, model.amount), else_=0)), 0)
+                - func.coalesce(func.sum(case((sent, model.amount), else_=0)), 0),
+                func.count(case((sent, 1))),
+                func.count(case((received, 1)))
+            ).where(or_(model.sender == username, model.recipient == username))
+        ).one()
+
+    def recompute_user_score(self, username: str):
+        """
+        Zwraca oczekiwaną ilość punktów użytkownika `username`
+        oraz statystyki transakcji (ile wysłał/odebrał) — przeliczone z transakcji łańcucha i mempoola.
+        """
+        confirmed = self._score_totals(BlockchainTransactionMySQL, username)
+        mempool = self._score_totals(MempoolTransactionMySQL, username)
         return {
-            "score": expected_score,
-            "sent_count": sent_count,
-            "received_count": received_count
+            "score": confirmed[0] + mempool[0],
+            "sent_count": confirmed[1] + mempool[1],
+            "received_count": confirmed[2] + mempool[2]
         }
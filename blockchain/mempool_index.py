@@ -0,0 +1,199 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+
+class MempoolIndex:
+    """
+    Uporządkowany indeks mempoola w pamięci — kopiec wpisów (priorytet, kolejność przyjęcia, transakcja, rozmiar).
+    Mniejszy priorytet trafia do bloku wcześniej, przy równym decyduje kolejność przyjęcia.
+    Wybór k transakcji do bloku kosztuje O(k log n), bez zapytania do bazy.
+    Indeks nie jest bezpieczny wątkowo — chroni go _mempool_lock blockchaina.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._added_at = {}  # seq -> czas przyjęcia; także wpisy zdjęte do kopanego właśnie bloku
+        self._arrivals = deque()  # (seq, czas przyjęcia) w kolejności przyjęcia, wpisy usunięte pomijane leniwie
+        self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def total(self) -> int:
+        """Wpisy w kopcu razem ze zdjętymi do kopanego właśnie bloku."""
+        return len(self._added_at)
+
+    def push(self, transactions: list[dict], priority: int = 0, sizes: list[int] | None = None):
+        now = time.monotonic()
+        for tx, size in zip(transactions, sizes or itertools.repeat(0)):
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (priority, seq, tx, size))
+            self._added_at[seq] = now
+            self._arrivals.append((seq, now))
+            self.size_bytes += size
+
+    def pop(self, limit: int) -> list[tuple]:
+        """
+        Zdejmuje do limit wpisów w kolejności (priorytet, przyjęcie). Do czasu discard/restore
+        wpisy nadal liczą się do wieku najstarszej transakcji.
+        """
+        entries = []
+        while self._heap and len(entries) < limit:
+            entry = heapq.heappop(self._heap)
+            self.size_bytes -= entry[3]
+            entries.append(entry)
+        return entries
+
+    def restore(self, entries: list[tuple]):
+        """Zwraca zdjęte wpisy (niewybrane albo po nieudanym zapisie bloku) — z tym samym miejscem w kolejce."""
+        for entry in entries:
+            heapq.heappush(self._heap, entry)
+            self.size_bytes += entry[3]
+
+    def discard(self, entries: list[tuple]):
+        """Zapomina wpisy zdjęte do zapisanego już bloku."""
+        for entry in entries:
+            self._added_at.pop(entry[1], None)
+
+    def remove_older_than(self, cutoff) -> list[dict]:
+        """Usuwa transakcje z datą starszą niż cutoff (TTL) — przebudowa kopca, O(n)."""
+        kept, removed = [], []
+        for entry in self._heap:
+            (removed if entry[2]['date'] < cutoff else kept).append(entry)
+        if not removed:
+            return []
+        heapq.heapify(kept)
+        self._heap = kept
+        for entry in removed:
+            del self._added_at[entry[1]]
+            self.size_bytes -= entry[3]
+        return [entry[2] for entry in removed]
+
+    def oldest_added_at(self) -> float | None:
+        """Czas przyjęcia najstarszej transakcji (time.monotonic) albo None dla pustego indeksu."""
+        while self._arrivals and self._arrivals[0][0] not in self._added_at:
+            self._arrivals.popleft()
+        return self._arrivals[0][1] if self._arrivals else None
+
+
+class MempoolWriteBehind:
+    """
+    Zapis mempoola do bazy w tle (write-behind). Operacje trafiają do kolejki w kolejności zmian indeksu,
+    a wątek zapisujący wykonuje wszystkie zaległe naraz: jedno save_transactions_to_mempool
+    i usuwanie po id. Transakcja przyjęta i zabrana do bloku przed zapisem w ogóle nie trafia do tabeli.
+
+    Tabela służy tylko do odbudowy indeksu po restarcie — operacje niezapisane przed awarią procesu
+    przepadają, a błąd zapisu jest logowany i widoczny przy uzgadnianiu licznika. Wiersze transakcji,
+    których usunięcie przepadło, a które są już w bloku, pomija (i usuwa) odbudowa indeksu.
+    """
+
+    DELETE_CHUNK = 1000  # id w jednym DELETE ... IN (limit parametrów SQLite)
+
+    def __init__(self, blockchain, app=None):
+        self.blockchain = blockchain
+        self.app = app
+        self.queue = queue.Queue()
+        self._row_ids = {}  # id(tx) -> (tx, id wiersza); referencja do tx pilnuje, by id() nie został użyty ponownie
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.inserted = 0
+        self.deleted = 0
+        self.skipped = 0  # przyjęte i zabrane do bloku przed zapisem
+        self.last_error = None
+
+    def track(self, tx: dict, row_id):
+        """Rejestruje transakcję już zapisaną w tabeli (odbudowa indeksu po restarcie)."""
+        self._row_ids[id(tx)] = (tx, row_id)
+
+    def insert(self, transactions: list[dict]):
+        self._put(("insert", transactions))
+
+    def delete(self, transactions: list[dict]):
+        self._put(("delete", transactions))
+
+    @property
+    def pending(self) -> int:
+        return self.queue.unfinished_tasks
+
+    def flush(self):
+        """Czeka, aż wszystkie zlecone operacje trafią do bazy."""
+        self.queue.join()
+
+    def shutdown(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            self.queue.put(None)
+            thread.join()
+
+    def _put(self, op):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{self.blockchain.name}-mempool-writer",
+                                                daemon=True)
+                self._thread.start()
+            self.queue.put(op)
+
+    def _run(self):
+        while True:
+            ops = [self.queue.get()]
+            while True:
+                try:
+                    ops.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                # osobny kontekst aplikacji (i sesja SQLAlchemy) na każdą paczkę operacji
+                with self.app.app_context() if self.app else nullcontext():
+                    self._apply([op for op in ops if op is not None])
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"{self.blockchain.name.upper()} błąd zapisu mempoola w tle: {e}")
+            finally:
+                for _ in ops:
+                    self.queue.task_done()
+            if ops[-1] is None:
+                return
+
+    def _apply(self, ops: list[tuple]):
+        pending = {}  # id(tx) -> tx w kolejności przyjęcia
+        deletes = []
+        for kind, transactions in ops:
+            if kind == "insert":
+                for tx in transactions:
+                    pending[id(tx)] = tx
+                continue
+            for tx in transactions:
+                if pending.pop(id(tx), None) is not None:
+                    self.skipped += 1
+                    continue
+                known = self._row_ids.pop(id(tx), None)
+                if known is not None:
+                    deletes.append(known[1])
+
+        for i in range(0, len(deletes), self.DELETE_CHUNK):
+            self.blockchain.clear_pending_transactions(deletes[i:i + self.DELETE_CHUNK])
+        self.deleted += len(deletes)
+        if pending:
+            transactions = list(pending.values())
+            row_ids = self.blockchain.save_transactions_to_mempool(transactions)
+            for tx, row_id in zip(transactions, row_ids):
+                self._row_ids[id(tx)] = (tx, row_id)
+            self.inserted += len(transactions)
+
+    def status(self) -> dict:
+        return {
+            "pending_operations": self.pending,
+            "inserted": self.inserted,
+            "deleted": self.deleted,
+            "skipped": self.skipped,
+            "last_error": self.last_error
+        }
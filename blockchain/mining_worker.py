@@ -0,0 +1,135 @@
+import queue
+import threading
+import time
+
+
+class MiningWorker:
+    """
+    Wątek kopiący bloki w tle. Żądania HTTP tylko zapisują transakcje do mempoola i zgłaszają
+    blockchain do zamknięcia bloku — proof-of-work, save_block_to_db i czyszczenie mempoola
+    wykonywane są tutaj, poza wątkiem żądania.
+
+    Co tick sekund worker sprawdza też (w pamięci) sealing_policy każdego łańcucha
+    i zamyka niepełne bloki, gdy najstarsza transakcja czeka za długo, a co
+    mempool_reconcile_interval usuwa przeterminowane transakcje (mempool_ttl).
+    """
+
+    def __init__(self, app, blockchains=(), tick: float = 1.0, name: str = "mining-worker"):
+        self.app = app
+        self.blockchains = list(blockchains)
+        self.tick = tick
+        self.name = name
+        self.queue = queue.Queue()
+
+        self._lock = threading.Lock()
+        self._queued = set()  # blockchainy, które już czekają w kolejce (bez duplikatów zadań)
+        self._thread = None
+        self._accepting = False
+
+        # statystyki do /mining_status
+        self.started_at = None
+        self.blocks_mined = 0
+        self.jobs_done = 0
+        self.mining_time = 0.0
+        self.last_error = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._accepting = True
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, blockchain, tx_limit: int | None = None) -> bool:
+        """
+        Zgłasza blockchain do zamknięcia bloków (tx_limit=None — według jego sealing_policy).
+        Zwraca False, gdy worker nie przyjmuje zadań.
+        """
+        with self._lock:
+            if not self._accepting:
+                return False
+            if blockchain.name in self._queued:
+                return True  # zadanie już czeka — i tak zamknie wszystkie pełne bloki
+            self._queued.add(blockchain.name)
+        self.queue.put((blockchain, tx_limit))
+        return True
+
+    def _run(self):
+        last_check = time.monotonic()
+        while True:
+            # timer sprawdza polityki także wtedy, gdy kolejka nie pustoszeje
+            if time.monotonic() - last_check >= self.tick:
+                self._check_sealing_policies()
+                last_check = time.monotonic()
+            try:
+                job = self.queue.get(timeout=self.tick)
+            except queue.Empty:
+                continue
+            try:
+                if job is None:
+                    return
+                blockchain, tx_limit = job
+                with self._lock:
+                    # zgłoszenia od tej chwili trafią do kolejki jako nowe zadanie
+                    self._queued.discard(blockchain.name)
+                self._seal(blockchain, tx_limit)
+            finally:
+                self.queue.task_done()
+
+    def _check_sealing_policies(self):
+        for blockchain in self.blockchains:
+            if blockchain.mempool_maintenance_due():
+                self._maintain(blockchain)
+            if blockchain.sealing_due():
+                self.submit(blockchain)
+
+    def _maintain(self, blockchain):
+        # TTL mempoola i uzgadnianie licznika także wtedy, gdy nie przychodzą nowe transakcje
+        try:
+            with self.app.app_context():
+                blockchain.maintain_mempool()
+        except Exception as e:
+            self.last_error = f"{blockchain.name}: {e}"
+            print(f"{blockchain.name.upper()} błąd utrzymania mempoola: {e}")
+
+    def _seal(self, blockchain, tx_limit: int | None):
+        start = time.perf_counter()
+        try:
+            # osobny kontekst aplikacji (i sesja SQLAlchemy) na każde zadanie
+            with self.app.app_context():
+                mined = blockchain.seal_pending_blocks(tx_limit)
+        except Exception as e:
+            self.last_error = f"{blockchain.name}: {e}"
+            print(f"{blockchain.name.upper()} błąd kopania w tle: {e}")
+            return
+        finally:
+            self.mining_time += time.perf_counter() - start
+
+        self.blocks_mined += mined
+        self.jobs_done += 1
+
+    def status(self) -> dict:
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "accepting": self._accepting,
+            "queue_depth": self.queue.qsize(),
+            "queued_chains": sorted(self._queued),
+            "jobs_done": self.jobs_done,
+            "blocks_mined": self.blocks_mined,
+            "blocks_per_second": round(self.blocks_mined / self.mining_time, 3) if self.mining_time else 0,
+            "mining_time": round(self.mining_time, 3),
+            "uptime": round(time.time() - self.started_at, 3) if self.started_at else 0,
+            "last_error": self.last_error
+        }
+
+    def shutdown(self, timeout: float | None = None):
+        """Przestaje przyjmować zadania, kopie wszystko, co już jest w kolejce, i zatrzymuje wątek."""
+        with self._lock:
+            if not self._accepting:
+                return
+            self._accepting = False
+        self.queue.put(None)
+        if self._thread:
+            self._thread.join(timeout)
+        print(f"Worker kopania zatrzymany — bloków: {self.blocks_mined}")
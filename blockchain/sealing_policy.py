@@ -0,0 +1,36 @@
+class SealingPolicy:
+    """
+    Kiedy zamknąć blok z mempoola:
+    - max_transactions — blok pełny po tylu transakcjach (dotychczasowe mempool_size = 30),
+    - max_bytes        — albo gdy transakcje zajmują tyle bajtów (encode_transaction); None = bez limitu,
+    - max_age          — albo gdy najstarsza transakcja czeka tyle sekund (blok niepełny); None = bez limitu.
+    """
+
+    def __init__(self, max_transactions: int = 30, max_bytes: int | None = None, max_age: float | None = None):
+        if max_transactions <= 0:
+            raise ValueError("max_transactions musi być większe od zera.")
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def is_full(self, count: int, size_bytes: int) -> bool:
+        return count >= self.max_transactions or (self.max_bytes is not None and size_bytes >= self.max_bytes)
+
+    def is_expired(self, oldest_age: float | None) -> bool:
+        return self.max_age is not None and oldest_age is not None and oldest_age >= self.max_age
+
+    def select(self, transactions: list[dict], sizes: list[int]) -> list[dict]:
+        """Najdłuższy początek listy mieszczący się w limitach (zawsze co najmniej jedna transakcja)."""
+        selected = transactions[:self.max_transactions]
+        if self.max_bytes is None:
+            return selected
+
+        total = 0
+        for count, size in enumerate(sizes[:len(selected)]):
+            total += size
+            if total > self.max_bytes:
+                return selected[:max(count, 1)]
+        return selected
+
+    def to_dict(self) -> dict:
+        return {"max_transactions": self.max_transactions, "max_bytes": self.max_bytes, "max_age": self.max_age}
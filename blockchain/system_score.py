@@ -1,12 +1,17 @@
 from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import scoped_session, sessionmaker
 from database.models import db
 from database.models import TransactionsMySQL, TransactionsSQLite, TransactionsMongo
+from blockchain.blockchain_base import MempoolReservation
 from datetime import datetime
 
 
 def add_score_system(score: float, user):
+    """
+    Punkty od systemu (bonus za logowanie, zmiana przez admina) zapisane jako transakcja SYSTEM.
+    Transakcje systemowe są zwolnione z limitu mempoola: miejsce jest rezerwowane przed zmianą salda
+    bez sprawdzania pojemności, więc pełny mempool nie blokuje logowania, a saldo i łańcuch się nie rozjeżdżają.
+    """
     if score is None:
         raise ValueError("Brak danych: ilości punktów.")
 
@@ -19,31 +24,33 @@ def add_score_system(score: float, user):
     if user.score is None:
         user.score = 0
 
-    # Dodanie punktów
-    user.score += score
-    user.score = round(user.score, 8)
+    reservation = None
+    try:
+        reservation = MempoolReservation(current_app.blockchains.values(), 1, exempt=True)  # type: ignore
 
-    now = datetime.now().replace(microsecond=(datetime.now().microsecond // 1000) * 1000)
+        # Dodanie punktów
+        user.score += score
+        user.score = round(user.score, 8)
 
-    tx_data = {
-        'sender': "SYSTEM",
-        'recipient': user.username,
-        'amount': score,
-        'date': now
-    }
+        now = datetime.now().replace(microsecond=(datetime.now().microsecond // 1000) * 1000)
 
-    tx_mysql = TransactionsMySQL(**tx_data)
-    tx_sqlite = TransactionsSQLite(**tx_data)
-    transactions_mongo = TransactionsMongo(current_app.mongo)  # type: ignore
+        tx_data = {
+            'sender': "SYSTEM",
+            'recipient': user.username,
+            'amount': score,
+            'date': now
+        }
+
+        tx_mysql = TransactionsMySQL(**tx_data)
+        tx_sqlite = TransactionsSQLite(**tx_data)
+        transactions_mongo = TransactionsMongo(current_app.mongo)  # type: ignore
 
-    try:
         # MySQL
         db.session.add(tx_mysql)
         db.session.commit()
 
         # SQLite — TRANSAKCJE (sqlite_tx)
-        sqlite_tx_engine = db.get_engine(bind='sqlite_tx')
-        sqlite_tx_session = scoped_session(sessionmaker(bind=sqlite_tx_engine))
+        sqlite_tx_session = current_app.sqlite_tx_session  # type: ignore
 
         sqlite_tx_session.add(tx_sqlite)
         sqlite_tx_session.commit()
@@ -65,12 +72,8 @@ def add_score_system(score: float, user):
             "date": now
         }]
 
-        mempool_size = 30
-
-        # MySQL blockchain
-        current_app.blockchains["mysql"].hm_add_transaction_to_mempool(tx, mempool_size)  # type: ignore
-        current_app.blockchains["sqlite"].hm_add_transaction_to_mempool(tx, mempool_size)  # type: ignore
-        current_app.blockchains["mongo"].hm_add_transaction_to_mempool(tx, mempool_size)  # type: ignore
+        # blockchainy MySQL, SQLite i Mongo
+        reservation.submit(tx)
 
         return True
 
@@ -80,3 +83,7 @@ def add_score_system(score: float, user):
 
     except Exception as e:
         raise RuntimeError(f"Nieoczekiwany błąd: {str(e)}")
+
+    finally:
+        if reservation is not None:
+            reservation.release()
@@ -1,7 +1,8 @@
 import string
 from random import choices
-from flask import Blueprint, session, request, jsonify
+from flask import Blueprint, session, request, jsonify, current_app
 from database.models import db
+from database.pool_metrics import pool_metrics
 from database.models import Users
 from database.hash import Hash
 from blueprints.auth import Auth
@@ -28,6 +29,12 @@ def _users_():
     } for x in all_users]
 
 
+@admin.route('/pool-metrics', methods=['get'])
+@Auth.logged_admin
+def _pool_metrics_():
+    return jsonify(pool_metrics(db, current_app.mongo_pool_metrics)), 200
+
+
 @admin.route("/<user_id>/set-score", methods=['post'])
 @Auth.logged_admin
 def _set_score_(user_id):
@@ -1,4 +1,4 @@
-from flask import Blueprint, session, request, jsonify
+from flask import Blueprint, session, request, current_app, jsonify
 from sqlalchemy import desc
 from database.models import Users, BlockchainBlockMySQL, TransactionsMySQL, MempoolTransactionMySQL, \
     BlockchainTransactionMySQL
@@ -148,7 +148,7 @@ def get_last_3_mempool():
         desc(MempoolTransactionMySQL.id)
     ).limit(3).all()
 
-    mempool_size = MempoolTransactionMySQL.query.count()
+    mempool_size = current_app.blockchains["mysql"].mempool_size  # type: ignore
 
     return jsonify({
         "mempool_size": mempool_size,
@@ -167,7 +167,7 @@ def mempool():
     page = data.get("page", 1)
     per_page = 50
 
-    total_txs = MempoolTransactionMySQL.query.count()
+    total_txs = current_app.blockchains["mysql"].mempool_size  # type: ignore
     max_page = (total_txs + per_page - 1) // per_page
 
     user = Users.query.filter_by(id=session.get("user_id")).first()
@@ -259,3 +259,40 @@ def blocks_transactions():
             "date": t.date
         } for t in transactions]
     }), 200
+
+
+@blockchain.route('/mining_status', methods=['GET'])
+@Auth.logged_mod
+def mining_status():
+    worker = current_app.mining_worker  # type: ignore
+    if worker is None:
+        return jsonify({"message": "Kopanie w tle jest wyłączone."}), 404
+
+    status = worker.status()
+    status["chains"] = {
+        name: {
+            "mempool": chain.mempool_size,
+            "mempool_age": round(chain.mempool_age, 3) if chain.mempool_age is not None else None,
+            "sealing_policy": chain.sealing_policy.to_dict()
+        }
+        for name, chain in current_app.blockchains.items()  # type: ignore
+    }
+    return jsonify(status), 200
+
+
+@blockchain.route('/mempool_status', methods=['GET'])
+@Auth.logged_mod
+def mempool_status():
+    # liczniki backpressure — do doboru pojemności mempoola (BLOCKCHAIN_MEMPOOL_LIMITS)
+    return jsonify({
+        name: {
+            "mempool": chain.mempool_size,
+            "capacity": chain.mempool_capacity,
+            "capacity_left": chain.mempool_capacity_left,
+            "overflow": chain.mempool_overflow,
+            "ttl": chain.mempool_ttl,
+            "backpressure": {**chain.backpressure, "blocked_time": round(chain.backpressure["blocked_time"], 3)},
+            "write_behind": chain.mempool_writer.status()
+        }
+        for name, chain in current_app.blockchains.items()  # type: ignore
+    }), 200
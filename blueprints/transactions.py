@@ -5,16 +5,23 @@ from database.hash import Hash
 import requests
 from flask import Blueprint, session, request, current_app, jsonify
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import scoped_session, sessionmaker
 from database.models import db, MempoolTransactionMySQL, PendingBtcTransactions, BlockchainBlockMySQL, BlockchainTransactionMySQL
 from database.models import Users, TransactionsMySQL, TransactionsSQLite, TransactionsMongo
 from blueprints.auth import Auth
+from blockchain.blockchain_base import VALIDATION_DEPTHS, VALIDATION_MODES, MempoolFullError, MempoolReservation
 from datetime import datetime, timedelta
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 
 transactions = Blueprint('transactions', __name__)
 
 
+def mempool_full_response(e: MempoolFullError):
+    response = jsonify({"message": str(e), "retry_after": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 503
+
+
 @transactions.route('/transfer-score', methods=['POST'])
 @Auth.logged_user
 def transfer_score():
@@ -49,29 +56,34 @@ def transfer_score():
     if sender.score < amount:
         return jsonify({"message": "Nie masz wystarczającej liczby punktów do przesłania."}), 400
 
-    # Transfer punktów
-    sender.score -= amount
-    recipient.score += amount
+    reservation = None
+    try:
+        # miejsce w mempoolach wszystkich blockchainów rezerwowane przed zmianą sald — po commit
+        # przekazanie transakcji do łańcuchów nie może już skończyć się pełnym mempoolem
+        reservation = MempoolReservation(current_app.blockchains.values(), 1)  # type: ignore
 
-    now = datetime.now().replace(microsecond=(datetime.now().microsecond // 1000) * 1000)
+        # Transfer punktów
+        sender.score -= amount
+        recipient.score += amount
 
-    tx_data = {
-        'sender': sender.username,
-        'recipient': recipient.username,
-        'amount': amount,
-        'date': now
-    }
+        now = datetime.now().replace(microsecond=(datetime.now().microsecond // 1000) * 1000)
 
-    tx_mysql = TransactionsMySQL(**tx_data)
-    tx_sqlite = TransactionsSQLite(**tx_data)
-    transactions_mongo = TransactionsMongo(current_app.mongo)  # type: ignore
+        tx_data = {
+            'sender': sender.username,
+            'recipient': recipient.username,
+            'amount': amount,
+            'date': now
+        }
+
+        tx_mysql = TransactionsMySQL(**tx_data)
+        tx_sqlite = TransactionsSQLite(**tx_data)
+        transactions_mongo = TransactionsMongo(current_app.mongo)  # type: ignore
 
-    try:
         # Zapis do MySQL
         db.session.add(tx_mysql)
         db.session.commit()
         # Zapis do SQLite
-        sqlite_session = scoped_session(sessionmaker(bind=db.get_engine(bind='sqlite_tx')))
+        sqlite_session = current_app.sqlite_tx_session  # type: ignore
         sqlite_session.add(tx_sqlite)
         sqlite_session.commit()
         sqlite_session.remove()
@@ -91,24 +103,24 @@ def transfer_score():
             "date": now
         }]
 
-        mempool_size = 30
-
-        # Zapis do MySQL
-        current_app.blockchains["mysql"].hm_add_transaction_to_mempool(tx, mempool_size)  # type: ignore
-
-        # Zapis do SQLite
-        current_app.blockchains["sqlite"].hm_add_transaction_to_mempool(tx, mempool_size)  # type: ignore
-
-        # Zapis do Mongo
-        current_app.blockchains["mongo"].hm_add_transaction_to_mempool(tx, mempool_size)  # type: ignore
+        # Zapis do blockchainów MySQL, SQLite i Mongo (na zarezerwowane miejsce)
+        reservation.submit(tx)
 
         return jsonify({"message": f"Pomyślnie przesłano {amount} punktów do {recipient_username}."}), 200
 
+    except MempoolFullError as e:
+        # tylko z rezerwacji — przed zmianą sald
+        db.session.rollback()
+        return mempool_full_response(e)
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({"message": f"Wystąpił błąd przy zapisie transakcji: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"message": f"Wystąpił nieoczekiwany błąd: {str(e)}"}), 500
+    finally:
+        # miejsce niewykorzystane przez błąd przed przekazaniem transakcji do łańcucha
+        if reservation is not None:
+            reservation.release()
 
 
 def generate_transactions(count, user_scores, all_users):
@@ -153,6 +165,38 @@ def generate_transactions(count, user_scores, all_users):
     return transactions_data
 
 
+def add_to_blockchains_concurrently(chain_transactions: dict, tx_limit: int, batch_size: int,
+                                   reservation: MempoolReservation | None = None):
+    """
+    Dodaje transakcje do blockchainów (nazwa -> lista transakcji) równolegle — każdy łańcuch
+    w osobnym wątku z własnym kontekstem aplikacji. Kopanie i zapis bloków jednego łańcucha nie
+    czekają na pozostałe. reservation — miejsce na końcówkę zarezerwowane przed zapisem historii:
+    łańcuch przejmuje swoją część i nie sprawdza już pojemności mempoola.
+    Zwraca (czas każdego łańcucha, łączny czas zegarowy).
+    """
+    app = current_app._get_current_object()  # type: ignore
+
+    def ingest(name, transactions_data):
+        with app.app_context():
+            start = time.perf_counter()
+            chain = app.blockchains[name]  # type: ignore
+            reserved = reservation.take(chain) if reservation is not None else None
+            for i in range(0, len(transactions_data), batch_size):
+                batch = transactions_data[i:i + batch_size]
+                chain.hm_add_transaction_to_mempool(batch, tx_limit, direct_blocks=True, reserved=reserved)
+                # rezerwację zużywa (albo zwalnia) pierwsza paczka, kolejne są już przyjęte
+                if reserved is not None:
+                    reserved = 0
+            return time.perf_counter() - start
+
+    start_wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(chain_transactions)) as executor:
+        futures = {name: executor.submit(ingest, name, data) for name, data in chain_transactions.items()}
+        # result() przekazuje wyjątek z wątku łańcucha do endpointu
+        chain_times = {name: future.result() for name, future in futures.items()}
+    return chain_times, time.perf_counter() - start_wall
+
+
 @transactions.route('/generate-random-transactions', methods=['POST'])
 @Auth.logged_rcon
 def generate_random_transactions():
@@ -172,7 +216,7 @@ def generate_random_transactions():
     if len(all_users) < 2:
         return jsonify({"message": "Za mało użytkowników do wykonania transakcji."}), 400
 
-    mempool_count = MempoolTransactionMySQL.query.count()
+    mempool_count = current_app.blockchains["mysql"].mempool_size  # type: ignore
     if tx_limit <= mempool_count:
         return jsonify({
             "message": f"tx_limit musi być większy niż liczba transakcji w mempoolu ({mempool_count})."
@@ -185,12 +229,15 @@ def generate_random_transactions():
     copy_transactions_data_sqlite = [dict(tx) for tx in transactions_data]
     copy_transactions_data_mongo = [dict(tx) for tx in transactions_data]
 
-    # przygotowanie sqlite session
-    sqlite_engine = db.get_engine(bind='sqlite_tx')
-    sqlite_session_factory = sessionmaker(bind=sqlite_engine)
-    sqlite_session = scoped_session(sqlite_session_factory)
+    # sesja sqlite_tx z fabryki aplikacji (database.sqlite_profile)
+    sqlite_session = current_app.sqlite_tx_session  # type: ignore
 
+    reservation = None
     try:
+        # miejsce na końcówkę w mempoolach wszystkich blockchainów rezerwowane przed zapisem historii —
+        # po commit przekazanie transakcji do łańcuchów nie może już skończyć się pełnym mempoolem
+        reservation = MempoolReservation(current_app.blockchains.values(), min(count, tx_limit - 1))  # type: ignore
+
         # ---------------------------
         #  zapis do baz danych (MySQL, SQLite, Mongo)
         # ---------------------------
@@ -224,29 +271,12 @@ def generate_random_transactions():
         #  MEMPOOL: dodajemy do blockchainów (batched) + pomiar czasu
         # ---------------------------
 
-        # MySQL blockchain
-        start_mysql_blockchain = time.perf_counter()
-        for i in range(0, count, batch_size):
-            batch = transactions_data[i:i + batch_size]
-            current_app.blockchains["mysql"].hm_add_transaction_to_mempool(batch, tx_limit)  # type: ignore
-        end_mysql_blockchain = time.perf_counter()
-        mysql_blockchain_time = end_mysql_blockchain - start_mysql_blockchain
-
-        # SQLite blockchain
-        start_sqlite_blockchain = time.perf_counter()
-        for i in range(0, count, batch_size):
-            batch = copy_transactions_data_sqlite[i:i + batch_size]
-            current_app.blockchains["sqlite"].hm_add_transaction_to_mempool(batch, tx_limit)  # type: ignore
-        end_sqlite_blockchain = time.perf_counter()
-        sqlite_blockchain_time = end_sqlite_blockchain - start_sqlite_blockchain
-
-        # Mongo blockchain
-        start_mongo_blockchain = time.perf_counter()
-        for i in range(0, count, batch_size):
-            batch = copy_transactions_data_mongo[i:i + batch_size]
-            current_app.blockchains["mongo"].hm_add_transaction_to_mempool(batch, tx_limit)  # type: ignore
-        end_mongo_blockchain = time.perf_counter()
-        mongo_blockchain_time = end_mongo_blockchain - start_mongo_blockchain
+        # trzy łańcuchy kopią równolegle
+        chain_times, blockchain_wall_time = add_to_blockchains_concurrently({
+            "mysql": transactions_data,
+            "sqlite": copy_transactions_data_sqlite,
+            "mongo": copy_transactions_data_mongo
+        }, tx_limit, batch_size, reservation)
 
         # ---------------------------
         #  Aktualizacja score userów w DB (historyczny Users table)
@@ -255,7 +285,7 @@ def generate_random_transactions():
             user.score = round(user_scores[user.username], 8)  # <- zaokrąglenie do 8 miejsc po przecinku
         db.session.commit()
 
-        mempool = MempoolTransactionMySQL.query.count()
+        mempool = current_app.blockchains["mysql"].mempool_size  # type: ignore
 
         return jsonify({
             "message": f"Wygenerowano i dodano {count} losowych transakcji. \n Mempool: {mempool}/{tx_limit}.",
@@ -265,18 +295,24 @@ def generate_random_transactions():
                 "MongoDB": f"{mongo_time:.3f} s",
             },
             "blockchain_times": {
-                "MySQL Blockchain": f"{mysql_blockchain_time:.3f} s",
-                "SQLite Blockchain": f"{sqlite_blockchain_time:.3f} s",
-                "MongoDB Blockchain": f"{mongo_blockchain_time:.3f} s",
-            }
+                "MySQL Blockchain": f"{chain_times['mysql']:.3f} s",
+                "SQLite Blockchain": f"{chain_times['sqlite']:.3f} s",
+                "MongoDB Blockchain": f"{chain_times['mongo']:.3f} s",
+            },
+            "blockchain_wall_time": f"{blockchain_wall_time:.3f} s"
         }), 200
 
+    except MempoolFullError as e:
+        # tylko z rezerwacji — przed zapisem czegokolwiek, więc ponowienie niczego nie powieli
+        return mempool_full_response(e)
     except Exception as e:
         db.session.rollback()
         sqlite_session.rollback()
         return jsonify({"message": f"Błąd przy zapisie transakcji: {str(e)}"}), 500
 
     finally:
+        if reservation is not None:
+            reservation.release()
         sqlite_session.remove()
 
 
@@ -286,6 +322,19 @@ def validate_blockchains():
     data = request.get_json()
     blockchain_name = data.get("blockchain_name")
     batch_size = data.get("batch_size", 1000)
+    depth = data.get("depth", "links")
+    mode = data.get("mode", "incremental")
+    workers = data.get("workers", 1)  # > 1 = walidacja równoległa w puli procesów
+
+    if depth not in VALIDATION_DEPTHS:
+        return jsonify({"message": f"Nieznany tryb walidacji {depth}. Dostępne: {', '.join(VALIDATION_DEPTHS)}."}), 400
+    if mode not in VALIDATION_MODES:
+        return jsonify({"message": f"Nieznany tryb walidacji {mode}. Dostępne: {', '.join(VALIDATION_MODES)}."}), 400
+    if not isinstance(workers, int) or workers < 1:
+        return jsonify({"message": "Parametr 'workers' musi być liczbą całkowitą większą od 0."}), 400
+    max_workers = os.cpu_count() or 1
+    if workers > max_workers:
+        return jsonify({"message": f"Parametr 'workers' nie może być większy niż liczba procesorów ({max_workers})."}), 400
 
     results = {}
     all_valid = True
@@ -296,19 +345,27 @@ def validate_blockchains():
         if blockchain is None:
             return jsonify({"message": f"Blockchain '{blockchain_name}' nie istnieje."}), 404
 
-        is_valid, message = blockchain.validate_chain(batch_size=batch_size)
+        is_valid, message, stats = blockchain.validate_chain(batch_size=batch_size, depth=depth, mode=mode,
+                                                          workers=workers)
         results[blockchain_name] = {
             "valid": is_valid,
-            "message": blockchain_name.upper() + " " + message
+            "message": blockchain_name.upper() + " " + message,
+            "checked_blocks": stats["checked_blocks"],
+            "mode": stats["mode"],
+            "tx_per_second": stats.get("tx_per_second")
         }
         all_valid = is_valid
     elif str(blockchain_name) == "":
         # Sprawdzamy wszystkie blockchainy (dotychczasowa logika)
         for name, blockchain in current_app.blockchains.items():  # type: ignore
-            is_valid, message = blockchain.validate_chain(batch_size=batch_size)
+            is_valid, message, stats = blockchain.validate_chain(batch_size=batch_size, depth=depth, mode=mode,
+                                                                 workers=workers)
             results[name] = {
                 "valid": is_valid,
-                "message": name.upper() + " " + message
+                "message": name.upper() + " " + message,
+                "checked_blocks": stats["checked_blocks"],
+                "mode": stats["mode"],
+                "tx_per_second": stats.get("tx_per_second")
             }
             if not is_valid:
                 all_valid = False
@@ -346,7 +403,8 @@ def check_merkle_tree():
     result = blockchain.verify_merkle_proof(
         transaction=proof_data["transaction"],
         proof=proof_data["proof"],
-        merkle_root=proof_data["merkle_root"]
+        merkle_root=proof_data["merkle_root"],
+        version=proof_data["version"]
     )
 
     if result:
@@ -357,15 +415,73 @@ def check_merkle_tree():
         }), 400
 
 
+@transactions.route('/merkle_tree/batch', methods=["POST"])
+@Auth.logged_admin
+def check_merkle_tree_batch():
+    data = request.get_json()
+    blockchain_name = data.get("blockchain_name")
+    block_index = data.get("block_index")
+    tx_ids = data.get("tx_ids")
+
+    if blockchain_name not in ["mysql", "mongo", "sqlite"]:
+        return jsonify({"message": f"Baza danych o nazwie {blockchain_name} nie istnieje."}), 404
+    elif block_index is None or not tx_ids:
+        return jsonify({"message": 'Brak danych: id bloku lub lista id transakcji.'}), 404
+    elif not isinstance(tx_ids, list):
+        return jsonify({"message": 'tx_ids musi być listą id transakcji.'}), 400
+
+    blockchain = current_app.blockchains.get(blockchain_name)  # type: ignore
+    if blockchain is None:
+        return jsonify({"message": f'Nie znaleziono Blockchainu {blockchain_name}.'}), 404
+
+    # dowody dla wszystkich transakcji z jednego drzewa
+    proofs_data = blockchain.get_transaction_proofs(block_index=block_index, tx_ids=tx_ids)
+    if not proofs_data:
+        return jsonify({"message": f'Nie znaleziono bloku {block_index}.'}), 404
+
+    results = []
+    for tx_id in tx_ids:
+        proof_data = proofs_data["proofs"].get(str(tx_id))
+        if proof_data is None:
+            results.append({"tx_id": tx_id, "valid": False,
+                            "message": f'Nie znaleziono transakcji {tx_id} w bloku {block_index}.'})
+            continue
+
+        valid = blockchain.verify_merkle_proof(
+            transaction=proof_data["transaction"],
+            proof=proof_data["proof"],
+            merkle_root=proofs_data["merkle_root"],
+            version=proofs_data["version"]
+        )
+        results.append({
+            "tx_id": tx_id,
+            "valid": valid,
+            "proof": proof_data["proof"],
+            "message": f'Transakcja {tx_id} jest poprawna w bloku {block_index}.' if valid else
+            f'Drzewo Merkla NIE jest prawidłowe dla transakcji {tx_id} w bloku {block_index}.'
+        })
+
+    valid_count = sum(result["valid"] for result in results)
+    return jsonify({
+        "message": f'Poprawnych transakcji: {valid_count}/{len(results)} w bloku {block_index}.',
+        "merkle_root": proofs_data["merkle_root"],
+        "results": results
+    }), 200 if valid_count == len(results) else 400
+
+
 @transactions.route('/check_user_score', methods=["POST"])
 @Auth.logged_admin
 def check_user_score():
     data = request.get_json()
     username = data.get("username")
     blockchain_name = data.get("blockchain_name")
+    # "ledger" — księga sald + mempool w pamięci; "recompute" — przeliczenie z łańcucha (audyt księgi)
+    mode = data.get("mode", "ledger")
 
     if not username or blockchain_name not in ["mysql", "mongo", "sqlite"]:
         return jsonify({"message": "Brak danych: username lub błędna nazwa bazy danych."}), 400
+    if mode not in ("ledger", "recompute"):
+        return jsonify({"message": f"Nieznany tryb: {mode}."}), 400
 
     user = Users.query.filter_by(username=username).first()
     if not user:
@@ -375,8 +491,12 @@ def check_user_score():
     if blockchain is None:
         return jsonify({"message": f'Nie znaleziono Blockchainu {blockchain_name}.'}), 404
 
-    # Pobranie danych z funkcji get_user_score()
-    expected_data = blockchain.get_user_score(username)
+    if mode == "recompute":
+        # przeliczenie czyta tabelę mempoola — najpierw zaległy zapis w tle
+        blockchain.flush_mempool()
+        expected_data = blockchain.recompute_user_score(username)
+    else:
+        expected_data = blockchain.get_user_score(username)
 
     expected_score = round(expected_data["score"], 8)
     actual_score = round(user.score, 8)
@@ -410,6 +530,49 @@ def check_user_score():
     }), 400
 
 
+def iter_user_scores():
+    """Strumieniowo (username, score) wszystkich użytkowników — bez ładowania obiektów ORM."""
+    return db.session.execute(db.select(Users.username, Users.score).execution_options(yield_per=5000))
+
+
+@transactions.route('/reconcile', methods=["POST"])
+@Auth.logged_admin
+def reconcile_balances():
+    """
+    Uzgadnia salda wszystkich użytkowników z łańcuchem: jeden przebieg po każdym łańcuchu zamiast
+    check_user_score dla każdego konta. blockchain_name "" — wszystkie łańcuchy.
+    """
+    data = request.get_json(silent=True) or {}
+    blockchain_name = str(data.get("blockchain_name", ""))
+    limit = data.get("limit", 100)  # ile największych rozbieżności zwrócić
+
+    if not isinstance(limit, int) or limit < 0:
+        return jsonify({"message": "Parametr 'limit' musi być liczbą całkowitą nieujemną."}), 400
+
+    if blockchain_name == "":
+        chains = current_app.blockchains  # type: ignore
+    elif blockchain_name in ["mysql", "mongo", "sqlite"]:
+        chains = {blockchain_name: current_app.blockchains[blockchain_name]}  # type: ignore
+    else:
+        return jsonify({"message": f"Baza danych o nazwie {blockchain_name} nie istnieje."}), 404
+
+    results = {name: chain.reconcile_balances(iter_user_scores(), limit) for name, chain in chains.items()}
+
+    if all(report["mismatch_count"] == 0 for report in results.values()):
+        return jsonify({"status": "ok", "message": results}), 200
+    return jsonify({"status": "error", "message": results}), 400
+
+
+@transactions.route('/reconcile', methods=["GET"])
+@Auth.logged_admin
+def last_reconciliation():
+    # ostatnie raporty uzgadniania (w pamięci procesu)
+    return jsonify({
+        name: chain.last_reconciliation
+        for name, chain in current_app.blockchains.items()  # type: ignore
+    }), 200
+
+
 def extract_addresses(tx):
     """Pobiera bezpiecznie nadawcę i odbiorcę transakcji."""
     # FROM
@@ -535,7 +698,7 @@ def process_pending_transactions():
         missing = count - pending_count
         return jsonify({"message": f"Brakuje {missing} oczekujących transakcji."}), 400
 
-    mempool_count = MempoolTransactionMySQL.query.count()
+    mempool_count = current_app.blockchains["mysql"].mempool_size  # type: ignore
 
     if tx_limit <= mempool_count:
         return jsonify({
@@ -559,12 +722,15 @@ def process_pending_transactions():
     copy_transactions_data_sqlite = [dict(tx) for tx in transactions_data]
     copy_transactions_data_mongo = [dict(tx) for tx in transactions_data]
 
-    # przygotowanie SQLite session
-    sqlite_engine = db.get_engine(bind='sqlite_tx')
-    sqlite_session_factory = sessionmaker(bind=sqlite_engine)
-    sqlite_session = scoped_session(sqlite_session_factory)
+    # sesja sqlite_tx z fabryki aplikacji (database.sqlite_profile)
+    sqlite_session = current_app.sqlite_tx_session  # type: ignore
 
+    reservation = None
     try:
+        # miejsce na końcówkę w mempoolach wszystkich blockchainów rezerwowane przed zapisem historii —
+        # po commit przekazanie transakcji do łańcuchów nie może już skończyć się pełnym mempoolem
+        reservation = MempoolReservation(current_app.blockchains.values(), min(count, tx_limit - 1))  # type: ignore
+
         # ---------------------------
         # MySQL
         # ---------------------------
@@ -599,29 +765,12 @@ def process_pending_transactions():
         # ---------------------------
         # MEMPOOL - blockchainy
         # ---------------------------
-        # MySQL blockchain
-        start_mysql_blockchain = time.perf_counter()
-        for i in range(0, len(transactions_data), batch_size):
-            batch = transactions_data[i:i + batch_size]
-            current_app.blockchains["mysql"].hm_add_transaction_to_mempool(batch, tx_limit)  # type: ignore
-        end_mysql_blockchain = time.perf_counter()
-        mysql_blockchain_time = end_mysql_blockchain - start_mysql_blockchain
-
-        # SQLite blockchain
-        start_sqlite_blockchain = time.perf_counter()
-        for i in range(0, len(copy_transactions_data_sqlite), batch_size):
-            batch = copy_transactions_data_sqlite[i:i + batch_size]
-            current_app.blockchains["sqlite"].hm_add_transaction_to_mempool(batch, tx_limit)  # type: ignore
-        end_sqlite_blockchain = time.perf_counter()
-        sqlite_blockchain_time = end_sqlite_blockchain - start_sqlite_blockchain
-
-        # Mongo blockchain
-        start_mongo_blockchain = time.perf_counter()
-        for i in range(0, count, batch_size):
-            batch = copy_transactions_data_mongo[i:i + batch_size]
-            current_app.blockchains["mongo"].hm_add_transaction_to_mempool(batch, tx_limit)  # type: ignore
-        end_mongo_blockchain = time.perf_counter()
-        mongo_blockchain_time = end_mongo_blockchain - start_mongo_blockchain
+        # trzy łańcuchy kopią równolegle
+        chain_times, blockchain_wall_time = add_to_blockchains_concurrently({
+            "mysql": transactions_data,
+            "sqlite": copy_transactions_data_sqlite,
+            "mongo": copy_transactions_data_mongo
+        }, tx_limit, batch_size, reservation)
         # ---------------------------
         # Aktualizacja score userów
         # ---------------------------
@@ -652,7 +801,7 @@ def process_pending_transactions():
             db.session.delete(tx)
         db.session.commit()
 
-        mempool = MempoolTransactionMySQL.query.count()
+        mempool = current_app.blockchains["mysql"].mempool_size  # type: ignore
 
         return jsonify({
             "message": f"Przetworzono {len(transactions_data)} transakcji. Mempool: {mempool}/{tx_limit}.",
@@ -662,18 +811,24 @@ def process_pending_transactions():
                 "MongoDB": f"{mongo_time:.3f} s",
             },
             "blockchain_times": {
-                "MySQL Blockchain": f"{mysql_blockchain_time:.3f} s",
-                "SQLite Blockchain": f"{sqlite_blockchain_time:.3f} s",
-                "MongoDB Blockchain": f"{mongo_blockchain_time:.3f} s",
-            }
+                "MySQL Blockchain": f"{chain_times['mysql']:.3f} s",
+                "SQLite Blockchain": f"{chain_times['sqlite']:.3f} s",
+                "MongoDB Blockchain": f"{chain_times['mongo']:.3f} s",
+            },
+            "blockchain_wall_time": f"{blockchain_wall_time:.3f} s"
         }), 200
 
+    except MempoolFullError as e:
+        # tylko z rezerwacji — przed zapisem czegokolwiek, więc ponowienie niczego nie powieli
+        return mempool_full_response(e)
     except Exception as e:
         db.session.rollback()
         sqlite_session.rollback()
         return jsonify({"message": f"Błąd przy przetwarzaniu transakcji: {str(e)}"}), 500
 
     finally:
+        if reservation is not None:
+            reservation.release()
         sqlite_session.remove()
 
 
@@ -704,7 +859,8 @@ def get_database_sizes():
     # ===========================
 
     def get_sqlite_size_kb(path):
-        return os.path.getsize(path) / 1024.0 if os.path.exists(path) else 0.0
+        # w trybie WAL część danych czeka w pliku -wal do checkpointu
+        return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 1024.0
 
     def get_mongo_size_kb(db, collections):
         total = 0.0
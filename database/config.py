@@ -11,8 +11,90 @@ class Config:
     SQLALCHEMY_ECHO = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Profil wydajności SQLite (database.sqlite_profile) — PRAGMA ustawiane na każdym połączeniu bindów
+    # z SQLITE_PROFILE_BINDS; wartość None zostawia domyślną wartość SQLite, SQLITE_PROFILE = None wyłącza profil
+    SQLITE_PROFILE = {
+        "journal_mode": "WAL",  # czytelnicy nie blokują zapisu i odwrotnie
+        "synchronous": "NORMAL",  # w trybie WAL fsync przy checkpoincie, nie przy każdym commit
+        "mmap_size": 256 * 1024 * 1024,  # bajty pliku bazy czytane przez mmap
+        "cache_size": -65536,  # ujemna wartość = KiB (64 MiB cache stron na połączenie)
+        "busy_timeout": 5000  # ms czekania na blokadę zapisu zamiast "database is locked"
+    }
+    SQLITE_PROFILE_BINDS = ("sqlite_bc", "sqlite_tx")
+
+    # Pule połączeń SQLAlchemy (database.pool_metrics.MeteredQueuePool) — "mysql" to bind domyślny;
+    # pool_size stałych połączeń + max_overflow dodatkowych, pool_timeout s czekania na wolne połączenie,
+    # pool_recycle s życia połączenia (poniżej wait_timeout MySQL), pool_pre_ping sprawdza połączenie przed użyciem
+    SQLALCHEMY_POOLS = {
+        "mysql": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 30, "pool_recycle": 1800,
+                  "pool_pre_ping": True},
+        "sqlite_bc": {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": None,
+                      "pool_pre_ping": False},
+        "sqlite_tx": {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": None,
+                      "pool_pre_ping": False}
+    }
+
     MONGO_URI = "mongodb://localhost:27017/blockchain"
 
+    # Pula klienta PyMongo (opcje MongoClient, None = domyślna wartość PyMongo); waitQueueTimeoutMS —
+    # ms czekania na wolne połączenie przy wyczerpanej puli, zamiast czekania bez limitu
+    MONGO_POOL = {
+        "maxPoolSize": 100,
+        "minPoolSize": 0,
+        "maxIdleTimeMS": None,
+        "waitQueueTimeoutMS": 5000
+    }
+
+    # Kopanie proof-of-work w puli procesów — osobno dla każdego blockchaina. Przy domyślnej trudności
+    # (~4096 prób na blok) narzut puli przewyższa zysk — tryb ma sens dopiero przy dłuższym target_suffix
+    BLOCKCHAIN_PARALLEL_MINING = {
+        "mysql": False,
+        "sqlite": False,
+        "mongo": False
+    }
+    BLOCKCHAIN_MINING_WORKERS = None  # None = os.cpu_count()
+
+    # Ścieżki masowe: zapis bloku N w osobnym wątku w trakcie kopania bloku N+1
+    BLOCKCHAIN_PIPELINED_MINING = {
+        "mysql": True,
+        "sqlite": True,
+        "mongo": True
+    }
+
+    # Silnik proof-of-work (klucz z blockchain.blockchain_base.POW_ENGINES)
+    BLOCKCHAIN_POW_ENGINE = {
+        "mysql": "midstate",
+        "sqlite": "midstate",
+        "mongo": "midstate"
+    }
+
+    # Licznik mempoola trzymany w pamięci; co tyle sekund uzgadniany z bazą (COUNT)
+    BLOCKCHAIN_MEMPOOL_RECONCILE_INTERVAL = 60
+
+    # Pełne bloki z /transfer-score i punktów systemowych zamyka wątek w tle (blockchain.mining_worker)
+    BLOCKCHAIN_BACKGROUND_MINING = True
+    BLOCKCHAIN_SEALER_TICK = 1.0  # co ile sekund worker sprawdza wiek mempoola
+
+    # Zamykanie bloków (blockchain.sealing_policy.SealingPolicy): liczba transakcji, bajty (None = bez limitu)
+    # i wiek najstarszej transakcji w sekundach (None = tylko pełne bloki)
+    BLOCKCHAIN_SEALING_POLICY = {
+        "mysql": {"max_transactions": 30, "max_bytes": None, "max_age": 60},
+        "sqlite": {"max_transactions": 30, "max_bytes": None, "max_age": 60},
+        "mongo": {"max_transactions": 30, "max_bytes": None, "max_age": 60}
+    }
+
+    # Mempool w pamięci z zapisem tabeli w tle (False — przyjęcie transakcji czeka na zapis do bazy)
+    BLOCKCHAIN_MEMPOOL_WRITE_BEHIND = True
+
+    # Limity mempoola: pojemność w transakcjach (None = bez limitu), zachowanie przy pełnym mempoolu
+    # ("reject" — 503 z Retry-After, "block" — producent czeka do block_timeout sekund)
+    # i TTL transakcji w sekundach (None = bez usuwania; sprawdzane co BLOCKCHAIN_MEMPOOL_RECONCILE_INTERVAL)
+    BLOCKCHAIN_MEMPOOL_LIMITS = {
+        "mysql": {"capacity": 50000, "overflow": "reject", "block_timeout": 5.0, "ttl": None},
+        "sqlite": {"capacity": 50000, "overflow": "reject", "block_timeout": 5.0, "ttl": None},
+        "mongo": {"capacity": 50000, "overflow": "reject", "block_timeout": 5.0, "ttl": None}
+    }
+
 # class Config:
 #     SECRET_KEY = "sekret"
 #     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.abspath("database/database.db")}'
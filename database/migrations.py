@@ -0,0 +1,54 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+
+def add_missing_columns(db):
+    """
+    Dodaje do istniejących tabel kolumny zadeklarowane w modelach.
+    db.create_all() tworzy tylko brakujące tabele, więc bez tego stare bazy nie dostają nowych pól.
+    Nowe kolumny są dodawane jako NULL — kod traktuje brak wartości jak stary format.
+    """
+    for bind_key, metadata in db.metadatas.items():
+        engine = db.engines[bind_key]
+        inspector = inspect(engine)
+        quote = engine.dialect.identifier_preparer.quote
+
+        with engine.begin() as conn:
+            for table in metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(
+                        f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"
+                    ))
+                    print(f"Dodano kolumnę {table.name}.{column.name} ({bind_key or 'mysql'})")
+
+
+def add_missing_indexes(db):
+    """
+    Tworzy indeksy zadeklarowane w modelach na istniejących tabelach (Index.create z checkfirst —
+    bezpieczne przy każdym starcie). Indeks, którego nie da się założyć (np. unikalny przy
+    zduplikowanych danych), jest pomijany z ostrzeżeniem, żeby nie blokować startu aplikacji.
+    """
+    for bind_key, metadata in db.metadatas.items():
+        engine = db.engines[bind_key]
+        inspector = inspect(engine)
+
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                try:
+                    index.create(engine, checkfirst=True)
+                    print(f"Dodano indeks {index.name} na {table.name} ({bind_key or 'mysql'})")
+                except SQLAlchemyError as e:
+                    print(f"Nie udało się dodać indeksu {index.name} na {table.name} ({bind_key or 'mysql'}): {e}")
@@ -36,16 +36,27 @@ class TransactionsMySQL(db.Model):
 
 class BlockchainBlockMySQL(db.Model):
     __tablename__ = 'blockchain_blocks'
+    __table_args__ = (
+        db.Index('ix_blockchain_blocks_index', 'index', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     index = db.Column(db.Integer)
     timestamp = db.Column(mysql.DATETIME(fsp=6), nullable=False)
     proof = db.Column(db.Integer)
     previous_hash = db.Column(db.String(64))
     merkle_root = db.Column(db.String(64))
+    version = db.Column(db.Integer, default=0)  # format bloku, 0 = stary hash JSON
+    hash = db.Column(db.String(64))  # hash bloku zapisany przy kopaniu
 
 
 class BlockchainTransactionMySQL(db.Model):
     __tablename__ = 'blockchain_transactions'
+    __table_args__ = (
+        db.Index('ix_blockchain_transactions_block_id', 'block_id'),
+        db.Index('ix_blockchain_transactions_sender', 'sender'),
+        db.Index('ix_blockchain_transactions_recipient', 'recipient'),
+        db.Index('ix_blockchain_transactions_date', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     block_id = db.Column(db.Integer, db.ForeignKey('blockchain_blocks.id'))
     sender = db.Column(db.String(64), nullable=False)
@@ -63,6 +74,43 @@ class MempoolTransactionMySQL(db.Model):
     date = db.Column(mysql.DATETIME(fsp=6), nullable=False)
 
 
+class ValidationCheckpointMySQL(db.Model):  # wiersz na głębokość walidacji — ostatni zwalidowany blok
+    __tablename__ = 'validation_checkpoints'
+    depth = db.Column(db.String(16), primary_key=True)  # "links" / "merkle"
+    block_index = db.Column(db.Integer, nullable=False)
+    block_hash = db.Column(db.String(64), nullable=False)
+    signature = db.Column(db.String(64), nullable=False)
+    validated_at = db.Column(db.DateTime, nullable=False)
+
+
+class MerkleNodeMySQL(db.Model):  # zapisane węzły drzewa Merkla bloku (poziom 0 = liście)
+    __tablename__ = 'merkle_nodes'
+    __table_args__ = (
+        db.Index('ix_merkle_nodes_block_level_position', 'block_id', 'level', 'position', unique=True),
+        db.Index('ix_merkle_nodes_block_tx', 'block_id', 'tx_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    block_id = db.Column(db.Integer, db.ForeignKey('blockchain_blocks.id'), nullable=False)
+    level = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    hash = db.Column(db.String(64), nullable=False)
+    tx_id = db.Column(db.Integer, nullable=True)  # tylko dla liści — id transakcji z blockchain_transactions
+
+
+class AccountBalanceMySQL(db.Model):  # księga sald — salda kont z zatwierdzonych bloków
+    __tablename__ = 'account_balances'
+    username = db.Column(db.String(64), primary_key=True)
+    balance = db.Column(db.Double(), nullable=False, default=0.00000000)
+    sent_count = db.Column(db.Integer, nullable=False, default=0)
+    received_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class BalanceLedgerStateMySQL(db.Model):  # jeden wiersz — ostatni blok ujęty w księdze sald
+    __tablename__ = 'balance_ledger_state'
+    id = db.Column(db.Integer, primary_key=True)
+    block_index = db.Column(db.Integer, nullable=False)
+
+
 #  SQLite
 
 
@@ -80,19 +128,30 @@ class TransactionsSQLite(db.Model):
 class BlockchainBlockSQLite(db.Model):
     __bind_key__ = 'sqlite_bc'
     __tablename__ = 'blockchain_blocks'
-    __table_args__ = {'sqlite_autoincrement': True}
+    __table_args__ = (
+        db.Index('ix_blockchain_blocks_index', 'index', unique=True),
+        {'sqlite_autoincrement': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
     index = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime)
     proof = db.Column(db.Integer)
     previous_hash = db.Column(db.String(64))
     merkle_root = db.Column(db.String(64))
+    version = db.Column(db.Integer, default=0)  # format bloku, 0 = stary hash JSON
+    hash = db.Column(db.String(64))  # hash bloku zapisany przy kopaniu
 
 
 class BlockchainTransactionSQLite(db.Model):
     __bind_key__ = 'sqlite_bc'
     __tablename__ = 'blockchain_transactions'
-    __table_args__ = {'sqlite_autoincrement': True}
+    __table_args__ = (
+        db.Index('ix_blockchain_transactions_block_id', 'block_id'),
+        db.Index('ix_blockchain_transactions_sender', 'sender'),
+        db.Index('ix_blockchain_transactions_recipient', 'recipient'),
+        db.Index('ix_blockchain_transactions_date', 'date'),
+        {'sqlite_autoincrement': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
     block_id = db.Column(db.Integer, db.ForeignKey('blockchain_blocks.id'))
     sender = db.Column(db.String(64), nullable=False)
@@ -112,6 +171,47 @@ class MempoolTransactionSQLite(db.Model):
     date = db.Column(db.DateTime, nullable=False)
 
 
+class ValidationCheckpointSQLite(db.Model):  # wiersz na głębokość walidacji — ostatni zwalidowany blok
+    __bind_key__ = 'sqlite_bc'
+    __tablename__ = 'validation_checkpoints'
+    depth = db.Column(db.String(16), primary_key=True)  # "links" / "merkle"
+    block_index = db.Column(db.Integer, nullable=False)
+    block_hash = db.Column(db.String(64), nullable=False)
+    signature = db.Column(db.String(64), nullable=False)
+    validated_at = db.Column(db.DateTime, nullable=False)
+
+
+class MerkleNodeSQLite(db.Model):  # zapisane węzły drzewa Merkla bloku (poziom 0 = liście)
+    __bind_key__ = 'sqlite_bc'
+    __tablename__ = 'merkle_nodes'
+    __table_args__ = (
+        db.Index('ix_merkle_nodes_block_level_position', 'block_id', 'level', 'position', unique=True),
+        db.Index('ix_merkle_nodes_block_tx', 'block_id', 'tx_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    block_id = db.Column(db.Integer, db.ForeignKey('blockchain_blocks.id'), nullable=False)
+    level = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    hash = db.Column(db.String(64), nullable=False)
+    tx_id = db.Column(db.Integer, nullable=True)  # tylko dla liści — id transakcji z blockchain_transactions
+
+
+class AccountBalanceSQLite(db.Model):  # księga sald — salda kont z zatwierdzonych bloków
+    __bind_key__ = 'sqlite_bc'
+    __tablename__ = 'account_balances'
+    username = db.Column(db.String(64), primary_key=True)
+    balance = db.Column(db.Double(), nullable=False, default=0.00000000)
+    sent_count = db.Column(db.Integer, nullable=False, default=0)
+    received_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class BalanceLedgerStateSQLite(db.Model):  # jeden wiersz — ostatni blok ujęty w księdze sald
+    __bind_key__ = 'sqlite_bc'
+    __tablename__ = 'balance_ledger_state'
+    id = db.Column(db.Integer, primary_key=True)
+    block_index = db.Column(db.Integer, nullable=False)
+
+
 #  MongoDB - bez modelu ORM, przykład prostego wrappera:
 
 
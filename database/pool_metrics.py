@@ -0,0 +1,213 @@
+import threading
+import time
+
+from pymongo import monitoring
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """
+    Liczniki puli połączeń: wydane połączenia (bieżąco i szczyt), czas oczekiwania na połączenie,
+    przekroczenia pool_size (overflow) i timeouty. Wspólne dla pul SQLAlchemy i PyMongo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.overflow_events = 0  # połączenia otwarte ponad pool_size (tylko SQLAlchemy)
+        self.timeouts = 0  # brak wolnego połączenia w pool_timeout / waitQueueTimeoutMS
+        self.connections_created = 0
+        self.connections_closed = 0
+
+    def checkout(self, waited: float, overflow: bool = False):
+        with self._lock:
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self.checkouts += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.overflow_events += overflow
+
+    def checkin(self):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def timeout(self, waited: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def connection_created(self):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.connections_closed += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "wait_time": round(self.wait_time, 3),
+                "avg_wait_ms": round(self.wait_time / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool mierzący czas pobrania połączenia, przekroczenia pool_size i timeouty."""
+
+    def __init__(self, creator, metrics: PoolMetrics | None = None, **kwargs):
+        super().__init__(creator, **kwargs)
+        self.metrics = metrics or PoolMetrics()
+        self._metered = threading.local()
+
+    def recreate(self):
+        # engine.dispose() tworzy nową pulę — liczniki przechodzą na nią
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        # QueuePool._do_get wywołuje się rekurencyjnie — mierzone jest tylko wywołanie zewnętrzne
+        if getattr(self._metered, "active", False):
+            return super()._do_get()
+        self._metered.active = True
+        overflow = self._overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeout(time.perf_counter() - start)
+            raise
+        finally:
+            self._metered.active = False
+        # _overflow rośnie przy każdym nowym połączeniu; powyżej 0 — ponad pool_size (odczyt bez blokady, przybliżony)
+        self.metrics.checkout(time.perf_counter() - start, overflow=self._overflow > max(overflow, 0))
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self.metrics.checkin()
+
+    def _create_connection(self):
+        connection = super()._create_connection()
+        self.metrics.connection_created()
+        return connection
+
+    def _close_connection(self, connection, *, terminate: bool = False):
+        super()._close_connection(connection, terminate=terminate)
+        self.metrics.connection_closed()
+
+    def status_dict(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            **self.metrics.snapshot()
+        }
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Listener puli PyMongo (event_listeners klienta) — te same liczniki co MeteredQueuePool."""
+
+    def __init__(self):
+        self.metrics = PoolMetrics()
+        self.pools_cleared = 0  # pula wyczyszczona po błędzie sieci / zmianie topologii
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.metrics.connection_created()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.metrics.connection_closed()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self.metrics.timeout(event.duration)
+
+    def connection_checked_out(self, event):
+        self.metrics.checkout(event.duration)
+
+    def connection_checked_in(self, event):
+        self.metrics.checkin()
+
+    def status_dict(self) -> dict:
+        return {**self.metrics.snapshot(), "pools_cleared": self.pools_cleared}
+
+
+def _without_none(options: dict) -> dict:
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def configure_sql_pools(app):
+    """
+    Przed db.init_app: opcje pul z SQLALCHEMY_POOLS ("mysql" — bind domyślny) trafiają do
+    SQLALCHEMY_ENGINE_OPTIONS / SQLALCHEMY_BINDS, a każda pula to MeteredQueuePool.
+    """
+    pools = app.config.get("SQLALCHEMY_POOLS") or {}
+
+    if "mysql" in pools:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+            **_without_none(pools["mysql"]),
+            "poolclass": MeteredQueuePool
+        }
+
+    binds = {}
+    for bind_key, value in app.config.get("SQLALCHEMY_BINDS", {}).items():
+        options = value if isinstance(value, dict) else {"url": value}
+        if bind_key in pools:
+            options = {**options, **_without_none(pools[bind_key]), "poolclass": MeteredQueuePool}
+        binds[bind_key] = options
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def mongo_client_options(pool: dict, listener: MongoPoolMetrics) -> dict:
+    """Argumenty MongoClient (PyMongo(app, **opcje)) z MONGO_POOL i listenerem metryk."""
+    return {**_without_none(pool or {}), "event_listeners": [listener]}
+
+
+def pool_metrics(db, mongo_listener: MongoPoolMetrics | None = None) -> dict:
+    """Stan pul wszystkich bindów SQLAlchemy i klienta Mongo — wymaga kontekstu aplikacji."""
+    metrics = {}
+    for bind_key, engine in db.engines.items():
+        pool = engine.pool
+        name = bind_key or "mysql"
+        if isinstance(pool, MeteredQueuePool):
+            metrics[name] = pool.status_dict()
+        else:
+            metrics[name] = {"status": pool.status()}
+    if mongo_listener is not None:
+        metrics["mongo"] = mongo_listener.status_dict()
+    return metrics
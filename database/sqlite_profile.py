@@ -0,0 +1,44 @@
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+# kolejność ma znaczenie: busy_timeout przed journal_mode (przełączenie na WAL wymaga wyłącznej blokady)
+PRAGMAS = ("busy_timeout", "journal_mode", "synchronous", "mmap_size", "cache_size")
+
+
+def profile_pragmas(profile: dict) -> list[str]:
+    """Instrukcje PRAGMA profilu (wartości None są pomijane — zostaje domyślna wartość SQLite)."""
+    return [f"PRAGMA {name}={profile[name]}" for name in PRAGMAS if profile.get(name) is not None]
+
+
+def apply_sqlite_profile(engine, profile: dict):
+    """Ustawia PRAGMA profilu na każdym nowym połączeniu silnika (zdarzenie connect puli)."""
+    pragmas = profile_pragmas(profile)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def init_sqlite_profile(app, db):
+    """
+    Profil wydajności SQLite dla bindów z SQLITE_PROFILE_BINDS oraz jedna fabryka sesji sqlite_tx
+    dla całej aplikacji (app.sqlite_tx_session) — zamiast nowej scoped_session przy każdym żądaniu.
+    Wymaga kontekstu aplikacji; wywoływane przed pierwszym użyciem baz.
+    """
+    profile = app.config.get("SQLITE_PROFILE")
+    if profile:
+        for bind_key in app.config["SQLITE_PROFILE_BINDS"]:
+            engine = db.engines[bind_key]
+            apply_sqlite_profile(engine, profile)
+            engine.dispose()  # połączenia otwarte przed rejestracją zdarzenia nie mają ustawień profilu
+
+    app.sqlite_tx_session = scoped_session(sessionmaker(bind=db.engines["sqlite_tx"]))
+
+    @app.teardown_appcontext
+    def remove_sqlite_tx_session(exception=None):
+        app.sqlite_tx_session.remove()
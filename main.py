@@ -1,9 +1,13 @@
+import atexit
 from flask import Flask
 from flask_socketio import SocketIO
 from datetime import timedelta
 from blockchain.blockchain_mysql import BlockchainMYSQL
 from blockchain.blockchain_sqlite import BlockchainSQLite
 from blockchain.blockchain_mongo import BlockchainMongo
+from blockchain.blockchain_base import POW_ENGINES
+from blockchain.mining_worker import MiningWorker
+from blockchain.sealing_policy import SealingPolicy
 from blueprints.login import login
 from blueprints.admin import admin
 from blueprints.logout import logout
@@ -12,52 +16,94 @@ from blueprints.blockchain import blockchain
 from blueprints.transactions import transactions
 from blueprints.info import info
 from database.models import db, Users
+from database.migrations import add_missing_columns, add_missing_indexes
+from database.sqlite_profile import init_sqlite_profile
+from database.pool_metrics import MongoPoolMetrics, configure_sql_pools, mongo_client_options
 from database.hash import Hash
 from flask_cors import CORS
 from flask_pymongo import PyMongo
 
-app = Flask(__name__)
-app.permanent_session_lifetime = timedelta(days=7)
-app.config['SESSION_COOKIE_SAMESITE'] = 'None'
-app.config['SESSION_COOKIE_SECURE'] = True
-CORS(app, supports_credentials=True, origins="http://127.0.0.1:5500")
-app.config.from_object('database.config.Config')
+# procesy robocze pul forkserver (kopanie, walidacja) importują ten moduł ponownie jako __mp_main__ —
+# aplikacja, połączenia z bazami i wątki tworzone są tylko w procesie głównym
+if __name__ != "__mp_main__":
+    app = Flask(__name__)
+    app.permanent_session_lifetime = timedelta(days=7)
+    app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+    app.config['SESSION_COOKIE_SECURE'] = True
+    CORS(app, supports_credentials=True, origins="http://127.0.0.1:5500")
+    app.config.from_object('database.config.Config')
 
+    socketio = SocketIO(app, cors_allowed_origins="http://127.0.0.1:5500")
 
-socketio = SocketIO(app, cors_allowed_origins="http://127.0.0.1:5500")
+    configure_sql_pools(app)
+    db.app = app
+    db.init_app(app)
+    app.mongo_pool_metrics = MongoPoolMetrics()
+    mongo = PyMongo(app, **mongo_client_options(app.config["MONGO_POOL"], app.mongo_pool_metrics))
+    app.mongo = mongo
 
-db.app = app
-db.init_app(app)
-mongo = PyMongo(app)
-app.mongo = mongo
+    DEFAULT_ADMIN_USERNAME = "admin"
+    DEFAULT_ADMIN_PASSWORD = "admin"
 
-DEFAULT_ADMIN_USERNAME = "admin"
-DEFAULT_ADMIN_PASSWORD = "admin"
+    with app.app_context():
+        init_sqlite_profile(app, db)
+        db.create_all()
+        add_missing_columns(db)
+        add_missing_indexes(db)
+        BlockchainMongo.ensure_indexes(mongo.db)
 
-with app.app_context():
-    db.create_all()
+        if Users.query.filter_by(username=DEFAULT_ADMIN_USERNAME).first() is None:
+            pwd = Hash.hash_password(DEFAULT_ADMIN_PASSWORD)
+            admin_account = Users(username=DEFAULT_ADMIN_USERNAME, password=pwd, admin=4)
+            db.session.add(admin_account)
+            db.session.commit()
 
-    if Users.query.filter_by(username=DEFAULT_ADMIN_USERNAME).first() is None:
-        pwd = Hash.hash_password(DEFAULT_ADMIN_PASSWORD)
-        admin_account = Users(username=DEFAULT_ADMIN_USERNAME, password=pwd, admin=4)
-        db.session.add(admin_account)
-        db.session.commit()
+        def blockchain_options(name):
+            limits = app.config["BLOCKCHAIN_MEMPOOL_LIMITS"][name]
+            return {
+                "parallel_mining": app.config["BLOCKCHAIN_PARALLEL_MINING"][name],
+                "mining_workers": app.config["BLOCKCHAIN_MINING_WORKERS"],
+                "pipelined_mining": app.config["BLOCKCHAIN_PIPELINED_MINING"][name],
+                "sealing_policy": SealingPolicy(**app.config["BLOCKCHAIN_SEALING_POLICY"][name]),
+                "pow_engine": POW_ENGINES[app.config["BLOCKCHAIN_POW_ENGINE"][name]](),
+                "checkpoint_key": app.config["SECRET_KEY"],
+                "mempool_reconcile_interval": app.config["BLOCKCHAIN_MEMPOOL_RECONCILE_INTERVAL"],
+                "mempool_capacity": limits["capacity"],
+                "mempool_overflow": limits["overflow"],
+                "mempool_block_timeout": limits["block_timeout"],
+                "mempool_ttl": limits["ttl"],
+                "mempool_write_behind": app.config["BLOCKCHAIN_MEMPOOL_WRITE_BEHIND"]
+            }
 
-    app.blockchains = {
-        "mysql": BlockchainMYSQL(),
-        "sqlite": BlockchainSQLite(),
-        "mongo": BlockchainMongo(mongo)
-    }
+        app.blockchains = {
+            "mysql": BlockchainMYSQL(**blockchain_options("mysql")),
+            "sqlite": BlockchainSQLite(**blockchain_options("sqlite")),
+            "mongo": BlockchainMongo(mongo, mongo_uri=app.config["MONGO_URI"], **blockchain_options("mongo"))
+        }
 
-    transactions.blockchain = app.blockchains
+        transactions.blockchain = app.blockchains
 
-app.register_blueprint(login, url_prefix='/api/login')
-app.register_blueprint(logout, url_prefix='/api/logout')
-app.register_blueprint(users, url_prefix='/api/users')
-app.register_blueprint(info, url_prefix='/api/info')
-app.register_blueprint(admin, url_prefix='/api/admin')
-app.register_blueprint(transactions, url_prefix='/api/transactions')
-app.register_blueprint(blockchain, url_prefix='/api/blockchain')
+        # atexit wywołuje funkcje od ostatniej — zaległy zapis mempoola po zatrzymaniu workera kopania
+        for chain in app.blockchains.values():
+            atexit.register(chain.mempool_writer.shutdown)
+
+        # kopanie bloków w tle — żądania tylko zapisują transakcje do mempoola
+        app.mining_worker = None
+        if app.config["BLOCKCHAIN_BACKGROUND_MINING"]:
+            app.mining_worker = MiningWorker(app, app.blockchains.values(), tick=app.config["BLOCKCHAIN_SEALER_TICK"])
+            for chain in app.blockchains.values():
+                chain.mining_worker = app.mining_worker
+            app.mining_worker.start()
+            # przy zamykaniu aplikacji dokopujemy bloki, które są już w kolejce
+            atexit.register(app.mining_worker.shutdown)
+
+    app.register_blueprint(login, url_prefix='/api/login')
+    app.register_blueprint(logout, url_prefix='/api/logout')
+    app.register_blueprint(users, url_prefix='/api/users')
+    app.register_blueprint(info, url_prefix='/api/info')
+    app.register_blueprint(admin, url_prefix='/api/admin')
+    app.register_blueprint(transactions, url_prefix='/api/transactions')
+    app.register_blueprint(blockchain, url_prefix='/api/blockchain')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from database.models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplikacja z bazami SQLite w katalogu tymczasowym (bind domyślny zamiast MySQL)."""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path}/mysql.db'
+    app.config['SQLALCHEMY_BINDS'] = {
+        'sqlite_bc': f'sqlite:///{tmp_path}/blockchain.db',
+        'sqlite_tx': f'sqlite:///{tmp_path}/transactions.db'
+    }
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def make_chain(app):
+    """Tworzy BlockchainSQLite (bez workera w tle) i zatrzymuje jego zapis mempoola po teście."""
+    from blockchain.blockchain_sqlite import BlockchainSQLite
+
+    chains = []
+
+    def factory(**kwargs):
+        kwargs.setdefault('checkpoint_key', 'test')
+        chain = BlockchainSQLite(**kwargs)
+        chains.append(chain)
+        return chain
+
+    yield factory
+    for chain in chains:
+        chain.mempool_writer.shutdown()
+
+
+@pytest.fixture
+def make_transactions():
+    """Losowe (powtarzalne) transakcje między kilkoma użytkownikami, daty rosnące co 1 ms."""
+    rng = random.Random(42)
+    clock = [datetime(2025, 1, 1)]
+
+    def factory(count: int, users: int = 5) -> list[dict]:
+        transactions = []
+        for _ in range(count):
+            clock[0] += timedelta(milliseconds=1)
+            transactions.append({
+                'sender': f'user{rng.randint(1, users)}',
+                'recipient': f'user{rng.randint(1, users)}',
+                'amount': rng.randint(1, 10 ** 6) / 10 ** 6,
+                'date': clock[0]
+            })
+        return transactions
+
+    return factory
@@ -0,0 +1,49 @@
+from database.models import db, AccountBalanceSQLite, BalanceLedgerStateSQLite
+
+USERS = [f'user{i}' for i in range(1, 6)]
+
+
+def _rounded(score: dict) -> dict:
+    return dict(score, score=round(score['score'], 8))
+
+
+def _assert_ledger_matches_recompute(chain):
+    # mempool zapisywany jest do tabeli w tle — przeliczenie czyta tabelę
+    chain.flush_mempool()
+    for username in USERS:
+        assert _rounded(chain.get_user_score(username)) == _rounded(chain.recompute_user_score(username))
+
+
+def test_ledger_matches_recompute_after_bulk_ingest(make_chain, make_transactions):
+    chain = make_chain()
+    # 2 pełne bloki ścieżką masową, końcówka (3) czeka w mempoolu razem z pojedynczymi transakcjami
+    chain.hm_add_transaction_to_mempool(make_transactions(23), tx_limit=10, direct_blocks=True)
+    chain.hm_submit_transaction(make_transactions(4))
+    assert chain.get_ledger_block_index() == chain.last_block['index'] == 3
+    _assert_ledger_matches_recompute(chain)
+
+    # zamknięcie końcówki przenosi saldo z mempoola do księgi
+    chain.hm_submit_transaction(make_transactions(3))
+    assert chain.get_ledger_block_index() == chain.last_block['index'] == 4
+    _assert_ledger_matches_recompute(chain)
+
+    report = chain.reconcile_balances(
+        (username, chain.recompute_user_score(username)['score']) for username in USERS
+    )
+    assert report["users_checked"] == len(USERS)
+    assert report["mismatch_count"] == 0
+
+
+def test_sync_rebuilds_wiped_ledger(make_chain, make_transactions):
+    chain = make_chain()
+    chain.hm_add_transaction_to_mempool(make_transactions(35), tx_limit=10, direct_blocks=True)
+    expected = {username: _rounded(chain.get_user_score(username)) for username in USERS}
+
+    db.session.execute(db.delete(AccountBalanceSQLite))
+    db.session.execute(db.delete(BalanceLedgerStateSQLite))
+    db.session.commit()
+    assert chain.get_ledger_block_index() == 0
+
+    assert chain.sync_balance_ledger(batch_size=2) == chain.last_block['index']
+    assert {username: _rounded(chain.get_user_score(username)) for username in USERS} == expected
+    _assert_ledger_matches_recompute(chain)
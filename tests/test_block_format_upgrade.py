@@ -0,0 +1,42 @@
+import blockchain.blockchain_base as blockchain_base
+from blockchain.blockchain_base import BLOCK_FORMAT_LEGACY, BLOCK_FORMAT_BINARY, BLOCK_FORMAT_HEADER
+from database.models import db, BlockchainBlockSQLite, BlockchainTransactionSQLite
+
+
+def _versions(chain) -> list[int]:
+    return [block['version'] for batch in chain.iter_chain(after_index=0) for block in batch]
+
+
+def test_legacy_chain_validates_after_upgrade(make_chain, make_transactions, monkeypatch):
+    # łańcuch sprzed wersjonowania: bloki v0 bez zapisanej wersji i hasha (kolumny dodane później)
+    monkeypatch.setattr(blockchain_base, "CURRENT_BLOCK_FORMAT", BLOCK_FORMAT_LEGACY)
+    legacy = make_chain(checkpoint_key=None)
+    # hash v0 obejmował transakcje z id wiersza mempoola, równym id nadanemu potem w łańcuchu
+    transactions = [dict(tx, id=tx_id) for tx_id, tx in enumerate(make_transactions(10), start=1)]
+    legacy.hm_add_transaction_to_mempool(transactions, tx_limit=5, direct_blocks=True)
+    db.session.execute(db.update(BlockchainBlockSQLite).values(version=None, hash=None))
+    db.session.commit()
+
+    monkeypatch.setattr(blockchain_base, "CURRENT_BLOCK_FORMAT", BLOCK_FORMAT_BINARY)
+    binary = make_chain(checkpoint_key=None)
+    binary.hm_add_transaction_to_mempool(make_transactions(5), tx_limit=5, direct_blocks=True)
+
+    # aktualizacja: nowa instancja dopisuje bloki v2 za starymi
+    monkeypatch.setattr(blockchain_base, "CURRENT_BLOCK_FORMAT", BLOCK_FORMAT_HEADER)
+    chain = make_chain(checkpoint_key=None)
+    chain.hm_add_transaction_to_mempool(make_transactions(10), tx_limit=5, direct_blocks=True)
+
+    assert _versions(chain) == [BLOCK_FORMAT_LEGACY] * 3 + [BLOCK_FORMAT_BINARY] + [BLOCK_FORMAT_HEADER] * 2
+
+    for depth in ("links", "merkle"):
+        valid, message, stats = chain.validate_chain(depth=depth, mode="full")
+        assert valid, message
+        assert stats["checked_blocks"] == chain.last_block['index'] == 6
+
+    # transakcje v0 są częścią hasha bloku — zmianę wykrywa już sprawdzenie powiązań
+    tx = db.session.get(BlockchainTransactionSQLite, 1)
+    tx.amount += 1
+    db.session.commit()
+    valid, message, _ = chain.validate_chain(depth="links", mode="full")
+    assert not valid
+    assert message == "Nieprawidłowy poprzedni hash w bloku 3."
@@ -0,0 +1,153 @@
+import pytest
+
+from blockchain.blockchain_base import MempoolFullError, MempoolReservation
+from blockchain.sealing_policy import SealingPolicy
+
+
+def test_reservation_is_all_or_nothing(make_chain, make_transactions):
+    roomy = make_chain(sealing_policy=SealingPolicy(5))
+    full = make_chain(sealing_policy=SealingPolicy(5, max_age=60), mempool_capacity=5)
+    full.hm_submit_transaction(make_transactions(4))
+    MempoolReservation([full], 1)  # ostatnie miejsce zajęte, ale nieprzekazane
+
+    with pytest.raises(MempoolFullError):
+        MempoolReservation([roomy, full], 1)
+    assert roomy.mempool_size == 0
+
+
+def test_reserved_submit_does_not_fail_on_full_mempool(make_chain, make_transactions):
+    chain = make_chain(sealing_policy=SealingPolicy(5, max_age=60), mempool_capacity=5)
+    chain.hm_submit_transaction(make_transactions(3))
+
+    reservation = MempoolReservation([chain], 1)
+    chain.hm_submit_transaction(make_transactions(1))  # mempool: 4 + 1 zarezerwowane
+    with pytest.raises(MempoolFullError):
+        chain.hm_submit_transaction(make_transactions(1))
+
+    reservation.submit(make_transactions(1))
+    reservation.release()
+    # piąta transakcja wypełniła blok — zamknięty bez workera w tle
+    assert chain.mempool_size == 0
+    assert chain.last_block['index'] == 2
+
+
+def test_release_returns_unused_space(make_chain):
+    chain = make_chain(sealing_policy=SealingPolicy(5), mempool_capacity=5)
+    reservation = MempoolReservation([chain], 3)
+    assert chain.mempool_capacity_left == 2
+    reservation.release()
+    assert chain.mempool_capacity_left == 5
+
+
+def test_exempt_reservation_ignores_capacity(make_chain, make_transactions):
+    chain = make_chain(sealing_policy=SealingPolicy(5, max_age=60), mempool_capacity=5)
+    MempoolReservation([chain], 5)
+
+    reservation = MempoolReservation([chain], 1, exempt=True)
+    reservation.submit(make_transactions(1))
+    assert chain.mempool_size == 6
+
+
+def test_blocked_producer_waits_for_full_blocks(make_chain, make_transactions):
+    import threading
+
+    chain = make_chain(sealing_policy=SealingPolicy(5), mempool_capacity=5, mempool_overflow="block",
+                       mempool_block_timeout=5.0)
+    reservation = MempoolReservation([chain], 2)
+    chain.hm_submit_transaction(make_transactions(3))
+
+    # mempool pełny (3 + 2 zarezerwowane), blok niepełny — producent czeka zamiast wymuszać mały blok
+    producer = threading.Thread(target=chain.hm_submit_transaction, args=(make_transactions(1),))
+    producer.start()
+    producer.join(0.3)
+    assert producer.is_alive()
+    assert chain.last_block['index'] == 1
+
+    reservation.submit(make_transactions(2))  # pełny blok 5 transakcji zwalnia miejsce
+    producer.join(5)
+    assert not producer.is_alive()
+    assert chain.backpressure["blocked"] == 1
+    assert chain.mempool_size == 1
+
+
+def test_reserved_bulk_ingest_does_not_fail_on_full_mempool(make_chain, make_transactions):
+    chain = make_chain(sealing_policy=SealingPolicy(5, max_age=60), mempool_capacity=5)
+    chain.hm_submit_transaction(make_transactions(1))
+    reservation = MempoolReservation([chain], 4)  # miejsce na końcówkę (tx_limit - 1)
+    with pytest.raises(MempoolFullError):
+        chain.hm_submit_transaction(make_transactions(1))
+
+    # 4 z rezerwacji dopełniają blok z czekającą transakcją, 5 w bloku bezpośrednio, końcówka 3 bez kontroli
+    chain.hm_add_transaction_to_mempool(make_transactions(12), tx_limit=5, direct_blocks=True,
+                                        reserved=reservation.take(chain))
+    reservation.release()
+    assert chain.last_block['index'] == 3
+    assert chain.mempool_size == 3
+
+
+def test_unused_bulk_reservation_is_released(make_chain, make_transactions):
+    chain = make_chain(sealing_policy=SealingPolicy(5), mempool_capacity=5)
+    reservation = MempoolReservation([chain], 4)
+
+    # same pełne bloki — nic nie trafia do mempoola, rezerwacja wraca
+    chain.hm_add_transaction_to_mempool(make_transactions(10), tx_limit=5, direct_blocks=True,
+                                        reserved=reservation.take(chain))
+    assert chain.last_block['index'] == 3
+    assert chain.mempool_capacity_left == 5
+
+
+def test_waiting_reservation_does_not_block_others(make_chain):
+    import threading
+
+    full = make_chain(sealing_policy=SealingPolicy(5), mempool_capacity=5, mempool_overflow="block",
+                      mempool_block_timeout=5.0)
+    roomy = make_chain(sealing_policy=SealingPolicy(5))
+    held = MempoolReservation([full], 5)
+
+    waiter = threading.Thread(target=MempoolReservation, args=([full], 1))
+    waiter.start()
+    waiter.join(0.3)
+    assert waiter.is_alive()
+
+    # producent czekający na pełny mempool nie trzyma blokady rezerwacji
+    others = threading.Thread(target=lambda: (MempoolReservation([roomy], 1),
+                                              MempoolReservation([full], 1, exempt=True)))
+    others.start()
+    others.join(1)
+    assert not others.is_alive()
+    assert roomy.mempool_size == 1
+    assert full.mempool_size == 6
+
+    held.release()
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert full.mempool_size == 2
+
+
+def test_blocked_reservation_times_out(make_chain):
+    chain = make_chain(sealing_policy=SealingPolicy(5), mempool_capacity=5, mempool_overflow="block",
+                       mempool_block_timeout=0.2)
+    MempoolReservation([chain], 5)
+    with pytest.raises(MempoolFullError):
+        MempoolReservation([chain], 1)
+    assert chain.backpressure["timed_out"] == 1
+    assert chain.mempool_size == 5
+
+
+def test_reconcile_drops_abandoned_reservations(make_chain, make_transactions):
+    import gc
+
+    chain = make_chain(sealing_policy=SealingPolicy(5, max_age=60), mempool_capacity=5)
+    chain.hm_submit_transaction(make_transactions(1))
+    held = MempoolReservation([chain], 1)
+    MempoolReservation([chain], 3)  # porzucona bez release()
+    gc.collect()
+    assert chain.mempool_capacity_left == 0
+
+    # licznik przeliczony z indeksu i żywych rezerwacji — porzucona przestaje zajmować miejsce
+    chain.reconcile_mempool_count()
+    assert chain.mempool_capacity_left == 3
+
+    held.submit(make_transactions(1))
+    chain.reconcile_mempool_count()
+    assert chain.mempool_size == 2
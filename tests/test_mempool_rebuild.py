@@ -0,0 +1,32 @@
+from blockchain.sealing_policy import SealingPolicy
+from database.models import MempoolTransactionSQLite
+
+USERS = [f'user{i}' for i in range(1, 6)]
+
+
+def test_restart_drops_mempool_rows_of_sealed_transactions(make_chain, make_transactions, monkeypatch):
+    chain = make_chain(sealing_policy=SealingPolicy(5, max_age=60))
+    chain.hm_submit_transaction(make_transactions(3))
+    chain.flush_mempool()
+
+    # usuwanie w tle nie dochodzi do bazy — wiersze zamkniętego bloku zostają w tabeli
+    monkeypatch.setattr(chain, "clear_pending_transactions", lambda row_ids: None)
+    chain.hm_submit_transaction(make_transactions(4))
+    chain.flush_mempool()
+    assert chain.last_block['index'] == 2
+    assert MempoolTransactionSQLite.query.count() == 7
+
+    # restart: do indeksu wracają tylko 2 niezamknięte transakcje, reszta znika z tabeli
+    restarted = make_chain(sealing_policy=SealingPolicy(5, max_age=60))
+    assert restarted.mempool_size == 2
+    assert MempoolTransactionSQLite.query.count() == 2
+    restarted.hm_submit_transaction(make_transactions(3))
+    assert restarted.last_block['index'] == 3
+    assert restarted.mempool_size == 0
+
+    # żadna transakcja nie trafiła do łańcucha ani księgi sald dwa razy
+    restarted.flush_mempool()
+    for username in USERS:
+        assert round(restarted.get_user_score(username)['score'], 8) == \
+            round(restarted.recompute_user_score(username)['score'], 8)
+    assert sum(len(block['transactions']) for batch in restarted.iter_chain() for block in batch) == 10
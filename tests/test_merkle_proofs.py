@@ -0,0 +1,94 @@
+import pytest
+
+from database.models import db, Users, BlockchainBlockSQLite, BlockchainTransactionSQLite, MerkleNodeSQLite
+
+
+def _block_transactions(block_index: int) -> list[dict]:
+    block = BlockchainBlockSQLite.query.filter_by(index=block_index).one()
+    return [
+        {'id': tx.id, 'sender': tx.sender, 'recipient': tx.recipient, 'amount': tx.amount, 'date': tx.date}
+        for tx in BlockchainTransactionSQLite.query.filter_by(block_id=block.id)
+        .order_by(BlockchainTransactionSQLite.id)
+    ]
+
+
+def test_stored_proof_matches_recomputed_proof(make_chain, make_transactions):
+    chain = make_chain()
+    # 7 transakcji — nieparzyste poziomy drzewa (powielany ostatni węzeł)
+    chain.hm_add_transaction_to_mempool(make_transactions(7), tx_limit=7, direct_blocks=True)
+    block = BlockchainBlockSQLite.query.filter_by(index=2).one()
+    transactions = _block_transactions(2)
+    assert MerkleNodeSQLite.query.filter_by(block_id=block.id, level=0).count() == 7
+
+    stored = [chain.get_transaction_proof(2, tx['id']) for tx in transactions]
+    for tx_index, (tx, proof_data) in enumerate(zip(transactions, stored)):
+        assert proof_data["transaction"] == tx
+        assert proof_data["proof"] == chain.get_merkle_proof(transactions, tx_index, block.version)
+        assert chain.verify_merkle_proof(tx, proof_data["proof"], block.merkle_root, block.version)
+
+    # blok bez zapisanego drzewa (sprzed zmiany) — dowód przebudowany z transakcji jest taki sam
+    MerkleNodeSQLite.query.filter_by(block_id=block.id).delete()
+    db.session.commit()
+    assert [chain.get_transaction_proof(2, tx['id']) for tx in transactions] == stored
+
+    assert chain.get_transaction_proof(2, transactions[-1]['id'] + 1) is None
+
+
+def test_batch_proofs_match_single_proofs(make_chain, make_transactions):
+    chain = make_chain()
+    chain.hm_add_transaction_to_mempool(make_transactions(14), tx_limit=7, direct_blocks=True)
+    transactions = _block_transactions(2)
+    tx_ids = [tx['id'] for tx in transactions]
+    other_block_id = _block_transactions(3)[0]['id']
+
+    for stored_tree in (True, False):
+        if not stored_tree:
+            MerkleNodeSQLite.query.delete()
+            db.session.commit()
+
+        batch = chain.get_transaction_proofs(2, tx_ids + [other_block_id])
+        assert set(batch["proofs"]) == {str(tx_id) for tx_id in tx_ids}
+        for tx_id in tx_ids:
+            single = chain.get_transaction_proof(2, tx_id)
+            assert batch["proofs"][str(tx_id)] == {"transaction": single["transaction"], "proof": single["proof"]}
+            assert (batch["merkle_root"], batch["version"]) == (single["merkle_root"], single["version"])
+
+    assert chain.get_transaction_proofs(99, tx_ids) is None
+
+
+def test_batch_proof_endpoint(app, make_chain, make_transactions):
+    pytest.importorskip("requests")
+    from blueprints.transactions import transactions
+
+    chain = make_chain()
+    chain.hm_add_transaction_to_mempool(make_transactions(14), tx_limit=7, direct_blocks=True)
+    tx_ids = [tx['id'] for tx in _block_transactions(2)][:3]
+    other_block_id = _block_transactions(3)[0]['id']
+
+    app.blockchains = {"sqlite": chain}
+    app.register_blueprint(transactions, url_prefix='/api/transactions')
+    db.session.add(Users(id=1, username='admin', password='-', admin=3))
+    db.session.commit()
+
+    client = app.test_client()
+    payload = {"blockchain_name": "sqlite", "block_index": 2, "tx_ids": tx_ids + [other_block_id]}
+    assert client.post('/api/transactions/merkle_tree/batch', json=payload).status_code == 403
+
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+        session['user_id'] = 1
+
+    response = client.post('/api/transactions/merkle_tree/batch', json=dict(payload, tx_ids=tx_ids))
+    assert response.status_code == 200
+    assert [result["valid"] for result in response.get_json()["results"]] == [True, True, True]
+
+    # transakcja z innego bloku — wynik negatywny w tej samej kolejności, cała odpowiedź 400
+    response = client.post('/api/transactions/merkle_tree/batch', json=payload)
+    assert response.status_code == 400
+    results = response.get_json()["results"]
+    assert [result["tx_id"] for result in results] == payload["tx_ids"]
+    assert [result["valid"] for result in results] == [True, True, True, False]
+    assert response.get_json()["message"] == 'Poprawnych transakcji: 3/4 w bloku 2.'
+
+    response = client.post('/api/transactions/merkle_tree/batch', json=dict(payload, block_index=99))
+    assert response.status_code == 404
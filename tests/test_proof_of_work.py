@@ -0,0 +1,22 @@
+import hashlib
+
+from blockchain.blockchain_base import HexdigestPowEngine, MidstatePowEngine
+
+
+def test_pow_engines_find_the_same_nonce():
+    legacy, midstate = HexdigestPowEngine(), MidstatePowEngine()
+    # długi last_proof — ścieżka z zapamiętanym stanem SHA-256 (prefiks >= 64 bajty)
+    for last_proof in (100, 12345, int("9" * 70)):
+        block_hash = hashlib.sha256(str(last_proof).encode()).hexdigest()
+        assert midstate.search(last_proof, block_hash) == legacy.search(last_proof, block_hash)
+
+
+def test_parallel_mining_finds_the_serial_nonce(make_chain):
+    serial = make_chain()
+    parallel = make_chain(parallel_mining=True, mining_workers=2)
+    try:
+        for i in range(3):
+            block_hash = hashlib.sha256(f"block-{i}".encode()).hexdigest()
+            assert parallel.hm_proof_of_work(100 + i, block_hash) == serial.hm_proof_of_work(100 + i, block_hash)
+    finally:
+        parallel.shutdown_mining_pool()
@@ -0,0 +1,31 @@
+from blockchain.sealing_policy import SealingPolicy
+
+
+def _block_sizes(chain) -> list[int]:
+    return [len(block['transactions']) for batch in chain.iter_chain(after_index=1) for block in batch]
+
+
+def test_bulk_tx_limit_applies_to_background_sealing(make_chain, make_transactions):
+    chain = make_chain(sealing_policy=SealingPolicy(5))
+    chain.hm_add_transaction_to_mempool(make_transactions(22), tx_limit=10, direct_blocks=True)
+    assert _block_sizes(chain) == [10, 10]
+
+    # końcówka ścieżki masowej (2) + pojedyncze transakcje — blok dopiero po tx_limit, nie po 5
+    chain.hm_submit_transaction(make_transactions(4))
+    assert not chain.sealing_due()
+    assert chain.seal_pending_blocks() == 0
+
+    chain.hm_submit_transaction(make_transactions(4))
+    assert _block_sizes(chain) == [10, 10, 10]
+
+    # pusty mempool — znów obowiązuje sealing_policy
+    chain.hm_submit_transaction(make_transactions(5))
+    assert _block_sizes(chain) == [10, 10, 10, 5]
+
+
+def test_expired_bulk_tail_is_sealed_up_to_tx_limit(make_chain, make_transactions):
+    chain = make_chain(sealing_policy=SealingPolicy(5, max_age=0))
+    chain.hm_add_transaction_to_mempool(make_transactions(17), tx_limit=10, direct_blocks=True)
+
+    assert chain.seal_pending_blocks() == 1
+    assert _block_sizes(chain) == [10, 7]
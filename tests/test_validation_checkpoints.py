@@ -0,0 +1,96 @@
+from database.models import db, BlockchainTransactionSQLite, ValidationCheckpointSQLite
+
+
+def test_links_checkpoint_does_not_skip_merkle_validation(make_chain, make_transactions):
+    chain = make_chain()
+    chain.hm_add_transaction_to_mempool(make_transactions(20), tx_limit=5, direct_blocks=True)
+
+    valid, _, stats = chain.validate_chain(depth="links")
+    assert valid and stats["checked_blocks"] == chain.last_block['index']
+
+    # zmiana kwoty nie psuje powiązań bloków v2 (hash z nagłówka) — wykrywa ją tylko merkle_root
+    tx = db.session.scalars(db.select(BlockchainTransactionSQLite).order_by(BlockchainTransactionSQLite.id)).first()
+    tx.amount += 1
+    db.session.commit()
+
+    valid, _, _ = chain.validate_chain(depth="links")
+    assert valid
+
+    valid, message, stats = chain.validate_chain(depth="merkle")
+    assert not valid
+    assert "merkle_root" in message
+    assert stats["mode"] == "full"
+
+
+def test_checkpoint_is_kept_per_depth(make_chain, make_transactions):
+    chain = make_chain()
+    chain.hm_add_transaction_to_mempool(make_transactions(10), tx_limit=5, direct_blocks=True)
+
+    assert chain.validate_chain(depth="merkle")[0]
+    chain.hm_add_transaction_to_mempool(make_transactions(10), tx_limit=5, direct_blocks=True)
+    assert chain.validate_chain(depth="links")[0]
+
+    # merkle sprawdza tylko bloki za własnym checkpointem, links nic nie zostawił do sprawdzenia
+    _, _, merkle_stats = chain.validate_chain(depth="merkle")
+    _, _, links_stats = chain.validate_chain(depth="links")
+    assert merkle_stats["checked_blocks"] == 2
+    assert links_stats["checked_blocks"] == 0
+
+    # kolejne walidacje nadpisują wiersz swojej głębokości
+    rows = db.session.execute(db.select(ValidationCheckpointSQLite.depth, ValidationCheckpointSQLite.block_index)).all()
+    assert sorted(rows) == [("links", chain.last_block['index']), ("merkle", chain.last_block['index'])]
+
+
+def test_checkpoint_signature_binds_depth(make_chain, make_transactions):
+    chain = make_chain()
+    chain.hm_add_transaction_to_mempool(make_transactions(10), tx_limit=5, direct_blocks=True)
+    assert chain.validate_chain(depth="links")[0]
+
+    # checkpoint links zapisany jako merkle nie przechodzi weryfikacji podpisu
+    forged = dict(chain.get_checkpoint("links"), depth="merkle")
+    chain.save_checkpoint(forged)
+    assert chain._load_checkpoint("merkle") is None
+
+
+def test_parallel_validation_matches_serial(make_chain, make_transactions):
+    chain = make_chain(checkpoint_key=None)
+    chain.hm_add_transaction_to_mempool(make_transactions(30), tx_limit=5, direct_blocks=True)
+
+    serial = chain.validate_chain(depth="merkle", mode="full")
+    parallel = chain.validate_chain(batch_size=2, depth="merkle", mode="full", workers=2)
+    assert serial[0] and parallel[0]
+    assert serial[2]["checked_blocks"] == parallel[2]["checked_blocks"] == chain.last_block['index']
+
+    tx = db.session.scalars(db.select(BlockchainTransactionSQLite).order_by(BlockchainTransactionSQLite.id.desc())).first()
+    tx.amount += 1
+    db.session.commit()
+    serial = chain.validate_chain(depth="merkle", mode="full")
+    parallel = chain.validate_chain(batch_size=2, depth="merkle", mode="full", workers=2)
+    assert not serial[0] and not parallel[0]
+    assert serial[1] == parallel[1] == f"Nieprawidłowy merkle_root w bloku {chain.last_block['index']}."
+
+
+def test_merkle_validation_stops_at_first_bad_batch(make_chain, make_transactions, monkeypatch):
+    import os
+
+    chain = make_chain(checkpoint_key=None)
+    chain.hm_add_transaction_to_mempool(make_transactions(30), tx_limit=1, direct_blocks=True)
+    tx = db.session.scalars(db.select(BlockchainTransactionSQLite).order_by(BlockchainTransactionSQLite.id)).first()
+    tx.amount += 1
+    db.session.commit()
+
+    # jeden proces — w toku najwyżej 2 paczki; liczymy paczki odczytane z łańcucha
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    read = []
+    iter_chain = chain.iter_chain
+
+    def counting_iter_chain(*args, **kwargs):
+        for batch in iter_chain(*args, **kwargs):
+            read.append(batch[0]['index'])
+            yield batch
+
+    monkeypatch.setattr(chain, "iter_chain", counting_iter_chain)
+    valid, message, _ = chain.validate_chain(batch_size=1, depth="merkle", mode="full")
+    assert not valid
+    assert message == "Nieprawidłowy merkle_root w bloku 2."
+    assert len(read) <= 5